@@ -2,6 +2,12 @@ import React, { createContext, useContext, useState, useEffect } from 'react';
 
 const AuthContext = createContext();
 
+// Chamadas da tela inicial, feitas numa só ida e volta por /api/batch
+const STARTUP_REQUESTS = [
+  { id: 'me', method: 'GET', path: '/api/auth/me' },
+  { id: 'giras', method: 'GET', path: '/api/giras/?status=agendada' },
+];
+
 export const useAuth = () => {
   const context = useContext(AuthContext);
   if (!context) {
@@ -13,6 +19,7 @@ export const useAuth = () => {
 export const AuthProvider = ({ children }) => {
   const [user, setUser] = useState(null);
   const [token, setToken] = useState(localStorage.getItem('token'));
+  const [startupData, setStartupData] = useState({});
   const [loading, setLoading] = useState(true);
 
   const API_BASE = '/api';
@@ -27,16 +34,27 @@ export const AuthProvider = ({ children }) => {
 
   const fetchCurrentUser = async () => {
     try {
-      const response = await fetch(`${API_BASE}/auth/me`, {
+      const response = await fetch(`${API_BASE}/batch`, {
+        method: 'POST',
         headers: {
           'Authorization': `Bearer ${token}`,
           'Content-Type': 'application/json',
         },
+        body: JSON.stringify({ requests: STARTUP_REQUESTS }),
       });
 
-      if (response.ok) {
-        const data = await response.json();
-        setUser(data.user);
+      if (!response.ok) {
+        logout();
+        return;
+      }
+
+      const data = await response.json();
+      const results = Object.fromEntries(data.responses.map((item) => [item.id, item]));
+      if (results.me?.status === 200) {
+        setUser(results.me.body.user);
+        setStartupData({
+          giras: results.giras?.status === 200 ? results.giras.body.giras : null,
+        });
       } else {
         logout();
       }
@@ -75,6 +93,7 @@ export const AuthProvider = ({ children }) => {
 
   const logout = () => {
     setUser(null);
+    setStartupData({});
     setToken(null);
     localStorage.removeItem('token');
   };
@@ -99,6 +118,7 @@ export const AuthProvider = ({ children }) => {
     user,
     token,
     loading,
+    startupData,
     login,
     logout,
     isAuthenticated,
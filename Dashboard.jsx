@@ -13,7 +13,7 @@ import {
 } from 'lucide-react';
 
 const Dashboard = () => {
-  const { user, token, API_BASE } = useAuth();
+  const { user, token, API_BASE, startupData } = useAuth();
   const [stats, setStats] = useState({
     totalMembros: 0,
     proximasGiras: 0,
@@ -23,9 +23,23 @@ const Dashboard = () => {
   });
   const [loading, setLoading] = useState(true);
 
+  // Giras agendadas já vêm no lote de inicialização (AuthContext, /api/batch)
+  const agora = new Date();
+  const proximas = (startupData.giras || [])
+    .map((gira) => ({ ...gira, data: new Date(gira.data_hora) }))
+    .filter((gira) => gira.data >= agora)
+    .sort((a, b) => a.data - b.data);
+
+  // Dias de calendário até a data (0 = hoje), sem depender da hora
+  const diasAte = (data) => {
+    const inicio = new Date(agora.getFullYear(), agora.getMonth(), agora.getDate());
+    const dia = new Date(data.getFullYear(), data.getMonth(), data.getDate());
+    return Math.round((dia - inicio) / 86400000);
+  };
+
   useEffect(() => {
     fetchDashboardData();
-  }, []);
+  }, [startupData]);
 
   const fetchDashboardData = async () => {
     try {
@@ -33,7 +47,9 @@ const Dashboard = () => {
       // Em uma implementação real, faria chamadas para endpoints específicos
       setStats({
         totalMembros: 25,
-        proximasGiras: 3,
+        proximasGiras: proximas.filter(
+          (gira) => gira.data.getMonth() === agora.getMonth() && gira.data.getFullYear() === agora.getFullYear()
+        ).length,
         estoquesBaixos: 5,
         atendimentosPendentes: 8,
         receitaMensal: 2500.00
@@ -142,20 +158,25 @@ const Dashboard = () => {
           </CardHeader>
           <CardContent>
             <div className="space-y-3">
-              <div className="flex justify-between items-center p-3 bg-red-600/10 rounded">
-                <div>
-                  <p className="text-white font-medium">Gira de Desenvolvimento</p>
-                  <p className="text-red-300 text-sm">Sexta-feira, 19:00</p>
-                </div>
-                <span className="text-purple-400 text-sm">Em 2 dias</span>
-              </div>
-              <div className="flex justify-between items-center p-3 bg-red-600/10 rounded">
-                <div>
-                  <p className="text-white font-medium">Gira de Consulta</p>
-                  <p className="text-red-300 text-sm">Sábado, 20:00</p>
-                </div>
-                <span className="text-purple-400 text-sm">Em 3 dias</span>
-              </div>
+              {proximas.length === 0 && (
+                <p className="text-red-300 text-sm">Nenhuma gira agendada</p>
+              )}
+              {proximas.slice(0, 3).map((gira) => {
+                const dias = diasAte(gira.data);
+                return (
+                  <div key={gira.id} className="flex justify-between items-center p-3 bg-red-600/10 rounded">
+                    <div>
+                      <p className="text-white font-medium">{gira.titulo}</p>
+                      <p className="text-red-300 text-sm">
+                        {gira.data.toLocaleString('pt-BR', { weekday: 'long', hour: '2-digit', minute: '2-digit' })}
+                      </p>
+                    </div>
+                    <span className="text-purple-400 text-sm">
+                      {dias === 0 ? 'Hoje' : dias === 1 ? 'Amanhã' : `Em ${dias} dias`}
+                    </span>
+                  </div>
+                );
+              })}
             </div>
           </CardContent>
         </Card>
@@ -1,5 +1,38 @@
-from src.models.user import db
+import logging
+import re
+import unicodedata
+
+from src.models.user import db, text_preview
 from datetime import datetime
+from sqlalchemy import event, text
+
+logger = logging.getLogger(__name__)
+
+
+def normalize_phone(telefone):
+    """Só os dígitos, sem o código do país (55): '(11) 91234-5678' -> '11912345678'"""
+    if not telefone:
+        return None
+    digits = re.sub(r'\D', '', telefone)
+    if digits.startswith('55') and len(digits) in (12, 13):
+        digits = digits[2:]
+    return digits or None
+
+
+def normalize_email(email):
+    if not email:
+        return None
+    return email.strip().lower() or None
+
+
+def normalize_name(nome):
+    """Minúsculas, sem acentos e com espaços simples: 'João  da Silva' -> 'joao da silva'"""
+    if not nome:
+        return None
+    decomposed = unicodedata.normalize('NFKD', nome)
+    stripped = ''.join(ch for ch in decomposed if not unicodedata.combining(ch))
+    return ' '.join(stripped.lower().split()) or None
+
 
 class Client(db.Model):
     __tablename__ = 'clients'
@@ -8,6 +41,11 @@ class Client(db.Model):
     nome = db.Column(db.String(100), nullable=False)
     email = db.Column(db.String(120), nullable=True)
     telefone = db.Column(db.String(20), nullable=True)
+    
+    # Colunas de busca, mantidas na escrita (ver _normalize_client)
+    nome_normalizado = db.Column(db.String(100), nullable=True)
+    email_normalizado = db.Column(db.String(120), nullable=True)
+    telefone_normalizado = db.Column(db.String(20), nullable=True)
     data_nascimento = db.Column(db.Date, nullable=True)
     endereco = db.Column(db.Text, nullable=True)
     
@@ -20,25 +58,101 @@ class Client(db.Model):
     # Relacionamentos
     appointments = db.relationship('Appointment', backref='client', lazy='dynamic')
     
+    # Prévia calculada no SQL (ver text_load_options)
+    observacoes_preview = db.query_expression()
+    
+    __text_previews__ = {'observacoes': 'observacoes_preview'}
+    
+    __sparse_fields__ = ('id', 'nome', 'email', 'telefone', 'data_nascimento', 'endereco', 'observacoes',
+                         'created_at', 'updated_at')
+    
+    # text_pattern_ops permite que o LIKE 'prefixo%' use o índice no PostgreSQL
+    __table_args__ = (
+        db.Index('ix_clients_nome_normalizado', 'nome_normalizado',
+                 postgresql_ops={'nome_normalizado': 'text_pattern_ops'}),
+        db.Index('ix_clients_email_normalizado', 'email_normalizado',
+                 postgresql_ops={'email_normalizado': 'text_pattern_ops'}),
+        db.Index('ix_clients_telefone_normalizado', 'telefone_normalizado',
+                 postgresql_ops={'telefone_normalizado': 'text_pattern_ops'}),
+    )
+    
     def __repr__(self):
         return f'<Client {self.nome}>'
     
-    def to_dict(self):
-        return {
+    def to_dict(self, full=True):
+        data = {
             'id': self.id,
             'nome': self.nome,
             'email': self.email,
             'telefone': self.telefone,
             'data_nascimento': self.data_nascimento.isoformat() if self.data_nascimento else None,
             'endereco': self.endereco,
-            'observacoes': self.observacoes,
             'created_at': self.created_at.isoformat() if self.created_at else None,
             'updated_at': self.updated_at.isoformat() if self.updated_at else None
         }
+        
+        if full:
+            data['observacoes'] = self.observacoes
+        else:
+            data['observacoes_preview'] = text_preview(self, 'observacoes')
+            
+        return data
+
+
+@event.listens_for(Client, 'before_insert')
+@event.listens_for(Client, 'before_update')
+def _normalize_client(mapper, connection, target):
+    target.nome_normalizado = normalize_name(target.nome)
+    target.email_normalizado = normalize_email(target.email)
+    target.telefone_normalizado = normalize_phone(target.telefone)
+
+
+# Índice de nomes para busca aproximada: trigramas no PostgreSQL (pg_trgm) e
+# FTS5 com tokenizador trigram no SQLite, mantido por triggers.
+CLIENT_NAME_INDEX_DDL = {
+    'postgresql': [
+        'CREATE EXTENSION IF NOT EXISTS pg_trgm',
+        'CREATE INDEX IF NOT EXISTS ix_clients_nome_trgm ON clients USING gin (nome_normalizado gin_trgm_ops)',
+    ],
+    'sqlite': [
+        "CREATE VIRTUAL TABLE IF NOT EXISTS clients_fts USING fts5("
+        "nome_normalizado, content='clients', content_rowid='id', tokenize='trigram')",
+        "CREATE TRIGGER IF NOT EXISTS clients_fts_ai AFTER INSERT ON clients BEGIN "
+        "INSERT INTO clients_fts(rowid, nome_normalizado) VALUES (new.id, new.nome_normalizado); END",
+        "CREATE TRIGGER IF NOT EXISTS clients_fts_ad AFTER DELETE ON clients BEGIN "
+        "INSERT INTO clients_fts(clients_fts, rowid, nome_normalizado) VALUES ('delete', old.id, old.nome_normalizado); END",
+        "CREATE TRIGGER IF NOT EXISTS clients_fts_au AFTER UPDATE OF nome_normalizado ON clients BEGIN "
+        "INSERT INTO clients_fts(clients_fts, rowid, nome_normalizado) VALUES ('delete', old.id, old.nome_normalizado); "
+        "INSERT INTO clients_fts(rowid, nome_normalizado) VALUES (new.id, new.nome_normalizado); END",
+    ],
+}
+
+
+def create_client_name_index(connection):
+    """Cria o índice de nomes se ainda não existir (bancos anteriores a ele)"""
+    statements = CLIENT_NAME_INDEX_DDL.get(connection.dialect.name)
+    if not statements:
+        return
+    try:
+        # Savepoint: sem a extensão/tokenizador a busca cai para LIKE, e o create_all segue
+        with connection.begin_nested():
+            for statement in statements:
+                connection.execute(text(statement))
+    except Exception as e:
+        logger.warning('Índice de busca de clientes não criado (%s): %s', connection.dialect.name, e)
+
+
+@event.listens_for(Client.__table__, 'after_create')
+def _create_client_name_index(target, connection, **kw):
+    create_client_name_index(connection)
 
 
 class Appointment(db.Model):
     __tablename__ = 'appointments'
+    __table_args__ = (
+        # Agenda do médium num intervalo (horários livres descontam as reservas)
+        db.Index('ix_appointments_medium_data_hora', 'medium_id', 'data_hora'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     client_id = db.Column(db.Integer, db.ForeignKey('clients.id'), nullable=False)
@@ -65,16 +179,22 @@ class Appointment(db.Model):
     proxima_consulta = db.Column(db.Date, nullable=True)
     
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
-    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, index=True)
     
     # Relacionamentos
     medium = db.relationship('User', backref='atendimentos')
     
+    # Prévias calculadas no SQL (ver text_load_options)
+    relatorio_preview = db.query_expression()
+    orientacoes_preview = db.query_expression()
+    
+    __text_previews__ = {'relatorio': 'relatorio_preview', 'orientacoes': 'orientacoes_preview'}
+    
     def __repr__(self):
         return f'<Appointment {self.client.nome} - {self.data_hora}>'
     
-    def to_dict(self):
-        return {
+    def to_dict(self, full=True):
+        data = {
             'id': self.id,
             'client_id': self.client_id,
             'data_hora': self.data_hora.isoformat() if self.data_hora else None,
@@ -85,16 +205,33 @@ class Appointment(db.Model):
             'valor': float(self.valor) if self.valor else None,
             'metodo_pagamento': self.metodo_pagamento,
             'status_pagamento': self.status_pagamento,
-            'relatorio': self.relatorio,
-            'orientacoes': self.orientacoes,
             'proxima_consulta': self.proxima_consulta.isoformat() if self.proxima_consulta else None,
             'created_at': self.created_at.isoformat() if self.created_at else None,
             'updated_at': self.updated_at.isoformat() if self.updated_at else None
         }
+        
+        if full:
+            data['relatorio'] = self.relatorio
+            data['orientacoes'] = self.orientacoes
+        else:
+            data['relatorio_preview'] = text_preview(self, 'relatorio')
+            data['orientacoes_preview'] = text_preview(self, 'orientacoes')
+            
+        return data
 
 
 class AppointmentSlot(db.Model):
+    """Horário concreto: só existe quando foi reservado ou alterado à mão
+
+    Os horários livres vêm das regras de disponibilidade (AvailabilityRule),
+    expandidas na consulta; a linha aqui sobrepõe o horário virtual de mesmo
+    início. A restrição única impede duas reservas do mesmo horário.
+    """
     __tablename__ = 'appointment_slots'
+    __table_args__ = (
+        db.UniqueConstraint('medium_id', 'data', 'hora_inicio', name='uq_appointment_slots_medium_inicio'),
+        db.Index('ix_appointment_slots_data_medium', 'data', 'medium_id'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     data = db.Column(db.Date, nullable=False)
@@ -104,6 +241,10 @@ class AppointmentSlot(db.Model):
     is_available = db.Column(db.Boolean, default=True, nullable=False)
     observacoes = db.Column(db.Text, nullable=True)
     
+    # Origem do horário e reserva que o ocupa (quando houver)
+    rule_id = db.Column(db.Integer, db.ForeignKey('availability_rules.id'), nullable=True)
+    appointment_id = db.Column(db.Integer, db.ForeignKey('appointments.id'), nullable=True)
+    
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     
     # Relacionamentos
@@ -121,6 +262,81 @@ class AppointmentSlot(db.Model):
             'medium_id': self.medium_id,
             'is_available': self.is_available,
             'observacoes': self.observacoes,
+            'rule_id': self.rule_id,
+            'appointment_id': self.appointment_id,
+            'created_at': self.created_at.isoformat() if self.created_at else None
+        }
+
+
+class AvailabilityRule(db.Model):
+    """Disponibilidade semanal de um médium: a janela é dividida em horários de ``duracao_minutos``"""
+    __tablename__ = 'availability_rules'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    medium_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False, index=True)
+    dia_semana = db.Column(db.Integer, nullable=False)  # 0 = segunda ... 6 = domingo
+    hora_inicio = db.Column(db.Time, nullable=False)
+    hora_fim = db.Column(db.Time, nullable=False)
+    duracao_minutos = db.Column(db.Integer, default=60, nullable=False)
+    
+    # Vigência (valido_ate nulo = sem data para acabar)
+    valido_de = db.Column(db.Date, nullable=False)
+    valido_ate = db.Column(db.Date, nullable=True)
+    is_active = db.Column(db.Boolean, default=True, nullable=False)
+    
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    # Relacionamentos
+    medium = db.relationship('User', backref='regras_disponibilidade')
+    
+    def __repr__(self):
+        return f'<AvailabilityRule Medium:{self.medium_id} {self.dia_semana} {self.hora_inicio}-{self.hora_fim}>'
+    
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'medium_id': self.medium_id,
+            'dia_semana': self.dia_semana,
+            'hora_inicio': self.hora_inicio.isoformat() if self.hora_inicio else None,
+            'hora_fim': self.hora_fim.isoformat() if self.hora_fim else None,
+            'duracao_minutos': self.duracao_minutos,
+            'valido_de': self.valido_de.isoformat() if self.valido_de else None,
+            'valido_ate': self.valido_ate.isoformat() if self.valido_ate else None,
+            'is_active': self.is_active,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'updated_at': self.updated_at.isoformat() if self.updated_at else None
+        }
+
+
+class AvailabilityException(db.Model):
+    """Período sem atendimento (férias, feriados); sem médium vale para o terreiro todo"""
+    __tablename__ = 'availability_exceptions'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    medium_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=True, index=True)
+    data_inicio = db.Column(db.Date, nullable=False)
+    data_fim = db.Column(db.Date, nullable=False)
+    
+    # Janela do dia (nula = dia inteiro)
+    hora_inicio = db.Column(db.Time, nullable=True)
+    hora_fim = db.Column(db.Time, nullable=True)
+    motivo = db.Column(db.String(200), nullable=True)
+    
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    def __repr__(self):
+        return f'<AvailabilityException {self.data_inicio} - {self.data_fim}>'
+    
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'medium_id': self.medium_id,
+            'data_inicio': self.data_inicio.isoformat() if self.data_inicio else None,
+            'data_fim': self.data_fim.isoformat() if self.data_fim else None,
+            'hora_inicio': self.hora_inicio.isoformat() if self.hora_inicio else None,
+            'hora_fim': self.hora_fim.isoformat() if self.hora_fim else None,
+            'motivo': self.motivo,
             'created_at': self.created_at.isoformat() if self.created_at else None
         }
 
@@ -0,0 +1,308 @@
+"""Arquivamento das partes frias das tabelas de histórico
+
+As linhas antigas de presenças, acessos à biblioteca, movimentações de
+estoque, mensagens de WhatsApp e posts do fórum saem da tabela quente para
+``<tabela>_archive`` em lotes, e as leituras só juntam o arquivo (UNION ALL)
+quando o intervalo pedido começa antes do limite publicado.
+
+O limite de cada tabela é publicado numa execução e aplicado só na seguinte,
+depois de todos os workers terem recarregado o cache de limites: assim
+nenhuma leitura deixa de olhar o arquivo para linhas que já foram movidas.
+"""
+import threading
+import time
+from datetime import datetime, timedelta
+
+import click
+from sqlalchemy import func, select, text
+from sqlalchemy.orm import aliased
+
+from src.models.user import db
+from src.models.library import ForumPost
+from src.models.appointment import WhatsAppMessage
+from src.models.archive import ARCHIVED_MODELS, ARCHIVE_TABLES, ArchiveWatermark
+from src.services.scheduler import get_scheduler
+from src.services.tenancy import current_tenant
+
+DEFAULT_ARCHIVE_INTERVAL = 6 * 3600
+DEFAULT_ARCHIVE_BATCH_SIZE = 5000
+WATERMARK_CACHE_TTL = 60
+
+# Dias que cada tabela mantém na parte quente
+DEFAULT_RETENTION_DAYS = {
+    'attendance': 730,
+    'content_accesses': 180,
+    'inventory_movements': 365,
+    'whatsapp_messages': 90,
+    'forum_posts': 730,
+}
+
+
+def _cold_criteria(model):
+    """Condições extras para uma linha poder ir para o arquivo"""
+    if model is WhatsAppMessage:
+        # Mensagens ainda na fila de envio ficam na tabela quente
+        return [WhatsAppMessage.status != 'pendente']
+    return []
+
+
+class WatermarkCache:
+    """Limites publicados, relidos do banco no máximo a cada ``ttl`` segundos (por terreiro)"""
+
+    def __init__(self, ttl=WATERMARK_CACHE_TTL):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._loaded = {}  # terreiro -> (carregado em, {tabela: (archived_before, rows_archived)})
+
+    def get(self):
+        tenant = current_tenant()
+        now = time.monotonic()
+        with self._lock:
+            loaded = self._loaded.get(tenant)
+            if loaded is not None and now - loaded[0] < self.ttl:
+                return loaded[1]
+        rows = db.session.execute(select(
+            ArchiveWatermark.table_name, ArchiveWatermark.archived_before, ArchiveWatermark.rows_archived
+        )).all()
+        watermarks = {name: (archived_before, rows_archived) for name, archived_before, rows_archived in rows}
+        with self._lock:
+            self._loaded[tenant] = (now, watermarks)
+        return watermarks
+
+    def clear(self):
+        with self._lock:
+            self._loaded.clear()
+
+
+watermark_cache = WatermarkCache()
+
+
+def archived_before(model):
+    """Limite publicado da tabela; None se ela nunca foi arquivada"""
+    watermark = watermark_cache.get().get(model.__tablename__)
+    return watermark[0] if watermark else None
+
+
+def needs_archive(model, since=None):
+    """O intervalo que começa em ``since`` (None = desde sempre) alcança o arquivo?"""
+    boundary = archived_before(model)
+    return boundary is not None and (since is None or since < boundary)
+
+
+def history_source(model, since=None):
+    """Entidade para consultar o histórico a partir de ``since``
+
+    Retorna o próprio modelo quando o intervalo está todo na parte quente;
+    senão um alias do modelo sobre ``tabela UNION ALL tabela_archive``, usado
+    nas consultas no lugar do modelo. As instâncias vindas do arquivo são só
+    para leitura.
+    """
+    if not needs_archive(model, since):
+        return model
+    return _with_archive(model)
+
+
+def changed_history_source(model, since=None):
+    """Entidade para buscar as linhas alteradas (``updated_at``) a partir de ``since``
+
+    As linhas vão para o arquivo pela coluna de tempo do ARCHIVED_MODELS, mas
+    podem ter sido alteradas pouco antes de movidas: o arquivo só entra se
+    tiver alguma linha alterada desde ``since`` (None = desde sempre).
+    """
+    if archived_before(model) is None:
+        return model
+    if since is not None:
+        archive = ARCHIVE_TABLES[model]
+        changed = db.session.execute(
+            select(archive.c.id).where(archive.c.updated_at >= since).limit(1)
+        ).first()
+        if changed is None:
+            return model
+    return _with_archive(model)
+
+
+def gira_attendance_since(gira):
+    """Início das presenças de uma gira, para ``history_source(Attendance, since=...)``
+
+    As presenças são gravadas depois de a gira ser cadastrada; o menor entre
+    o cadastro e a data cobre também as giras lançadas depois de acontecerem.
+    """
+    if gira.created_at is None:
+        return gira.data_hora
+    return min(gira.created_at, gira.data_hora)
+
+
+def _with_archive(model):
+    hot = model.__table__
+    archive = ARCHIVE_TABLES[model]
+    union = select(*hot.c).union_all(
+        select(*[archive.c[column.name] for column in hot.c])
+    ).subquery(f'{hot.name}_all')
+    return aliased(model, union)
+
+
+class _ArchivedTopicStats:
+    """Total e último post arquivado por tópico, recalculado só quando o arquivo muda"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stats = {}  # terreiro -> (linhas arquivadas, {tópico: (total, último)})
+
+    def get(self):
+        watermark = watermark_cache.get().get(ForumPost.__tablename__)
+        if watermark is None:
+            return {}
+        tenant = current_tenant()
+        rows_archived = watermark[1]
+        with self._lock:
+            cached = self._stats.get(tenant)
+            if cached is not None and cached[0] == rows_archived:
+                return cached[1]
+        archive = ARCHIVE_TABLES[ForumPost]
+        rows = db.session.execute(select(
+            archive.c.topic_id, func.count(), func.max(archive.c.created_at)
+        ).group_by(archive.c.topic_id)).all()
+        stats = {topic_id: (count, last_post_at) for topic_id, count, last_post_at in rows}
+        with self._lock:
+            self._stats[tenant] = (rows_archived, stats)
+        return stats
+
+
+archived_topic_stats = _ArchivedTopicStats()
+
+
+def _ensure_partitions(archive, first, last):
+    """Partições anuais do arquivo no PostgreSQL para o intervalo [first, last]"""
+    if db.session.get_bind().dialect.name != 'postgresql':
+        return
+    for year in range(first.year, last.year + 1):
+        db.session.execute(text(
+            f'CREATE TABLE IF NOT EXISTS {archive.name}_{year} PARTITION OF {archive.name} '
+            f"FOR VALUES FROM ('{year}-01-01') TO ('{year + 1}-01-01')"
+        ))
+    db.session.commit()
+
+
+def move_cold_rows(model, before, batch_size=DEFAULT_ARCHIVE_BATCH_SIZE):
+    """Move para o arquivo, em lotes (INSERT ... SELECT + DELETE por id), as linhas anteriores a ``before``"""
+    time_column_name = ARCHIVED_MODELS[model][0]
+    hot = model.__table__
+    archive = ARCHIVE_TABLES[model]
+    time_column = hot.c[time_column_name]
+
+    # A linha de maior id fica sempre na tabela quente: o SQLite reaproveitaria
+    # ids se a tabela esvaziasse, e o id precisa ser único entre quente e arquivo
+    cold = [
+        time_column < before,
+        hot.c.id < select(func.max(hot.c.id)).scalar_subquery(),
+        *_cold_criteria(model)
+    ]
+    first = db.session.execute(select(func.min(time_column)).where(*cold)).scalar()
+    if first is None:
+        return 0
+    _ensure_partitions(archive, first, before)
+
+    columns = [column.name for column in hot.c]
+    moved = 0
+    while True:
+        ids = db.session.execute(
+            select(hot.c.id).where(*cold).order_by(hot.c.id).limit(batch_size)
+        ).scalars().all()
+        if not ids:
+            break
+        try:
+            db.session.execute(archive.insert().from_select(columns, select(*hot.c).where(hot.c.id.in_(ids))))
+            db.session.execute(hot.delete().where(hot.c.id.in_(ids)))
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+        moved += len(ids)
+        if len(ids) < batch_size:
+            break
+    return moved
+
+
+def _pending(watermark):
+    """Há um limite publicado que ainda não foi aplicado?"""
+    return watermark is not None and watermark.moved_before != watermark.archived_before
+
+
+def archive_history(retention_days=None, batch_size=DEFAULT_ARCHIVE_BATCH_SIZE, safe_delay=2 * WATERMARK_CACHE_TTL,
+                    now=None):
+    """Uma rodada do arquivamento para todas as tabelas
+
+    Primeiro aplica o limite publicado há mais de ``safe_delay`` segundos
+    (move as linhas), depois publica o novo limite para a próxima rodada.
+    """
+    started = time.perf_counter()
+    now = now or datetime.utcnow()
+    retention_days = {**DEFAULT_RETENTION_DAYS, **(retention_days or {})}
+
+    tables = {}
+    for model in ARCHIVED_MODELS:
+        name = model.__tablename__
+        watermark = db.session.get(ArchiveWatermark, name)
+        moved = 0
+
+        if _pending(watermark) and (now - watermark.published_at).total_seconds() >= safe_delay:
+            moved = move_cold_rows(model, watermark.archived_before, batch_size=batch_size)
+            watermark = db.session.get(ArchiveWatermark, name)
+            watermark.moved_before = watermark.archived_before
+            watermark.rows_archived += moved
+
+        boundary = now - timedelta(days=retention_days[name])
+        if watermark is None:
+            watermark = ArchiveWatermark(table_name=name, archived_before=boundary, published_at=now, rows_archived=0)
+            db.session.add(watermark)
+        elif boundary > watermark.archived_before and not _pending(watermark):
+            # Só avança depois que o limite anterior foi aplicado
+            watermark.archived_before = boundary
+            watermark.published_at = now
+        db.session.commit()
+
+        tables[name] = {'moved': moved, **watermark.to_dict()}
+
+    return {
+        'tables': tables,
+        'count': sum(table['moved'] for table in tables.values()),
+        'duration_ms': round((time.perf_counter() - started) * 1000, 2)
+    }
+
+
+def _archive_job(app):
+    result = archive_history(
+        retention_days=app.config['ARCHIVE_RETENTION_DAYS'],
+        batch_size=app.config['ARCHIVE_BATCH_SIZE']
+    )
+    if result['count']:
+        app.logger.info('%d linhas movidas para o arquivo em %.1fms', result['count'], result['duration_ms'])
+    return result
+
+
+def init_archival(app):
+    """Registra o arquivamento periódico das tabelas de histórico e o comando CLI"""
+    app.config.setdefault('ARCHIVE_INTERVAL', DEFAULT_ARCHIVE_INTERVAL)
+    app.config.setdefault('ARCHIVE_BATCH_SIZE', DEFAULT_ARCHIVE_BATCH_SIZE)
+    app.config.setdefault('ARCHIVE_RETENTION_DAYS', {})
+    # O intervalo precisa cobrir a recarga do cache de limites em todos os workers
+    interval = max(app.config['ARCHIVE_INTERVAL'], 2 * WATERMARK_CACHE_TTL)
+    get_scheduler(app).add_job('archive_history', _archive_job, interval)
+
+    @app.cli.command('archive-history')
+    @click.option('--wait', is_flag=True, help='Aguardar a publicação do limite e já mover as linhas')
+    def archive_history_command(wait):
+        """Mover as linhas frias das tabelas de histórico para o arquivo"""
+        options = {
+            'retention_days': app.config['ARCHIVE_RETENTION_DAYS'],
+            'batch_size': app.config['ARCHIVE_BATCH_SIZE']
+        }
+        result = archive_history(**options)
+        if wait and any(table['moved_before'] != table['archived_before'] for table in result['tables'].values()):
+            click.echo(f'Limites publicados; aguardando {2 * WATERMARK_CACHE_TTL}s para mover as linhas...')
+            time.sleep(2 * WATERMARK_CACHE_TTL)
+            result = archive_history(**options)
+        for name, table in result['tables'].items():
+            click.echo(f"{name}: {table['moved']} movidas, arquivo até {table['moved_before'] or '-'} "
+                       f"({table['rows_archived']} linhas), próximo limite {table['archived_before']}")
+        click.echo(f"Concluído em {result['duration_ms']}ms")
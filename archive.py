@@ -0,0 +1,69 @@
+import sqlalchemy as sa
+
+from src.models.user import db, Attendance
+from src.models.library import ContentAccess, ForumPost
+from src.models.inventory import InventoryMovement
+from src.models.appointment import WhatsAppMessage
+
+# Tabelas só de acréscimo que têm parte fria: modelo -> (coluna de tempo, índices do arquivo)
+ARCHIVED_MODELS = {
+    Attendance: ('created_at', [('user_id', 'created_at'), ('gira_id',), ('updated_at',)]),
+    ContentAccess: ('access_time', [('user_id',), ('content_id',)]),
+    InventoryMovement: ('created_at', [('item_id', 'created_at')]),
+    WhatsAppMessage: ('created_at', [('telefone',), ('appointment_id',)]),
+    ForumPost: ('created_at', [('topic_id', 'created_at', 'id')]),
+}
+
+
+def _archive_table(model, time_column, indexes):
+    """Cópia das colunas da tabela quente, sem chaves nem restrições
+
+    No PostgreSQL o arquivo é particionado por ano na coluna de tempo (as
+    partições são criadas pelo services/archival antes de mover as linhas);
+    no SQLite é uma tabela comum.
+    """
+    hot = model.__table__
+    name = f'{hot.name}_archive'
+    columns = [sa.Column(column.name, column.type, nullable=column.nullable) for column in hot.columns]
+    return sa.Table(
+        name, db.metadata, *columns,
+        # Não é único: no particionado, um índice único teria de incluir a coluna de tempo
+        sa.Index(f'ix_{name}_id', 'id'),
+        sa.Index(f'ix_{name}_{time_column}', time_column),
+        *[sa.Index(f'ix_{name}_{"_".join(index_columns)}', *index_columns) for index_columns in indexes],
+        postgresql_partition_by=f'RANGE ({time_column})'
+    )
+
+
+ARCHIVE_TABLES = {
+    model: _archive_table(model, time_column, indexes)
+    for model, (time_column, indexes) in ARCHIVED_MODELS.items()
+}
+
+
+class ArchiveWatermark(db.Model):
+    """Limite entre a parte quente e o arquivo de cada tabela
+
+    Linhas com a coluna de tempo anterior a ``archived_before`` podem estar
+    no arquivo; as posteriores estão sempre na tabela quente. O limite é
+    publicado antes de as linhas serem movidas (ver services/archival).
+    """
+    __tablename__ = 'archive_watermarks'
+
+    table_name = db.Column(db.String(50), primary_key=True)
+    archived_before = db.Column(db.DateTime, nullable=False)
+    published_at = db.Column(db.DateTime, nullable=False)
+    moved_before = db.Column(db.DateTime, nullable=True)  # Limite já aplicado pelo mover
+    rows_archived = db.Column(db.Integer, default=0, nullable=False)
+
+    def __repr__(self):
+        return f'<ArchiveWatermark {self.table_name} < {self.archived_before}>'
+
+    def to_dict(self):
+        return {
+            'table': self.table_name,
+            'archived_before': self.archived_before.isoformat() if self.archived_before else None,
+            'published_at': self.published_at.isoformat() if self.published_at else None,
+            'moved_before': self.moved_before.isoformat() if self.moved_before else None,
+            'rows_archived': self.rows_archived
+        }
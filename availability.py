@@ -0,0 +1,275 @@
+from datetime import date, time
+
+from flask import Blueprint, request, jsonify
+from flask_jwt_extended import jwt_required, get_jwt_identity
+from src.models.user import db, User
+from src.models.appointment import AvailabilityRule, AvailabilityException
+from src.services.availability_service import (
+    SlotError, validate_rule, list_slots, slot_to_dict, book_slot, override_slot
+)
+
+availability_bp = Blueprint('availability', __name__)
+
+
+def _can_manage(user, medium_id):
+    """O próprio médium ou a recepção (tesoureiros) cuidam da agenda"""
+    return user.id == medium_id or user.is_tesoureiro()
+
+
+def _date(value, field):
+    try:
+        return date.fromisoformat(value)
+    except (TypeError, ValueError):
+        raise ValueError(f'{field} deve ser uma data AAAA-MM-DD')
+
+
+def _time(value, field):
+    try:
+        return time.fromisoformat(value)
+    except (TypeError, ValueError):
+        raise ValueError(f'{field} deve ser um horário HH:MM')
+
+
+@availability_bp.route('/availability/rules', methods=['GET'])
+@jwt_required()
+def get_rules():
+    """Listar regras de disponibilidade (medium_id opcional)"""
+    try:
+        user = User.query.get(get_jwt_identity())
+
+        if not user:
+            return jsonify({'error': 'Usuário não encontrado'}), 404
+
+        query = AvailabilityRule.query.filter_by(is_active=True)
+        medium_id = request.args.get('medium_id', type=int)
+        if medium_id:
+            query = query.filter_by(medium_id=medium_id)
+
+        rules = query.order_by(AvailabilityRule.medium_id, AvailabilityRule.dia_semana,
+                               AvailabilityRule.hora_inicio).all()
+
+        return jsonify({'rules': [rule.to_dict() for rule in rules]}), 200
+
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@availability_bp.route('/availability/rules', methods=['POST'])
+@jwt_required()
+def create_rule():
+    """Criar regra semanal de disponibilidade (o próprio médium ou tesoureiros)"""
+    try:
+        user = User.query.get(get_jwt_identity())
+
+        if not user:
+            return jsonify({'error': 'Usuário não encontrado'}), 404
+
+        data = request.get_json() or {}
+        medium_id = data.get('medium_id', user.id)
+
+        if not _can_manage(user, medium_id):
+            return jsonify({'error': 'Acesso negado'}), 403
+
+        if not User.query.get(medium_id):
+            return jsonify({'error': 'Médium não encontrado'}), 404
+
+        rule = AvailabilityRule(
+            medium_id=medium_id,
+            dia_semana=data.get('dia_semana'),
+            hora_inicio=_time(data.get('hora_inicio'), 'hora_inicio'),
+            hora_fim=_time(data.get('hora_fim'), 'hora_fim'),
+            duracao_minutos=data.get('duracao_minutos', 60),
+            valido_de=_date(data['valido_de'], 'valido_de') if data.get('valido_de') else date.today(),
+            valido_ate=_date(data['valido_ate'], 'valido_ate') if data.get('valido_ate') else None
+        )
+        validate_rule(rule.dia_semana, rule.hora_inicio, rule.hora_fim, rule.duracao_minutos,
+                      rule.valido_de, rule.valido_ate)
+
+        db.session.add(rule)
+        db.session.commit()
+
+        return jsonify({
+            'message': 'Regra criada com sucesso',
+            'rule': rule.to_dict()
+        }), 201
+
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 500
+
+@availability_bp.route('/availability/rules/<int:rule_id>', methods=['DELETE'])
+@jwt_required()
+def delete_rule(rule_id):
+    """Desativar regra (horários já reservados continuam gravados)"""
+    try:
+        user = User.query.get(get_jwt_identity())
+
+        if not user:
+            return jsonify({'error': 'Usuário não encontrado'}), 404
+
+        rule = AvailabilityRule.query.get(rule_id)
+        if not rule:
+            return jsonify({'error': 'Regra não encontrada'}), 404
+
+        if not _can_manage(user, rule.medium_id):
+            return jsonify({'error': 'Acesso negado'}), 403
+
+        rule.is_active = False
+        db.session.commit()
+
+        return jsonify({'message': 'Regra desativada com sucesso'}), 200
+
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 500
+
+@availability_bp.route('/availability/exceptions', methods=['POST'])
+@jwt_required()
+def create_exception():
+    """Registrar período sem atendimento; sem medium_id vale para todos (apenas tesoureiros)"""
+    try:
+        user = User.query.get(get_jwt_identity())
+
+        if not user:
+            return jsonify({'error': 'Usuário não encontrado'}), 404
+
+        data = request.get_json() or {}
+        medium_id = data.get('medium_id')
+
+        if not (user.is_tesoureiro() if medium_id is None else _can_manage(user, medium_id)):
+            return jsonify({'error': 'Acesso negado'}), 403
+
+        data_inicio = _date(data.get('data_inicio'), 'data_inicio')
+        data_fim = _date(data['data_fim'], 'data_fim') if data.get('data_fim') else data_inicio
+        if data_fim < data_inicio:
+            return jsonify({'error': 'Data final anterior à inicial'}), 400
+
+        hora_inicio = _time(data['hora_inicio'], 'hora_inicio') if data.get('hora_inicio') else None
+        hora_fim = _time(data['hora_fim'], 'hora_fim') if data.get('hora_fim') else None
+        if (hora_inicio is None) != (hora_fim is None) or (hora_inicio and hora_fim <= hora_inicio):
+            return jsonify({'error': 'Informe hora_inicio e hora_fim juntos (ou nenhum, para o dia inteiro)'}), 400
+
+        exception = AvailabilityException(
+            medium_id=medium_id,
+            data_inicio=data_inicio,
+            data_fim=data_fim,
+            hora_inicio=hora_inicio,
+            hora_fim=hora_fim,
+            motivo=data.get('motivo')
+        )
+        db.session.add(exception)
+        db.session.commit()
+
+        return jsonify({
+            'message': 'Exceção registrada com sucesso',
+            'exception': exception.to_dict()
+        }), 201
+
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 500
+
+@availability_bp.route('/slots', methods=['GET'])
+@jwt_required()
+def get_slots():
+    """Horários livres entre inicio e fim (AAAA-MM-DD), gerados a partir das regras"""
+    try:
+        user = User.query.get(get_jwt_identity())
+
+        if not user:
+            return jsonify({'error': 'Usuário não encontrado'}), 404
+
+        inicio = _date(request.args.get('inicio'), 'inicio')
+        fim = _date(request.args['fim'], 'fim') if request.args.get('fim') else inicio
+        include_booked = request.args.get('todos') == '1'
+
+        slots = list_slots(inicio, fim, medium_id=request.args.get('medium_id', type=int),
+                           include_booked=include_booked)
+
+        return jsonify({'slots': [slot_to_dict(slot) for slot in slots]}), 200
+
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@availability_bp.route('/slots', methods=['PUT'])
+@jwt_required()
+def update_slot():
+    """Bloquear/liberar um horário ou criar um avulso (o próprio médium ou tesoureiros)"""
+    try:
+        user = User.query.get(get_jwt_identity())
+
+        if not user:
+            return jsonify({'error': 'Usuário não encontrado'}), 404
+
+        data = request.get_json() or {}
+        medium_id = data.get('medium_id', user.id)
+
+        if not _can_manage(user, medium_id):
+            return jsonify({'error': 'Acesso negado'}), 403
+
+        if 'is_available' not in data:
+            return jsonify({'error': 'is_available é obrigatório'}), 400
+
+        row = override_slot(
+            medium_id,
+            _date(data.get('data'), 'data'),
+            _time(data.get('hora_inicio'), 'hora_inicio'),
+            is_available=bool(data['is_available']),
+            hora_fim=_time(data['hora_fim'], 'hora_fim') if data.get('hora_fim') else None,
+            observacoes=data.get('observacoes')
+        )
+
+        return jsonify({
+            'message': 'Horário atualizado com sucesso',
+            'slot': row.to_dict()
+        }), 200
+
+    except SlotError as e:
+        return jsonify({'error': str(e)}), 409
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@availability_bp.route('/slots/book', methods=['POST'])
+@jwt_required()
+def book():
+    """Reservar um horário para um cliente (tesoureiros)"""
+    try:
+        user = User.query.get(get_jwt_identity())
+
+        if not user or not user.is_tesoureiro():
+            return jsonify({'error': 'Acesso negado'}), 403
+
+        data = request.get_json() or {}
+
+        if not data.get('client_id') or not data.get('medium_id') or not data.get('motivo'):
+            return jsonify({'error': 'Cliente, médium e motivo são obrigatórios'}), 400
+
+        appointment, row = book_slot(
+            data['client_id'],
+            data['medium_id'],
+            _date(data.get('data'), 'data'),
+            _time(data.get('hora_inicio'), 'hora_inicio'),
+            data['motivo'],
+            entidade_indicada=data.get('entidade_indicada'),
+            valor=data.get('valor')
+        )
+
+        return jsonify({
+            'message': 'Atendimento agendado com sucesso',
+            'appointment': appointment.to_dict(),
+            'slot': row.to_dict()
+        }), 201
+
+    except SlotError as e:
+        return jsonify({'error': str(e)}), 409
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
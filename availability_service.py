@@ -0,0 +1,294 @@
+"""Horários de atendimento gerados a partir das regras de disponibilidade
+
+Os horários livres não ficam gravados: cada consulta expande as regras
+semanais dos médiuns no intervalo pedido, tira as exceções (férias,
+feriados) e as reservas (Appointment), e aplica por cima as linhas de
+AppointmentSlot, que só existem para horários reservados ou alterados à mão.
+Um trimestre da agenda custa quatro consultas pequenas e um laço em memória.
+"""
+from datetime import date, datetime, time, timedelta
+
+from sqlalchemy.exc import IntegrityError
+
+from src.models.user import db
+from src.models.appointment import (
+    Appointment, AppointmentSlot, AvailabilityException, AvailabilityRule, Client
+)
+
+MAX_RANGE_DAYS = 120
+MIN_SLOT_MINUTES = 5
+INACTIVE_APPOINTMENT_STATUSES = ('cancelado',)
+
+
+class SlotError(ValueError):
+    """Horário inexistente, já reservado ou regra inválida"""
+
+
+def _add_minutes(value, minutes):
+    return (datetime.combine(date.min, value) + timedelta(minutes=minutes)).time()
+
+
+def validate_rule(dia_semana, hora_inicio, hora_fim, duracao_minutos, valido_de, valido_ate=None):
+    if dia_semana not in range(7):
+        raise SlotError('Dia da semana deve ser de 0 (segunda) a 6 (domingo)')
+    if hora_fim <= hora_inicio:
+        raise SlotError('A janela precisa terminar depois de começar')
+    if not isinstance(duracao_minutos, int) or duracao_minutos < MIN_SLOT_MINUTES:
+        raise SlotError(f'Duração mínima de {MIN_SLOT_MINUTES} minutos')
+    if _add_minutes(hora_inicio, duracao_minutos) > hora_fim:
+        raise SlotError('A janela não comporta nenhum horário dessa duração')
+    if valido_ate is not None and valido_ate < valido_de:
+        raise SlotError('Fim da vigência anterior ao início')
+
+
+def _day_times(rule):
+    """Horários (início, fim) de um dia da regra"""
+    times = []
+    start = datetime.combine(date.min, rule.hora_inicio)
+    window_end = datetime.combine(date.min, rule.hora_fim)
+    step = timedelta(minutes=rule.duracao_minutos)
+    while start + step <= window_end:
+        times.append((start.time(), (start + step).time()))
+        start += step
+    return times
+
+
+def _rule_days(rule, start, end):
+    """Datas entre ``start`` e ``end`` (inclusive) em que a regra vale"""
+    first = max(start, rule.valido_de)
+    last = min(end, rule.valido_ate) if rule.valido_ate else end
+    day = first + timedelta(days=(rule.dia_semana - first.weekday()) % 7)
+    while day <= last:
+        yield day
+        day += timedelta(days=7)
+
+
+def expand_rule(rule, start, end):
+    """Horários virtuais da regra entre ``start`` e ``end`` (datas, inclusive)"""
+    times = _day_times(rule)
+    for day in _rule_days(rule, start, end):
+        for hora_inicio, hora_fim in times:
+            yield day, hora_inicio, hora_fim
+
+
+def _exceptions_by_day(exceptions, start, end):
+    """Exceções do intervalo por data: dia -> [(médium ou None, início, fim)]"""
+    by_day = {}
+    for exception in exceptions:
+        window = (exception.medium_id, exception.hora_inicio, exception.hora_fim)
+        day = max(start, exception.data_inicio)
+        last = min(end, exception.data_fim)
+        while day <= last:
+            by_day.setdefault(day, []).append(window)
+            day += timedelta(days=1)
+    return by_day
+
+
+def list_slots(start, end, medium_id=None, include_booked=False):
+    """Horários dos médiuns entre as datas ``start`` e ``end`` (inclusive), em ordem
+
+    Cada item traz ``id`` (None para horário virtual, ainda não gravado) e
+    ``is_available``; sem ``include_booked`` só os livres são retornados.
+    """
+    if end < start:
+        raise SlotError('Data final anterior à inicial')
+    if (end - start).days >= MAX_RANGE_DAYS:
+        raise SlotError(f'Intervalo máximo de {MAX_RANGE_DAYS} dias')
+
+    rules = AvailabilityRule.query.filter(
+        AvailabilityRule.is_active.is_(True),
+        AvailabilityRule.valido_de <= end,
+        db.or_(AvailabilityRule.valido_ate.is_(None), AvailabilityRule.valido_ate >= start)
+    )
+    exceptions = AvailabilityException.query.filter(
+        AvailabilityException.data_inicio <= end,
+        AvailabilityException.data_fim >= start
+    )
+    rows = AppointmentSlot.query.filter(AppointmentSlot.data.between(start, end))
+    bookings = db.session.query(Appointment.id, Appointment.medium_id, Appointment.data_hora).filter(
+        Appointment.data_hora >= datetime.combine(start, time.min),
+        Appointment.data_hora < datetime.combine(end + timedelta(days=1), time.min),
+        Appointment.status.notin_(INACTIVE_APPOINTMENT_STATUSES),
+        Appointment.medium_id.isnot(None)
+    )
+    if medium_id is not None:
+        rules = rules.filter(AvailabilityRule.medium_id == medium_id)
+        exceptions = exceptions.filter(db.or_(
+            AvailabilityException.medium_id.is_(None), AvailabilityException.medium_id == medium_id
+        ))
+        rows = rows.filter(AppointmentSlot.medium_id == medium_id)
+        bookings = bookings.filter(Appointment.medium_id == medium_id)
+    exceptions = _exceptions_by_day(exceptions.all(), start, end)
+
+    slots = {}
+    for rule in rules.all():
+        rule_medium, rule_id = rule.medium_id, rule.id
+        times = _day_times(rule)
+        for day in _rule_days(rule, start, end):
+            windows = [
+                (hora_inicio, hora_fim) for medium, hora_inicio, hora_fim in exceptions.get(day, ())
+                if medium is None or medium == rule_medium
+            ]
+            if any(hora_inicio is None for hora_inicio, _hora_fim in windows):
+                continue  # Dia inteiro bloqueado
+            for hora_inicio, hora_fim in times:
+                if windows and any(hora_inicio < fim and hora_fim > inicio for inicio, fim in windows):
+                    continue
+                slots[(rule_medium, day, hora_inicio)] = {
+                    'id': None,
+                    'medium_id': rule_medium,
+                    'data': day,
+                    'hora_inicio': hora_inicio,
+                    'hora_fim': hora_fim,
+                    'rule_id': rule_id,
+                    'is_available': True,
+                    'appointment_id': None,
+                    'observacoes': None
+                }
+
+    booked = {}  # (médium, dia) -> [(hora, id da reserva)]
+    active = set()
+    for appointment_id, booking_medium, data_hora in bookings.all():
+        booked.setdefault((booking_medium, data_hora.date()), []).append((data_hora.time(), appointment_id))
+        active.add(appointment_id)
+
+    # Linhas gravadas sobrepõem o horário virtual (ou criam um horário avulso)
+    for row in rows.all():
+        # Reserva cancelada libera o horário que ela tinha gravado
+        released = row.appointment_id is not None and row.appointment_id not in active
+        slots[(row.medium_id, row.data, row.hora_inicio)] = {
+            'id': row.id,
+            'medium_id': row.medium_id,
+            'data': row.data,
+            'hora_inicio': row.hora_inicio,
+            'hora_fim': row.hora_fim,
+            'rule_id': row.rule_id,
+            'is_available': row.is_available or released,
+            'appointment_id': None if released else row.appointment_id,
+            'observacoes': row.observacoes
+        }
+
+    # Reservas feitas sem passar pelos horários ocupam o que cruzarem
+    for (slot_medium, day, _hora_inicio), slot in slots.items():
+        if (slot_medium, day) not in booked:
+            continue
+        for hora, appointment_id in booked[(slot_medium, day)]:
+            if slot['hora_inicio'] <= hora < slot['hora_fim']:
+                slot['is_available'] = False
+                slot['appointment_id'] = slot['appointment_id'] or appointment_id
+                break
+
+    order = sorted(slots, key=lambda key: (key[1].toordinal(), key[2].hour, key[2].minute, key[0]))
+    return [slots[key] for key in order if include_booked or slots[key]['is_available']]
+
+
+def find_slot(medium_id, day, hora_inicio):
+    for slot in list_slots(day, day, medium_id=medium_id, include_booked=True):
+        if slot['hora_inicio'] == hora_inicio:
+            return slot
+    return None
+
+
+def slot_to_dict(slot):
+    return {
+        **slot,
+        'data': slot['data'].isoformat(),
+        'hora_inicio': slot['hora_inicio'].isoformat(),
+        'hora_fim': slot['hora_fim'].isoformat(),
+        'virtual': slot['id'] is None
+    }
+
+
+def _claim(slot, appointment_id, is_available, observacoes=None):
+    """Grava o horário (ou atualiza a linha se o estado não mudou desde a leitura)"""
+    if slot['id'] is None:
+        row = AppointmentSlot(
+            medium_id=slot['medium_id'],
+            data=slot['data'],
+            hora_inicio=slot['hora_inicio'],
+            hora_fim=slot['hora_fim'],
+            rule_id=slot['rule_id'],
+            is_available=is_available,
+            appointment_id=appointment_id,
+            observacoes=observacoes
+        )
+        db.session.add(row)
+        db.session.flush()  # A restrição única barra a segunda reserva simultânea
+        return row
+
+    # Compara e troca: só atualiza se ninguém mexeu na linha depois da leitura
+    table = AppointmentSlot.__table__
+    previous = db.session.get(AppointmentSlot, slot['id'])
+    updated = db.session.execute(table.update().where(
+        table.c.id == slot['id'],
+        table.c.is_available == previous.is_available,
+        table.c.appointment_id.is_(None) if previous.appointment_id is None
+        else table.c.appointment_id == previous.appointment_id
+    ).values(
+        is_available=is_available,
+        appointment_id=appointment_id,
+        observacoes=observacoes if observacoes is not None else previous.observacoes
+    )).rowcount
+    if updated != 1:
+        raise SlotError('O horário foi alterado por outra pessoa; consulte de novo')
+    db.session.expire(previous)
+    return previous
+
+
+def book_slot(client_id, medium_id, day, hora_inicio, motivo, **appointment_fields):
+    """Reserva o horário: cria o atendimento e grava o horário ocupado na mesma transação"""
+    if not Client.query.get(client_id):
+        raise SlotError('Cliente não encontrado')
+
+    slot = find_slot(medium_id, day, hora_inicio)
+    if slot is None:
+        raise SlotError('Horário não existe na agenda do médium')
+    if not slot['is_available']:
+        raise SlotError('Horário já reservado')
+
+    try:
+        appointment = Appointment(
+            client_id=client_id,
+            medium_id=medium_id,
+            data_hora=datetime.combine(day, hora_inicio),
+            motivo=motivo,
+            **appointment_fields
+        )
+        db.session.add(appointment)
+        db.session.flush()
+        row = _claim(slot, appointment.id, is_available=False)
+        db.session.commit()
+    except IntegrityError:
+        db.session.rollback()
+        raise SlotError('Horário já reservado')
+    except Exception:
+        db.session.rollback()
+        raise
+    return appointment, row
+
+
+def override_slot(medium_id, day, hora_inicio, is_available, hora_fim=None, observacoes=None):
+    """Bloqueia ou libera um horário (ou cria um avulso, com ``hora_fim``), gravando a linha"""
+    slot = find_slot(medium_id, day, hora_inicio)
+    if slot is None:
+        if hora_fim is None:
+            raise SlotError('Horário fora das regras: informe hora_fim para criar um horário avulso')
+        if hora_fim <= hora_inicio:
+            raise SlotError('O horário precisa terminar depois de começar')
+        slot = {
+            'id': None, 'medium_id': medium_id, 'data': day, 'hora_inicio': hora_inicio,
+            'hora_fim': hora_fim, 'rule_id': None, 'is_available': is_available, 'appointment_id': None
+        }
+    elif slot['appointment_id'] is not None:
+        raise SlotError('Horário reservado: cancele o atendimento antes')
+
+    try:
+        row = _claim(slot, None, is_available=is_available, observacoes=observacoes)
+        db.session.commit()
+    except IntegrityError:
+        db.session.rollback()
+        raise SlotError('O horário foi alterado por outra pessoa; consulte de novo')
+    except Exception:
+        db.session.rollback()
+        raise
+    return row
@@ -0,0 +1,29 @@
+from flask import Blueprint, current_app, request, jsonify
+from flask_jwt_extended import jwt_required, get_jwt_identity
+from src.models.user import User
+from src.services.batch_service import BatchError, parse_batch, run_batch
+
+batch_bp = Blueprint('batch', __name__)
+
+@batch_bp.route('/batch', methods=['POST'])
+@jwt_required()
+def batch():
+    """Executar várias chamadas da API numa só requisição (ex.: /api/auth/me e as listas da tela inicial)"""
+    try:
+        # Carregado uma vez: os itens que buscam o usuário o encontram na sessão
+        user = User.query.get(get_jwt_identity())
+
+        if not user:
+            return jsonify({'error': 'Usuário não encontrado'}), 404
+
+        items, parallel = parse_batch(request.get_json(silent=True),
+                                      max_requests=current_app.config['BATCH_MAX_REQUESTS'])
+
+        result = run_batch(items, parallel=parallel, max_workers=current_app.config['BATCH_MAX_WORKERS'])
+
+        return jsonify(result), 200
+
+    except BatchError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
@@ -0,0 +1,172 @@
+"""Várias chamadas da API numa só ida e volta (/api/batch)
+
+Cada item vira uma sub-requisição despachada direto para a view, dentro do
+mesmo contexto da aplicação: o ``g`` (terreiro já escolhido) e a sessão do
+banco são os da requisição do lote, então o usuário carregado por um item
+continua no mapa de identidade da sessão para os seguintes (expirado, é
+relido pela chave primária). Os ganchos before/after_request não rodam para
+os itens (métricas, compressão e Idempotency-Key valem para o lote inteiro),
+por isso os itens não aceitam os cabeçalhos que dependem deles.
+
+Os itens rodam em ordem e cada um confirma a própria transação; o que um
+item deixou sem commit é desfeito antes do seguinte, e um item com erro não
+desfaz os anteriores. Com ``parallel`` (só para GET)
+cada item roda numa thread com contexto e sessão próprios.
+"""
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+from flask import current_app, request
+from werkzeug.exceptions import HTTPException
+from werkzeug.test import EnvironBuilder
+
+from src.models.user import db
+from src.services.tenancy import current_tenant, use_tenant
+
+DEFAULT_MAX_REQUESTS = 20
+DEFAULT_MAX_WORKERS = 4
+METHODS = ('GET', 'POST', 'PUT', 'DELETE')
+PARALLEL_METHODS = ('GET',)
+PATH_PREFIX = '/api/'
+
+# Cabeçalhos do lote que não fazem sentido repassar aos itens
+SKIPPED_HEADERS = {'content-type', 'content-length', 'accept-encoding', 'idempotency-key', 'transfer-encoding'}
+# Cabeçalhos recusados nos itens: o corpo é sempre JSON e os ganchos
+# (Idempotency-Key, compressão) só rodam para o lote
+REJECTED_ITEM_HEADERS = {
+    'idempotency-key', 'content-type', 'content-length', 'content-encoding', 'transfer-encoding', 'host'
+}
+
+
+class BatchError(ValueError):
+    """Lote malformado"""
+
+
+def parse_batch(data, max_requests=DEFAULT_MAX_REQUESTS):
+    """Valida o corpo do lote: {"requests": [{"method", "path", "body", "headers", "id"}], "parallel"}"""
+    if not isinstance(data, dict) or not isinstance(data.get('requests'), list):
+        raise BatchError('Envie {"requests": [...]}')
+    items = data['requests']
+    if not items:
+        raise BatchError('Lote vazio')
+    if len(items) > max_requests:
+        raise BatchError(f'Máximo de {max_requests} requisições por lote')
+
+    parsed = []
+    for index, item in enumerate(items):
+        if not isinstance(item, dict) or not isinstance(item.get('path'), str):
+            raise BatchError(f'Item {index}: path é obrigatório')
+        method = str(item.get('method') or 'GET').upper()
+        if method not in METHODS:
+            raise BatchError(f'Item {index}: método {method} não suportado')
+        path = item['path']
+        if not path.startswith(PATH_PREFIX):
+            raise BatchError(f'Item {index}: só caminhos em {PATH_PREFIX}')
+        headers = item.get('headers') or {}
+        if not isinstance(headers, dict):
+            raise BatchError(f'Item {index}: headers deve ser um objeto')
+        for name in headers:
+            if str(name).lower() in REJECTED_ITEM_HEADERS:
+                raise BatchError(f'Item {index}: cabeçalho {name} não é aceito nos itens do lote')
+        parsed.append({
+            'id': item.get('id', index),
+            'method': method,
+            'path': path,
+            'body': item.get('body'),
+            'headers': {str(name): str(value) for name, value in headers.items()}
+        })
+
+    parallel = bool(data.get('parallel'))
+    if parallel and any(item['method'] not in PARALLEL_METHODS for item in parsed):
+        raise BatchError('O modo paralelo só aceita GET')
+    return parsed, parallel
+
+
+def _environ(item):
+    """Environ WSGI do item, com os cabeçalhos da requisição do lote (Authorization, Host...)"""
+    parts = urlsplit(item['path'])
+    if parts.path.rstrip('/') == request.path.rstrip('/'):
+        raise BatchError('Um lote não pode conter outro lote')
+    # Cabeçalho do item substitui o de mesmo nome do lote (ex.: outro Authorization)
+    headers = {name.lower(): (name, value) for name, value in request.headers if name.lower() not in SKIPPED_HEADERS}
+    headers.update((name.lower(), (name, value)) for name, value in item['headers'].items())
+    builder = EnvironBuilder(
+        path=parts.path,
+        query_string=parts.query,
+        method=item['method'],
+        base_url=request.host_url.rstrip('/') + request.script_root,
+        headers=list(headers.values()),
+        json=item['body'] if item['body'] is not None else None,
+        environ_base={'REMOTE_ADDR': request.remote_addr}
+    )
+    try:
+        return builder.get_environ()
+    finally:
+        builder.close()
+
+
+def _dispatch(app, environ):
+    """Roda a view da sub-requisição e devolve (status, corpo)"""
+    with app.request_context(environ):
+        try:
+            rv = app.dispatch_request()
+        except Exception as e:
+            # Erros HTTP (404, 405) e os tratadores do app (JWT) viram resposta
+            try:
+                rv = app.handle_user_exception(e)
+            except Exception as unhandled:
+                db.session.rollback()
+                return 500, {'error': str(unhandled)}
+        if isinstance(rv, HTTPException):
+            return rv.code, {'error': rv.description}
+        response = app.make_response(rv)
+
+        if response.is_streamed:
+            response.close()
+            return 400, {'error': 'Resposta em fluxo (SSE) não pode ir num lote'}
+        if response.is_json:
+            return response.status_code, response.get_json()
+        return response.status_code, response.get_data(as_text=True)
+
+
+def _dispatch_isolated(app, tenant, environ):
+    # Thread do modo paralelo: contexto, g e sessão próprios
+    with app.app_context():
+        if tenant:
+            use_tenant(app, tenant)
+        return _dispatch(app, environ)
+
+
+def run_batch(items, parallel=False, max_workers=DEFAULT_MAX_WORKERS):
+    """Executa os itens e devolve as respostas na ordem do pedido"""
+    started = time.perf_counter()
+    app = current_app._get_current_object()
+    environs = [_environ(item) for item in items]
+
+    if parallel and len(items) > 1:
+        tenant = current_tenant()
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(items))) as pool:
+            results = list(pool.map(lambda environ: _dispatch_isolated(app, tenant, environ), environs))
+    else:
+        results = []
+        for environ in environs:
+            results.append(_dispatch(app, environ))
+            # O que o item deixou pendente na sessão compartilhada não vaza para o seguinte
+            db.session.rollback()
+
+    return {
+        'responses': [
+            {'id': item['id'], 'status': status, 'body': body}
+            for item, (status, body) in zip(items, results)
+        ],
+        'count': len(items),
+        'parallel': parallel,
+        'duration_ms': round((time.perf_counter() - started) * 1000, 2)
+    }
+
+
+def init_batch(app):
+    """Configura o tamanho máximo do lote e as threads do modo paralelo"""
+    app.config.setdefault('BATCH_MAX_REQUESTS', DEFAULT_MAX_REQUESTS)
+    app.config.setdefault('BATCH_MAX_WORKERS', DEFAULT_MAX_WORKERS)
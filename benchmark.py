@@ -0,0 +1,239 @@
+"""Benchmark de carga repetível para os endpoints da API
+
+Uso:
+    python -m src.services.benchmark --url http://localhost:5000 --concurrency 16 --duration 30
+    python -m src.services.benchmark --in-process --save-baseline bench/baseline.json
+    python -m src.services.benchmark --url http://localhost:5000 --compare bench/baseline.json
+"""
+import argparse
+import json
+import math
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+DEFAULT_EMAIL = 'admin@nziladragao.com'
+DEFAULT_PASSWORD = 'admin123'
+
+# Rotas exercitadas (nome, método, caminho[, corpo]); {gira_id} é preenchido com uma gira real
+DEFAULT_ROUTES = [
+    ('health', 'GET', '/api/health'),
+    ('auth_me', 'GET', '/api/auth/me'),
+    ('giras_list', 'GET', '/api/giras/'),
+    ('gira_detail', 'GET', '/api/giras/{gira_id}'),
+    ('my_attendance', 'GET', '/api/giras/my-attendance'),
+]
+
+
+class HttpTransport:
+    """Envia requisições a um servidor em execução"""
+
+    def __init__(self, base_url, timeout=30):
+        self.base_url = base_url.rstrip('/')
+        self.timeout = timeout
+
+    def request(self, method, path, headers=None, body=None):
+        data = json.dumps(body).encode('utf-8') if body is not None else None
+        req = urllib.request.Request(self.base_url + path, data=data, method=method, headers=dict(headers or {}))
+        if data is not None:
+            req.add_header('Content-Type', 'application/json')
+        try:
+            with urllib.request.urlopen(req, timeout=self.timeout) as response:
+                return response.status, response.read()
+        except urllib.error.HTTPError as e:
+            return e.code, e.read()
+
+
+class InProcessTransport:
+    """Executa as requisições direto na aplicação Flask (sem servidor)"""
+
+    def __init__(self, app):
+        self.app = app
+        self._local = threading.local()
+
+    def request(self, method, path, headers=None, body=None):
+        client = getattr(self._local, 'client', None)
+        if client is None:
+            client = self._local.client = self.app.test_client()
+        response = client.open(path, method=method, headers=headers, json=body)
+        return response.status_code, response.get_data()
+
+
+def percentile(sorted_values, pct):
+    """Percentil pelo método nearest-rank"""
+    if not sorted_values:
+        return 0.0
+    rank = math.ceil(pct / 100.0 * len(sorted_values))
+    return sorted_values[max(0, min(len(sorted_values), rank) - 1)]
+
+
+def login(transport, email, password):
+    status, body = transport.request('POST', '/api/auth/login', body={'email': email, 'password': password})
+    if status != 200:
+        raise RuntimeError(f'Falha no login ({status}): {body[:200]!r}')
+    return json.loads(body)['access_token']
+
+
+def resolve_routes(transport, headers, routes):
+    """Preenche os parâmetros das rotas com ids existentes no banco"""
+    params = {}
+    status, body = transport.request('GET', '/api/giras/', headers=headers)
+    if status == 200:
+        giras = json.loads(body).get('giras') or []
+        if giras:
+            params['gira_id'] = giras[len(giras) // 2]['id']
+
+    resolved = []
+    for name, method, path, *body in routes:
+        try:
+            resolved.append((name, method, path.format(**params), body[0] if body else None))
+        except KeyError:
+            print(f'Ignorando {name}: sem dados para {path}', file=sys.stderr)
+    return resolved
+
+
+def run_route(transport, headers, method, path, concurrency, duration, requests_limit=None, body=None):
+    """Dispara requisições concorrentes por ``duration`` segundos"""
+    latencies = []
+    errors = 0
+    lock = threading.Lock()
+    deadline = time.perf_counter() + duration
+    counter = {'sent': 0}
+
+    def worker():
+        nonlocal errors
+        local_latencies = []
+        local_errors = 0
+        while time.perf_counter() < deadline:
+            if requests_limit is not None:
+                with lock:
+                    if counter['sent'] >= requests_limit:
+                        break
+                    counter['sent'] += 1
+            started = time.perf_counter()
+            try:
+                status, _body = transport.request(method, path, headers=headers, body=body)
+            except Exception:
+                status = 0
+            local_latencies.append(time.perf_counter() - started)
+            if status >= 400 or status == 0:
+                local_errors += 1
+        with lock:
+            latencies.extend(local_latencies)
+            errors += local_errors
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for _ in range(concurrency):
+            pool.submit(worker)
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        'requests': len(latencies),
+        'errors': errors,
+        'throughput': len(latencies) / elapsed if elapsed else 0.0,
+        'p50_ms': percentile(latencies, 50) * 1000,
+        'p95_ms': percentile(latencies, 95) * 1000,
+        'p99_ms': percentile(latencies, 99) * 1000,
+    }
+
+
+def run_benchmark(transport, routes=None, concurrency=8, duration=10.0, warmup=1.0,
+                  email=DEFAULT_EMAIL, password=DEFAULT_PASSWORD, requests_limit=None):
+    token = login(transport, email, password)
+    headers = {'Authorization': f'Bearer {token}'}
+
+    results = {}
+    for name, method, path, body in resolve_routes(transport, headers, routes or DEFAULT_ROUTES):
+        if warmup:
+            run_route(transport, headers, method, path, concurrency, warmup, body=body)
+        results[name] = dict(
+            run_route(transport, headers, method, path, concurrency, duration, requests_limit, body=body),
+            method=method,
+            path=path
+        )
+    return results
+
+
+def format_report(results, baseline=None):
+    lines = [f'{"rota":<16} {"req/s":>9} {"p50 ms":>9} {"p95 ms":>9} {"p99 ms":>9} {"erros":>6}']
+    for name, stats in results.items():
+        line = (f'{name:<16} {stats["throughput"]:>9.1f} {stats["p50_ms"]:>9.1f} '
+                f'{stats["p95_ms"]:>9.1f} {stats["p99_ms"]:>9.1f} {stats["errors"]:>6}')
+        if baseline and name in baseline:
+            line += '  ' + _diff(stats, baseline[name])
+        lines.append(line)
+    return '\n'.join(lines)
+
+
+def _diff(current, previous):
+    parts = []
+    for key, label in (('throughput', 'req/s'), ('p95_ms', 'p95')):
+        if previous.get(key):
+            change = (current[key] - previous[key]) / previous[key] * 100
+            parts.append(f'{label} {change:+.1f}%')
+    return ', '.join(parts)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark de carga dos endpoints da API')
+    target = parser.add_mutually_exclusive_group()
+    target.add_argument('--url', default='http://localhost:5000', help='Servidor alvo')
+    target.add_argument('--in-process', action='store_true', help='Usar a aplicação direto, sem servidor')
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--duration', type=float, default=10.0, help='Segundos por rota')
+    parser.add_argument('--warmup', type=float, default=1.0, help='Segundos de aquecimento por rota')
+    parser.add_argument('--route', action='append', help='Restringir às rotas informadas (nome)')
+    parser.add_argument('--email', default=DEFAULT_EMAIL)
+    parser.add_argument('--password', default=DEFAULT_PASSWORD)
+    parser.add_argument('--save-baseline', help='Gravar os resultados como baseline (JSON)')
+    parser.add_argument('--compare', help='Comparar com um baseline gravado (JSON)')
+    parser.add_argument('--json', action='store_true', help='Imprimir os resultados em JSON')
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+
+    if args.in_process:
+        from src.main import app, init_database
+        init_database()
+        transport = InProcessTransport(app)
+    else:
+        transport = HttpTransport(args.url)
+
+    routes = DEFAULT_ROUTES
+    if args.route:
+        routes = [route for route in DEFAULT_ROUTES if route[0] in args.route]
+
+    results = run_benchmark(
+        transport, routes, concurrency=args.concurrency, duration=args.duration,
+        warmup=args.warmup, email=args.email, password=args.password
+    )
+
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)['results']
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        print(format_report(results, baseline))
+
+    if args.save_baseline:
+        with open(args.save_baseline, 'w') as f:
+            json.dump({
+                'created_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+                'concurrency': args.concurrency,
+                'duration': args.duration,
+                'results': results
+            }, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
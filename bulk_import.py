@@ -0,0 +1,71 @@
+from flask import Blueprint, current_app, request, jsonify
+from flask_jwt_extended import jwt_required, get_jwt_identity
+from src.models.user import User
+from src.services.bulk_import_service import FORMATS, detect_format, import_members, import_clients
+
+bulk_import_bp = Blueprint('bulk_import', __name__)
+
+
+def _upload():
+    """Arquivo enviado (multipart, campo 'file') ou o próprio corpo da requisição, e o seu formato"""
+    upload = request.files.get('file')
+    if upload is not None:
+        stream, filename, content_type = upload.stream, upload.filename, upload.content_type
+    else:
+        stream, filename, content_type = request.stream, None, request.content_type
+    fmt = request.args.get('format') or detect_format(filename, content_type)
+    return stream, fmt
+
+
+def _dry_run():
+    return request.args.get('dry_run', '').lower() in ('1', 'true', 'sim')
+
+
+@bulk_import_bp.route('/users/import', methods=['POST'])
+@jwt_required()
+def import_users():
+    """Importar membros de um CSV/NDJSON (apenas Pai/Mãe de Trono); dry_run=1 só valida"""
+    try:
+        current_user = User.query.get(get_jwt_identity())
+
+        if not current_user or not current_user.is_pai_mae_trono():
+            return jsonify({'error': 'Acesso negado. Apenas Pai/Mãe de Trono pode importar usuários'}), 403
+
+        stream, fmt = _upload()
+        if fmt not in FORMATS:
+            return jsonify({'error': 'Formato não reconhecido (envie .csv ou .ndjson, ou use format=)'}), 400
+
+        report = import_members(
+            stream, fmt,
+            chunk_size=current_app.config['BULK_IMPORT_CHUNK_SIZE'],
+            dry_run=_dry_run(),
+            hash_workers=current_app.config['BULK_IMPORT_HASH_WORKERS']
+        )
+        return jsonify(report), 200
+
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@bulk_import_bp.route('/appointments/clients/import', methods=['POST'])
+@jwt_required()
+def import_clients_route():
+    """Importar clientes de um CSV/NDJSON (tesoureiros); dry_run=1 só valida"""
+    try:
+        current_user = User.query.get(get_jwt_identity())
+
+        if not current_user or not current_user.is_tesoureiro():
+            return jsonify({'error': 'Acesso negado'}), 403
+
+        stream, fmt = _upload()
+        if fmt not in FORMATS:
+            return jsonify({'error': 'Formato não reconhecido (envie .csv ou .ndjson, ou use format=)'}), 400
+
+        report = import_clients(
+            stream, fmt,
+            chunk_size=current_app.config['BULK_IMPORT_CHUNK_SIZE'],
+            dry_run=_dry_run()
+        )
+        return jsonify(report), 200
+
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
@@ -0,0 +1,421 @@
+"""Importação em massa de membros e clientes a partir de CSV ou NDJSON
+
+O arquivo é lido em fluxo e processado em lotes de ``chunk_size`` linhas:
+cada lote confere a unicidade com um único SELECT ... IN por coluna, gera os
+hashes bcrypt no pool de processos do worker (um só, compartilhado pelas
+importações) e entra no banco com um INSERT em massa.
+Linhas com problema não interrompem a importação; voltam no relatório.
+"""
+import abc
+import csv
+import io
+import json
+import math
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, datetime
+from multiprocessing import get_context
+
+import click
+from sqlalchemy import select
+from sqlalchemy.exc import IntegrityError
+
+from src.models.user import db, User, Entity
+from src.models.appointment import Client, normalize_email, normalize_name, normalize_phone
+from src.services.password_hashing import hash_many
+
+DEFAULT_CHUNK_SIZE = 500
+REPORT_ERROR_LIMIT = 1000
+# Abaixo disso não compensa subir processos: o hash é feito no próprio worker
+INLINE_HASH_LIMIT = 4
+# Processos de hash por worker do gunicorn (cada worker tem o seu pool)
+DEFAULT_HASH_WORKERS = 2
+
+ROLES = ('filho', 'tesoureiro', 'pai_mae_trono')
+FORMATS = ('csv', 'ndjson')
+
+
+def detect_format(filename=None, content_type=None):
+    name = (filename or '').lower()
+    if name.endswith('.csv'):
+        return 'csv'
+    if name.endswith(('.ndjson', '.jsonl')):
+        return 'ndjson'
+    content_type = (content_type or '').lower()
+    if 'csv' in content_type:
+        return 'csv'
+    if 'ndjson' in content_type or 'jsonl' in content_type or 'json' in content_type:
+        return 'ndjson'
+    return None
+
+
+def _text_stream(stream):
+    if isinstance(stream, io.TextIOBase):
+        return stream
+    if isinstance(stream, io.RawIOBase):
+        stream = io.BufferedReader(stream)
+    # utf-8-sig: planilhas exportadas pelo Excel começam com BOM
+    return io.TextIOWrapper(stream, encoding='utf-8-sig', newline='')
+
+
+def iter_records(stream, fmt):
+    """Gera (linha, registro, erro) sem carregar o arquivo inteiro na memória"""
+    if fmt not in FORMATS:
+        raise ValueError(f'Formato inválido: {fmt} (use csv ou ndjson)')
+    text = _text_stream(stream)
+
+    if fmt == 'ndjson':
+        for line_number, line in enumerate(text, start=1):
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError:
+                yield line_number, None, 'JSON inválido'
+                continue
+            if not isinstance(record, dict):
+                yield line_number, None, 'Cada linha deve ser um objeto JSON'
+                continue
+            yield line_number, record, None
+        return
+
+    header = text.readline()
+    if not header.strip():
+        return
+    # Planilhas em português costumam sair com ';'
+    delimiter = ';' if header.count(';') > header.count(',') else ','
+    fields = [name.strip().lower() for name in next(csv.reader([header], delimiter=delimiter))]
+    reader = csv.reader(text, delimiter=delimiter)
+    for values in reader:
+        # reader.line_num conta a partir do corpo; +1 pelo cabeçalho
+        line_number = reader.line_num + 1
+        if not any(value.strip() for value in values):
+            continue
+        if len(values) > len(fields):
+            yield line_number, None, 'Mais colunas que o cabeçalho'
+            continue
+        yield line_number, dict(zip(fields, values)), None
+
+
+def _text(record, field):
+    value = record.get(field)
+    if value is None:
+        return None
+    return str(value).strip() or None
+
+
+def _parse_date(value):
+    if not value:
+        return None
+    for fmt in ('%Y-%m-%d', '%d/%m/%Y'):
+        try:
+            return datetime.strptime(value, fmt).date()
+        except ValueError:
+            pass
+    raise ValueError('Data inválida (use AAAA-MM-DD ou DD/MM/AAAA)')
+
+
+_pool_lock = threading.Lock()
+_pool = None  # (pid, executor)
+
+
+def _hash_pool(max_workers):
+    """Pool de hash do processo, criado na primeira importação (e de novo depois de um fork)
+
+    Fica aberto entre as importações: subir os processos com spawn custa mais
+    que os hashes de um lote, e pools por importação somariam processos.
+    """
+    global _pool
+    with _pool_lock:
+        if _pool is None or _pool[0] != os.getpid():
+            _pool = (os.getpid(), ProcessPoolExecutor(max_workers=max_workers, mp_context=get_context('spawn')))
+        return _pool[1]
+
+
+class PasswordHasher:
+    """Gera hashes bcrypt em paralelo, no pool de processos compartilhado do worker"""
+
+    def __init__(self, max_workers=None):
+        self.max_workers = max_workers or DEFAULT_HASH_WORKERS
+
+    def hash(self, passwords):
+        if self.max_workers <= 1 or len(passwords) <= INLINE_HASH_LIMIT:
+            return hash_many(passwords)
+        pool = _hash_pool(self.max_workers)
+        # Poucos pedaços por processo: cada hash leva centenas de ms, o envio é desprezível
+        size = math.ceil(len(passwords) / (self.max_workers * 2))
+        chunks = [passwords[start:start + size] for start in range(0, len(passwords), size)]
+        return [password_hash for chunk in pool.map(hash_many, chunks) for password_hash in chunk]
+
+
+class ImportRow:
+    __slots__ = ('line', 'values', 'errors', 'password')
+
+    def __init__(self, line, values=None, errors=None, password=None):
+        self.line = line
+        self.values = values
+        self.errors = errors or []
+        self.password = password
+
+
+class BulkImporter(abc.ABC):
+    """Esqueleto da importação: validação por linha, conferência por lote e INSERT em massa"""
+
+    model = None
+    # Colunas verificadas contra o banco (SELECT ... IN por lote) e dentro do arquivo
+    unique_columns = ()
+
+    def __init__(self, chunk_size=DEFAULT_CHUNK_SIZE, dry_run=False):
+        self.chunk_size = chunk_size
+        self.dry_run = dry_run
+        self.now = datetime.utcnow()
+        self._seen = {column: set() for column, _label in self.unique_columns}
+
+    @abc.abstractmethod
+    def validate(self, line, record):
+        """Retorna uma ImportRow com os valores da linha ou os erros encontrados"""
+
+    def check_references(self, rows):
+        pass
+
+    def prepare(self, rows):
+        pass
+
+    def _existing(self, column, values):
+        attribute = getattr(self.model, column)
+        return set(db.session.execute(select(attribute).where(attribute.in_(values))).scalars())
+
+    def check_unique(self, rows, track=True):
+        """Marca como erro os valores já cadastrados ou repetidos no próprio arquivo"""
+        for column, label in self.unique_columns:
+            values = {row.values[column] for row in rows if not row.errors and row.values.get(column)}
+            existing = self._existing(column, values) if values else set()
+            seen = self._seen[column]
+            for row in rows:
+                value = row.values.get(column) if row.values else None
+                if row.errors or not value:
+                    continue
+                if value in existing:
+                    row.errors.append(f'{label} já cadastrado')
+                elif track and value in seen:
+                    row.errors.append(f'{label} repetido no arquivo')
+                elif track:
+                    seen.add(value)
+
+    def _insert(self, rows):
+        db.session.execute(self.model.__table__.insert(), [row.values for row in rows])
+        db.session.commit()
+
+    def insert(self, rows):
+        try:
+            self._insert(rows)
+        except IntegrityError:
+            # Alguém cadastrou o mesmo e-mail/nome durante a importação: confere de novo e tenta uma vez
+            db.session.rollback()
+            self.check_unique(rows, track=False)
+            rows = [row for row in rows if not row.errors]
+            if rows:
+                self._insert(rows)
+        return len(rows)
+
+    def _process(self, batch, report):
+        valid = [row for row in batch if not row.errors]
+        if valid:
+            self.check_references(valid)
+            self.check_unique(valid)
+            valid = [row for row in valid if not row.errors]
+
+        if valid and not self.dry_run:
+            self.prepare(valid)
+            report['importados'] += self.insert(valid)
+        report['validos'] += len(valid)
+
+        for row in batch:
+            if row.errors:
+                report['com_erro'] += 1
+                if len(report['erros']) < REPORT_ERROR_LIMIT:
+                    report['erros'].append({'linha': row.line, 'erros': row.errors})
+                else:
+                    report['truncado'] = True
+
+    def run(self, records):
+        """Importa os registros de ``iter_records`` e devolve o relatório por linha"""
+        started = time.perf_counter()
+        report = {'total': 0, 'validos': 0, 'importados': 0, 'com_erro': 0, 'erros': [],
+                  'truncado': False, 'dry_run': self.dry_run}
+
+        batch = []
+        try:
+            for line, record, error in records:
+                report['total'] += 1
+                if error:
+                    batch.append(ImportRow(line, errors=[error]))
+                else:
+                    batch.append(self.validate(line, record))
+                if len(batch) >= self.chunk_size:
+                    self._process(batch, report)
+                    batch = []
+            if batch:
+                self._process(batch, report)
+        except Exception:
+            db.session.rollback()
+            raise
+        finally:
+            self.close()
+
+        report['duration_ms'] = round((time.perf_counter() - started) * 1000, 2)
+        return report
+
+    def close(self):
+        pass
+
+
+class MemberImporter(BulkImporter):
+    """Membros (usuários): mesmas regras do /api/auth/register"""
+
+    model = User
+    unique_columns = (('email', 'Email'), ('nome_ritual', 'Nome ritual'))
+    required_fields = ('nome_civil', 'nome_ritual', 'email', 'password')
+
+    def __init__(self, chunk_size=DEFAULT_CHUNK_SIZE, dry_run=False, hash_workers=None):
+        super().__init__(chunk_size=chunk_size, dry_run=dry_run)
+        self.hasher = PasswordHasher(hash_workers)
+
+    def validate(self, line, record):
+        values = {field: _text(record, field) for field in ('nome_civil', 'nome_ritual', 'email')}
+        row = ImportRow(line, values=values, password=record.get('password'))
+        row.errors = [f'Campo {field} é obrigatório' for field in self.required_fields
+                      if not (row.password if field == 'password' else values[field])]
+
+        try:
+            grau = int(record.get('grau') or 1)
+            if not 1 <= grau <= 7:
+                raise ValueError
+            values['grau'] = grau
+        except (TypeError, ValueError):
+            row.errors.append('Grau deve ser um número de 1 a 7')
+
+        role = _text(record, 'role') or 'filho'
+        if role not in ROLES:
+            row.errors.append(f'Papel inválido: {role}')
+        values['role'] = role
+
+        try:
+            entidade = _text(record, 'entidade_cabeca_id')
+            values['entidade_cabeca_id'] = int(entidade) if entidade else None
+        except ValueError:
+            row.errors.append('entidade_cabeca_id deve ser um número')
+
+        if row.password is not None and not isinstance(row.password, str):
+            row.password = str(row.password)
+        values.update(is_active=True, created_at=self.now, updated_at=self.now)
+        return row
+
+    def check_references(self, rows):
+        ids = {row.values['entidade_cabeca_id'] for row in rows if row.values.get('entidade_cabeca_id')}
+        if not ids:
+            return
+        found = set(db.session.execute(select(Entity.id).where(Entity.id.in_(ids))).scalars())
+        for row in rows:
+            entidade = row.values.get('entidade_cabeca_id')
+            if entidade and entidade not in found:
+                row.errors.append(f'Entidade {entidade} não encontrada')
+
+    def prepare(self, rows):
+        for row, password_hash in zip(rows, self.hasher.hash([row.password for row in rows])):
+            row.values['password_hash'] = password_hash
+            row.password = None
+
+
+class ClientImporter(BulkImporter):
+    """Clientes da recepção; telefone e e-mail repetidos contam como cliente já cadastrado"""
+
+    model = Client
+    unique_columns = (('telefone_normalizado', 'Telefone'), ('email_normalizado', 'Email'))
+
+    def validate(self, line, record):
+        nome = _text(record, 'nome')
+        email = _text(record, 'email')
+        telefone = _text(record, 'telefone')
+        # O INSERT em massa não passa pelo evento do ORM: as colunas de busca são preenchidas aqui
+        values = {
+            'nome': nome,
+            'email': email,
+            'telefone': telefone,
+            'endereco': _text(record, 'endereco'),
+            'observacoes': _text(record, 'observacoes'),
+            'nome_normalizado': normalize_name(nome),
+            'email_normalizado': normalize_email(email),
+            'telefone_normalizado': normalize_phone(telefone),
+            'created_at': self.now,
+            'updated_at': self.now
+        }
+        row = ImportRow(line, values=values)
+        if not nome:
+            row.errors.append('Campo nome é obrigatório')
+        if telefone and len(telefone) > 20:
+            row.errors.append('Telefone muito longo')
+
+        try:
+            nascimento = record.get('data_nascimento')
+            values['data_nascimento'] = nascimento if isinstance(nascimento, date) else _parse_date(
+                _text(record, 'data_nascimento')
+            )
+        except ValueError as e:
+            row.errors.append(str(e))
+        return row
+
+
+def import_members(stream, fmt, chunk_size=DEFAULT_CHUNK_SIZE, dry_run=False, hash_workers=None):
+    importer = MemberImporter(chunk_size=chunk_size, dry_run=dry_run, hash_workers=hash_workers)
+    return importer.run(iter_records(stream, fmt))
+
+
+def import_clients(stream, fmt, chunk_size=DEFAULT_CHUNK_SIZE, dry_run=False):
+    return ClientImporter(chunk_size=chunk_size, dry_run=dry_run).run(iter_records(stream, fmt))
+
+
+def _echo_report(report):
+    click.echo(f"Linhas: {report['total']}  válidas: {report['validos']}  "
+               f"importadas: {report['importados']}  com erro: {report['com_erro']}")
+    for error in report['erros']:
+        click.echo(f"  linha {error['linha']}: {'; '.join(error['erros'])}")
+    if report['truncado']:
+        click.echo(f'  (relatório limitado a {REPORT_ERROR_LIMIT} linhas)')
+    click.echo(f"Concluído em {report['duration_ms']}ms")
+
+
+def init_bulk_import(app):
+    """Configura a importação em massa e os comandos CLI (para arquivos grandes)"""
+    app.config.setdefault('BULK_IMPORT_CHUNK_SIZE', DEFAULT_CHUNK_SIZE)
+    app.config.setdefault('BULK_IMPORT_HASH_WORKERS', min(DEFAULT_HASH_WORKERS, os.cpu_count() or 1))
+
+    def _format(path, fmt):
+        fmt = fmt or detect_format(path)
+        if fmt is None:
+            raise click.UsageError('Não foi possível detectar o formato; use --format csv ou ndjson')
+        return fmt
+
+    @app.cli.command('import-members')
+    @click.argument('path', type=click.Path(exists=True, dir_okay=False))
+    @click.option('--format', 'fmt', type=click.Choice(FORMATS), help='Formato do arquivo')
+    @click.option('--dry-run', is_flag=True, help='Só validar, sem gravar')
+    def import_members_command(path, fmt, dry_run):
+        """Importar membros de um arquivo CSV ou NDJSON"""
+        with open(path, 'rb') as f:
+            report = import_members(f, _format(path, fmt), chunk_size=app.config['BULK_IMPORT_CHUNK_SIZE'],
+                                    dry_run=dry_run, hash_workers=app.config['BULK_IMPORT_HASH_WORKERS'])
+        _echo_report(report)
+
+    @app.cli.command('import-clients')
+    @click.argument('path', type=click.Path(exists=True, dir_okay=False))
+    @click.option('--format', 'fmt', type=click.Choice(FORMATS), help='Formato do arquivo')
+    @click.option('--dry-run', is_flag=True, help='Só validar, sem gravar')
+    def import_clients_command(path, fmt, dry_run):
+        """Importar clientes de um arquivo CSV ou NDJSON"""
+        with open(path, 'rb') as f:
+            report = import_clients(f, _format(path, fmt), chunk_size=app.config['BULK_IMPORT_CHUNK_SIZE'],
+                                    dry_run=dry_run)
+        _echo_report(report)
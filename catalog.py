@@ -0,0 +1,49 @@
+from flask import Blueprint, request, jsonify
+from flask_jwt_extended import jwt_required, get_jwt_identity
+from src.models.user import User
+from src.services.catalog_cache import catalog_for, entity_list
+
+catalog_bp = Blueprint('catalog', __name__)
+
+@catalog_bp.route('/library/catalog', methods=['GET'])
+@jwt_required()
+def get_catalog():
+    """Catálogo da biblioteca para o grau do usuário (servido do cache)"""
+    try:
+        current_user_id = get_jwt_identity()
+        user = User.query.get(current_user_id)
+
+        if not user:
+            return jsonify({'error': 'Usuário não encontrado'}), 404
+
+        contents = catalog_for(user.grau)
+
+        # Filtros opcionais
+        categoria = request.args.get('categoria')
+        if categoria:
+            contents = [content for content in contents if content['categoria'] == categoria]
+
+        tipo = request.args.get('tipo')
+        if tipo:
+            contents = [content for content in contents if content['tipo'] == tipo]
+
+        return jsonify({'contents': contents}), 200
+
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@catalog_bp.route('/entities', methods=['GET'])
+@jwt_required()
+def get_entities():
+    """Listar as entidades cadastradas (servido do cache)"""
+    try:
+        current_user_id = get_jwt_identity()
+        user = User.query.get(current_user_id)
+
+        if not user:
+            return jsonify({'error': 'Usuário não encontrado'}), 404
+
+        return jsonify({'entities': entity_list()}), 200
+
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
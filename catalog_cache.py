@@ -0,0 +1,161 @@
+"""Cache do catálogo da biblioteca e das entidades
+
+O catálogo só muda quando um conteúdo é criado, editado ou removido, mas é
+lido em toda abertura da biblioteca. Como o ``to_dict`` só depende do grau de
+quem pede (1 a 7), cada terreiro tem no máximo sete versões do catálogo, que
+ficam prontas em memória; a lista de entidades é uma só.
+
+Os commits que mexem em LibraryContent ou Entity descartam as entradas do
+terreiro neste processo. Nos outros workers o TTL limita o atraso.
+"""
+import threading
+import time
+from collections import OrderedDict
+from types import SimpleNamespace
+
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session
+
+from src.models.user import Entity, text_load_options
+from src.models.library import LibraryContent
+from src.services.metrics import cache_metrics
+from src.services.tenancy import current_tenant
+
+DEFAULT_CATALOG_CACHE_TTL = 300
+DEFAULT_CATALOG_CACHE_SIZE = 128  # 8 entradas (7 graus + entidades) por terreiro
+
+CATALOG = 'catalog'
+ENTITIES = 'entities'
+
+# Contadores atualizados a cada visualização: não tornam o catálogo obsoleto
+VOLATILE_COLUMNS = {'views_count', 'updated_at'}
+
+
+class ReferenceCache:
+    """LRU com TTL por terreiro, invalidado por tipo de dado
+
+    Cada tipo (catálogo, entidades) tem uma geração por terreiro; invalidar
+    avança a geração e descarta as entradas. Uma carga que começou antes da
+    invalidação não é guardada, para não voltar a servir o dado antigo.
+    """
+
+    def __init__(self, name, max_entries=DEFAULT_CATALOG_CACHE_SIZE, ttl=DEFAULT_CATALOG_CACHE_TTL):
+        self.name = name
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # (terreiro, tipo, chave) -> (carregado em, geração, valor)
+        self._generations = {}  # (terreiro, tipo) -> geração
+
+    def get(self, kind, key, loader):
+        tenant = current_tenant()
+        entry_key = (tenant, kind, key)
+        now = time.monotonic()
+        with self._lock:
+            generation = self._generations.get((tenant, kind), 0)
+            entry = self._entries.get(entry_key)
+            if entry is not None and entry[1] == generation and now - entry[0] < self.ttl:
+                self._entries.move_to_end(entry_key)
+                cache_metrics.observe(self.name, 'hits')
+                return entry[2]
+
+        cache_metrics.observe(self.name, 'misses')
+        value = loader()
+
+        evicted = 0
+        with self._lock:
+            if self._generations.get((tenant, kind), 0) == generation:
+                self._entries[entry_key] = (now, generation, value)
+                self._entries.move_to_end(entry_key)
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+                    evicted += 1
+        if evicted:
+            cache_metrics.observe(self.name, 'evictions', evicted)
+        return value
+
+    def invalidate(self, tenant, kinds):
+        with self._lock:
+            for kind in kinds:
+                self._generations[(tenant, kind)] = self._generations.get((tenant, kind), 0) + 1
+            stale = [key for key in self._entries if key[0] == tenant and key[1] in kinds]
+            for key in stale:
+                del self._entries[key]
+        cache_metrics.observe(self.name, 'invalidations')
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._generations.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+reference_cache = ReferenceCache('library_catalog')
+
+
+def _changed_kind(obj, updated=False):
+    if isinstance(obj, Entity):
+        return ENTITIES
+    if isinstance(obj, LibraryContent):
+        if updated:
+            state = inspect(obj)
+            if not any(state.attrs[column.key].history.has_changes()
+                       for column in state.mapper.column_attrs if column.key not in VOLATILE_COLUMNS):
+                return None
+        return CATALOG
+    return None
+
+
+@event.listens_for(Session, 'after_flush')
+def _collect_catalog_changes(session, flush_context):
+    kinds = {_changed_kind(obj) for obj in (*session.new, *session.deleted)}
+    kinds.update(_changed_kind(obj, updated=True) for obj in session.dirty)
+    kinds.discard(None)
+    if kinds:
+        session.info.setdefault('catalog_changes', set()).update(kinds)
+
+
+@event.listens_for(Session, 'after_commit')
+def _invalidate_catalog(session):
+    kinds = session.info.pop('catalog_changes', None)
+    if kinds:
+        reference_cache.invalidate(current_tenant(), kinds)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_catalog_changes(session):
+    session.info.pop('catalog_changes', None)
+
+
+def _load_catalog(grau):
+    # O to_dict só olha o grau do usuário
+    viewer = SimpleNamespace(grau=grau)
+    contents = LibraryContent.query.options(
+        *text_load_options(LibraryContent)
+    ).filter_by(is_active=True).order_by(LibraryContent.categoria, LibraryContent.titulo).all()
+    return [content.to_dict(viewer, full=False) for content in contents]
+
+
+def _load_entities():
+    entities = Entity.query.order_by(Entity.tipo, Entity.nome).all()
+    return [entity.to_dict() for entity in entities]
+
+
+def catalog_for(grau):
+    """Catálogo ativo (com prévias) como visto por um usuário desse grau; não alterar o resultado"""
+    return reference_cache.get(CATALOG, grau, lambda: _load_catalog(grau))
+
+
+def entity_list():
+    """Entidades cadastradas; não alterar o resultado"""
+    return reference_cache.get(ENTITIES, None, _load_entities)
+
+
+def init_catalog_cache(app):
+    """Configura os limites do cache de catálogo e entidades"""
+    app.config.setdefault('CATALOG_CACHE_TTL', DEFAULT_CATALOG_CACHE_TTL)
+    app.config.setdefault('CATALOG_CACHE_SIZE', DEFAULT_CATALOG_CACHE_SIZE)
+    reference_cache.ttl = app.config['CATALOG_CACHE_TTL']
+    reference_cache.max_entries = app.config['CATALOG_CACHE_SIZE']
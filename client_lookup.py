@@ -0,0 +1,214 @@
+from difflib import SequenceMatcher
+
+from sqlalchemy import bindparam, or_, text, update
+
+from src.models.user import db, text_load_options
+from src.models.appointment import (
+    Client, create_client_name_index, normalize_email, normalize_name, normalize_phone
+)
+
+DEFAULT_SEARCH_LIMIT = 10
+MAX_SEARCH_LIMIT = 50
+
+# O tokenizador trigram (FTS5) e o pg_trgm só casam termos com 3+ caracteres
+MIN_FUZZY_LENGTH = 3
+MIN_PHONE_DIGITS = 4
+
+BACKFILL_BATCH_SIZE = 500
+
+# Disponibilidade do índice de nomes, por URL do banco (verificada uma vez)
+_name_index_available = {}
+
+
+def _dialect():
+    return db.session.get_bind().dialect.name
+
+
+def _has_name_index():
+    bind = db.session.get_bind()
+    key = str(bind.url)
+    if key not in _name_index_available:
+        if bind.dialect.name == 'sqlite':
+            statement = "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'clients_fts'"
+        elif bind.dialect.name == 'postgresql':
+            statement = "SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm'"
+        else:
+            statement = None
+        _name_index_available[key] = bool(statement and db.session.execute(text(statement)).first())
+    return _name_index_available[key]
+
+
+def _prefix(column, value):
+    """Filtro de prefixo que usa o índice B-tree da coluna
+
+    No PostgreSQL o índice é text_pattern_ops e aceita LIKE 'x%'; no SQLite o
+    LIKE não usa o índice (colação BINARY), então o prefixo vira um intervalo.
+    """
+    if _dialect() == 'postgresql':
+        return column.startswith(value, autoescape=True)
+    return db.and_(column >= value, column < value + '\uffff')
+
+
+def _like_contains(value):
+    """Padrão LIKE '%valor%' com % e _ do próprio valor escapados (ESCAPE '\\')"""
+    escaped = value.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+    return f'%{escaped}%'
+
+
+def _name_candidates(nome, limit):
+    """Ids de clientes com nome parecido, usando o índice de trigramas/FTS"""
+    if len(nome) < MIN_FUZZY_LENGTH or not _has_name_index():
+        if len(nome) < MIN_FUZZY_LENGTH:
+            criteria = _prefix(Client.nome_normalizado, nome)
+        else:
+            # Sem índice de trigramas: varredura com LIKE (aceitável para poucos milhares de clientes)
+            criteria = Client.nome_normalizado.like(_like_contains(nome), escape='\\')
+        query = db.session.query(Client.id).filter(criteria).order_by(Client.nome_normalizado).limit(limit)
+        return [row[0] for row in query]
+
+    if _dialect() == 'postgresql':
+        rows = db.session.execute(text(
+            'SELECT id FROM clients WHERE nome_normalizado % :nome '
+            "OR nome_normalizado LIKE :pattern ESCAPE '\\' "
+            'ORDER BY similarity(nome_normalizado, :nome) DESC LIMIT :limit'
+        ), {'nome': nome, 'pattern': _like_contains(nome), 'limit': limit})
+    else:
+        # Frase entre aspas: casa a substring inteira, ordenada por bm25
+        phrase = '"' + nome.replace('"', '""') + '"'
+        rows = db.session.execute(text(
+            'SELECT rowid FROM clients_fts WHERE clients_fts MATCH :phrase ORDER BY rank LIMIT :limit'
+        ), {'phrase': phrase, 'limit': limit})
+    return [row[0] for row in rows]
+
+
+def _name_score(query, nome_normalizado):
+    if not nome_normalizado:
+        return 0.0
+    score = SequenceMatcher(None, query, nome_normalizado).ratio()
+    if nome_normalizado.startswith(query):
+        score = max(score, 0.75 + 0.15 * len(query) / len(nome_normalizado))
+    elif query in nome_normalizado:
+        score = max(score, 0.6 + 0.15 * len(query) / len(nome_normalizado))
+    return round(score * 0.9, 4)
+
+
+def search_clients(q, limit=DEFAULT_SEARCH_LIMIT, full=False):
+    """Busca clientes por telefone, e-mail ou nome aproximado
+
+    Retorna uma lista de (cliente, pontuação, campo) ordenada pela pontuação.
+    Telefone e e-mail exatos valem 1.0; prefixos e nomes parecidos valem menos.
+    """
+    q = (q or '').strip()
+    if not q:
+        return []
+
+    scores = {}
+
+    def add(client_id, score, field):
+        if client_id not in scores or scores[client_id][0] < score:
+            scores[client_id] = (score, field)
+
+    criteria = []
+    phone = normalize_phone(q)
+    if phone and len(phone) >= MIN_PHONE_DIGITS and not any(ch.isalpha() for ch in q):
+        criteria.append(_prefix(Client.telefone_normalizado, phone))
+
+    email = normalize_email(q)
+    if email and ' ' not in email:
+        criteria.append(_prefix(Client.email_normalizado, email))
+
+    if criteria:
+        rows = db.session.query(Client.id, Client.telefone_normalizado, Client.email_normalizado).filter(
+            or_(*criteria)
+        ).limit(limit).all()
+        for client_id, client_phone, client_email in rows:
+            if phone and client_phone and client_phone.startswith(phone):
+                add(client_id, 1.0 if client_phone == phone else 0.9, 'telefone')
+            if email and client_email and client_email.startswith(email):
+                add(client_id, 1.0 if client_email == email else 0.8, 'email')
+
+    nome = normalize_name(q)
+    name_ids = set(_name_candidates(nome, limit)) if nome and any(ch.isalpha() for ch in nome) else set()
+
+    ids = set(scores) | name_ids
+    if not ids:
+        return []
+
+    clients = Client.query.options(*text_load_options(Client, full=full)).filter(Client.id.in_(ids)).all()
+    for client in clients:
+        if client.id in name_ids:
+            add(client.id, _name_score(nome, client.nome_normalizado), 'nome')
+
+    by_id = {client.id: client for client in clients}
+    ranked = sorted(scores.items(), key=lambda item: (-item[1][0], by_id[item[0]].nome_normalizado or ''))
+    return [(by_id[client_id], score, field) for client_id, (score, field) in ranked[:limit]]
+
+
+def find_duplicate_clients(nome=None, email=None, telefone=None, exclude_id=None, full=False):
+    """Clientes já cadastrados com o mesmo telefone, e-mail ou nome
+
+    Usa as colunas normalizadas (uma consulta, só igualdades indexadas).
+    Retorna uma lista de (cliente, [campos coincidentes]).
+    """
+    values = {
+        'telefone': (Client.telefone_normalizado, normalize_phone(telefone)),
+        'email': (Client.email_normalizado, normalize_email(email)),
+        'nome': (Client.nome_normalizado, normalize_name(nome)),
+    }
+    criteria = [column == value for column, value in values.values() if value]
+    if not criteria:
+        return []
+
+    query = Client.query.options(*text_load_options(Client, full=full)).filter(or_(*criteria))
+    if exclude_id is not None:
+        query = query.filter(Client.id != exclude_id)
+
+    duplicates = []
+    for client in query.order_by(Client.id).limit(MAX_SEARCH_LIMIT):
+        matches = [
+            field for field, (column, value) in values.items()
+            if value and getattr(client, column.key) == value
+        ]
+        duplicates.append((client, matches))
+    return duplicates
+
+
+def backfill_client_search(batch_size=BACKFILL_BATCH_SIZE):
+    """Preenche as colunas *_normalizado dos clientes antigos e reconstrói o índice de nomes
+
+    Bancos criados antes da busca não passaram pelo ``after_create`` da tabela:
+    o índice é criado aqui e, no SQLite, o FTS5 (de conteúdo externo) é
+    reconstruído a partir da tabela. Idempotente; retorna quantos clientes
+    foram preenchidos.
+    """
+    bind = db.session.get_bind()
+    filled = 0
+    last_id = 0
+    while True:
+        rows = db.session.query(Client.id, Client.nome, Client.email, Client.telefone).filter(
+            Client.nome_normalizado.is_(None), Client.id > last_id
+        ).order_by(Client.id).limit(batch_size).all()
+        if not rows:
+            break
+        db.session.execute(
+            update(Client.__table__).where(Client.__table__.c.id == bindparam('client_id')),
+            [{
+                'client_id': client_id,
+                'nome_normalizado': normalize_name(nome),
+                'email_normalizado': normalize_email(email),
+                'telefone_normalizado': normalize_phone(telefone),
+            } for client_id, nome, email, telefone in rows]
+        )
+        db.session.commit()
+        filled += len(rows)
+        last_id = rows[-1][0]
+
+    index_existed = _has_name_index()
+    create_client_name_index(db.session.connection())
+    db.session.commit()
+    _name_index_available.pop(str(bind.url), None)
+
+    if bind.dialect.name == 'sqlite' and _has_name_index() and (filled or not index_existed):
+        db.session.execute(text("INSERT INTO clients_fts(clients_fts) VALUES ('rebuild')"))
+        db.session.commit()
+    return filled
@@ -0,0 +1,139 @@
+from datetime import date
+
+from flask import Blueprint, request, jsonify
+from flask_jwt_extended import jwt_required, get_jwt_identity
+from src.models.user import db, User, wants_full_text
+from src.models.appointment import Client
+from src.services.fieldsets import FieldsetError, parse_fields, pick_fields
+from src.services.client_lookup import (
+    search_clients, find_duplicate_clients, DEFAULT_SEARCH_LIMIT, MAX_SEARCH_LIMIT
+)
+
+client_search_bp = Blueprint('client_search', __name__)
+
+
+def _current_reception_user():
+    user = User.query.get(get_jwt_identity())
+    if not user or not user.is_tesoureiro():
+        return None
+    return user
+
+
+@client_search_bp.route('/clients/search', methods=['GET'])
+@jwt_required()
+def search():
+    """Buscar clientes por telefone, e-mail ou parte do nome (resultados ordenados por relevância)"""
+    try:
+        if not _current_reception_user():
+            return jsonify({'error': 'Acesso negado'}), 403
+
+        q = request.args.get('q', '').strip()
+        if not q:
+            return jsonify({'error': 'Parâmetro q é obrigatório'}), 400
+
+        limit = min(request.args.get('limit', DEFAULT_SEARCH_LIMIT, type=int), MAX_SEARCH_LIMIT)
+        if limit < 1:
+            return jsonify({'error': 'Limite deve ser positivo'}), 400
+
+        fields = parse_fields(Client, extra=('observacoes_preview', 'score', 'matched'))
+        full = wants_full_text(request)
+
+        results = []
+        for client, score, field in search_clients(q, limit, full=full):
+            data = client.to_dict(full=full)
+            data['score'] = score
+            data['matched'] = field
+            results.append(pick_fields(data, fields))
+
+        return jsonify({'clients': results}), 200
+
+    except FieldsetError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+def _duplicates_dict(duplicates, full):
+    return [dict(client.to_dict(full=full), matched=matches) for client, matches in duplicates]
+
+@client_search_bp.route('/clients/register', methods=['POST'])
+@jwt_required()
+def register_client():
+    """Cadastrar cliente; com telefone, e-mail ou nome já cadastrados retorna 409 e os candidatos
+
+    Reenviar com "confirmar_duplicado": true para cadastrar mesmo assim. Fica
+    fora de POST /clients, que é do blueprint de agendamentos.
+    """
+    try:
+        if not _current_reception_user():
+            return jsonify({'error': 'Acesso negado'}), 403
+
+        data = request.get_json() or {}
+
+        if not (data.get('nome') or '').strip():
+            return jsonify({'error': 'Nome é obrigatório'}), 400
+
+        data_nascimento = None
+        if data.get('data_nascimento'):
+            try:
+                data_nascimento = date.fromisoformat(data['data_nascimento'])
+            except (TypeError, ValueError):
+                return jsonify({'error': 'Data de nascimento inválida (use AAAA-MM-DD)'}), 400
+
+        duplicates = find_duplicate_clients(
+            nome=data['nome'],
+            email=data.get('email'),
+            telefone=data.get('telefone')
+        )
+        if duplicates and not data.get('confirmar_duplicado'):
+            return jsonify({
+                'error': 'Já existe cliente com o mesmo telefone, e-mail ou nome',
+                'duplicates': _duplicates_dict(duplicates, full=False)
+            }), 409
+
+        client = Client(
+            nome=data['nome'].strip(),
+            email=data.get('email'),
+            telefone=data.get('telefone'),
+            data_nascimento=data_nascimento,
+            endereco=data.get('endereco'),
+            observacoes=data.get('observacoes')
+        )
+        db.session.add(client)
+        db.session.commit()
+
+        return jsonify({
+            'message': 'Cliente cadastrado com sucesso',
+            'client': client.to_dict(),
+            'duplicates': _duplicates_dict(duplicates, full=False)
+        }), 201
+
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 500
+
+@client_search_bp.route('/clients/duplicates', methods=['POST'])
+@jwt_required()
+def check_duplicates():
+    """Verificar se já existe cliente com o mesmo telefone, e-mail ou nome (antes do cadastro)"""
+    try:
+        if not _current_reception_user():
+            return jsonify({'error': 'Acesso negado'}), 403
+
+        data = request.get_json() or {}
+        full = wants_full_text(request)
+
+        duplicates = find_duplicate_clients(
+            nome=data.get('nome'),
+            email=data.get('email'),
+            telefone=data.get('telefone'),
+            exclude_id=data.get('exclude_id'),
+            full=full
+        )
+
+        return jsonify({
+            'has_duplicates': bool(duplicates),
+            'duplicates': _duplicates_dict(duplicates, full)
+        }), 200
+
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
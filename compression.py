@@ -0,0 +1,79 @@
+"""Compressão gzip/brotli das respostas da API
+
+Os arquivos do frontend já saem pré-comprimidos (services/static_assets); aqui
+comprimimos na hora as respostas JSON e de texto acima de um tamanho mínimo.
+Respostas em fluxo (SSE) e envios de arquivo passam sem mexer.
+"""
+import gzip
+
+from flask import request
+
+from src.services.static_assets import accepted_encodings
+
+try:
+    import brotli
+except ImportError:  # brotli é opcional; sem ele só gzip
+    brotli = None
+
+DEFAULT_COMPRESS_MIN_SIZE = 1024
+DEFAULT_GZIP_LEVEL = 6
+DEFAULT_BROTLI_QUALITY = 4  # Qualidades altas custam caro demais por requisição
+
+COMPRESSIBLE_MIMETYPES = {'application/json', 'application/javascript', 'application/xml', 'image/svg+xml'}
+
+
+def _compressible(response):
+    mimetype = response.mimetype or ''
+    return mimetype in COMPRESSIBLE_MIMETYPES or mimetype.startswith('text/')
+
+
+def choose_encoding(header):
+    """Melhor codificação aceita pelo cliente: br (se disponível), gzip ou None"""
+    accepted = accepted_encodings(header)
+    if brotli is not None and ('br' in accepted or '*' in accepted):
+        return 'br'
+    if 'gzip' in accepted or '*' in accepted:
+        return 'gzip'
+    return None
+
+
+def compress(data, encoding, gzip_level=DEFAULT_GZIP_LEVEL, brotli_quality=DEFAULT_BROTLI_QUALITY):
+    if encoding == 'br':
+        return brotli.compress(data, quality=brotli_quality)
+    return gzip.compress(data, compresslevel=gzip_level)
+
+
+def _compress_response(app):
+    def compress_response(response):
+        if (response.direct_passthrough or response.is_streamed
+                or response.status_code < 200 or response.status_code in (204, 304)
+                or 'Content-Encoding' in response.headers or not _compressible(response)):
+            return response
+
+        # A resposta varia com o cabeçalho mesmo quando sai sem compressão
+        response.vary.add('Accept-Encoding')
+
+        encoding = choose_encoding(request.headers.get('Accept-Encoding'))
+        if encoding is None:
+            return response
+
+        data = response.get_data()
+        if len(data) < app.config['COMPRESS_MIN_SIZE']:
+            return response
+
+        response.set_data(compress(
+            data, encoding,
+            gzip_level=app.config['COMPRESS_GZIP_LEVEL'],
+            brotli_quality=app.config['COMPRESS_BROTLI_QUALITY']
+        ))
+        response.headers['Content-Encoding'] = encoding
+        return response
+    return compress_response
+
+
+def init_compression(app):
+    """Comprime as respostas JSON/texto conforme o Accept-Encoding do cliente"""
+    app.config.setdefault('COMPRESS_MIN_SIZE', DEFAULT_COMPRESS_MIN_SIZE)
+    app.config.setdefault('COMPRESS_GZIP_LEVEL', DEFAULT_GZIP_LEVEL)
+    app.config.setdefault('COMPRESS_BROTLI_QUALITY', DEFAULT_BROTLI_QUALITY)
+    app.after_request(_compress_response(app))
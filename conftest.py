@@ -0,0 +1,40 @@
+import pytest
+from flask import Flask
+from flask_jwt_extended import JWTManager
+
+from src.models.user import db
+from src.routes.auth import auth_bp
+from src.routes.gira import gira_bp
+from src.routes.forum import forum_bp
+from src.services.archival import watermark_cache
+from src.services.query_budget import query_budget_client  # noqa: F401 (fixture)
+
+
+@pytest.fixture
+def app():
+    """App com as rotas testadas sobre um SQLite em memória, recriado a cada teste"""
+    app = Flask(__name__)
+    app.config.update(
+        TESTING=True,
+        SQLALCHEMY_DATABASE_URI='sqlite://',
+        JWT_SECRET_KEY='chave-de-teste-com-pelo-menos-32-bytes',
+    )
+    db.init_app(app)
+    JWTManager(app)
+    app.register_blueprint(auth_bp, url_prefix='/api/auth')
+    app.register_blueprint(gira_bp, url_prefix='/api/giras')
+    app.register_blueprint(forum_bp, url_prefix='/api/forum')
+
+    with app.app_context():
+        db.create_all()
+        # Os limites do arquivo ficam em cache por minuto: carregados aqui, não
+        # entram na contagem da primeira requisição
+        watermark_cache.clear()
+        watermark_cache.get()
+
+    yield app
+
+    with app.app_context():
+        db.session.remove()
+        db.drop_all()
+    watermark_cache.clear()
@@ -0,0 +1,386 @@
+"""Cópias de segurança do banco com a aplicação no ar
+
+SQLite: API de backup online, copiando ``pages`` páginas por passo com uma
+pausa entre os passos, para que as escritas das requisições não fiquem
+esperando; o arquivo é copiado de uma conexão só de leitura e comprimido
+depois. PostgreSQL: a saída do ``pg_dump`` (um snapshot MVCC, sem travar
+ninguém) é comprimida enquanto é lida.
+
+A tarefa agendada roda de hora em hora, mas só faz a cópia quando a última
+tem mais de BACKUP_INTERVAL e nenhuma gira está acontecendo. Cada cópia é
+conferida (integridade e linhas por tabela); só depois de aprovada as mais
+antigas que BACKUP_KEEP são apagadas. A cópia reprovada vai para quarentena
+(``.failed``) e não conta como cópia.
+"""
+import gzip
+import hashlib
+import json
+import os
+import re
+import shutil
+import sqlite3
+import subprocess
+import tempfile
+import time
+from datetime import datetime, timedelta
+from urllib.request import pathname2url
+
+import click
+from sqlalchemy import func, inspect, select
+
+from src.models.user import db, Gira
+from src.services.scheduler import get_scheduler
+from src.services.tenancy import current_tenant, tenant_dir, tenant_names, use_tenant
+
+DEFAULT_BACKUP_INTERVAL = 24 * 3600
+DEFAULT_BACKUP_CHECK_INTERVAL = 3600
+DEFAULT_BACKUP_KEEP = 7
+DEFAULT_PAGES_PER_STEP = 256
+DEFAULT_STEP_PAUSE = 0.02
+DEFAULT_MAX_RESTARTS = 3
+DEFAULT_GIRA_QUIET_HOURS = 6
+COMPRESS_LEVEL = 6
+CHUNK_SIZE = 1024 * 1024
+
+BACKUP_NAME = re.compile(r'^backup-(\d{8}T\d{6})\.(sqlite3|sql)\.gz$')
+QUARANTINE_SUFFIX = '.failed'
+COPY_START = re.compile(r'^COPY ([\w."]+) \(')
+
+
+class BackupError(RuntimeError):
+    """Cópia ou conferência que não pôde ser concluída"""
+
+
+def backup_dir(app):
+    directory = tenant_dir(app.config['BACKUP_DIR'])
+    os.makedirs(directory, exist_ok=True)
+    return directory
+
+
+def list_backups(directory):
+    """Cópias do diretório, da mais recente para a mais antiga: [(data, caminho)]"""
+    backups = []
+    for name in os.listdir(directory):
+        match = BACKUP_NAME.match(name)
+        if match:
+            backups.append((datetime.strptime(match.group(1), '%Y%m%dT%H%M%S'), os.path.join(directory, name)))
+    return sorted(backups, reverse=True)
+
+
+def _gzip_file(source, target):
+    # O zlib libera o GIL em blocos grandes: as requisições do processo seguem atendidas
+    with open(source, 'rb') as src, gzip.open(target, 'wb', compresslevel=COMPRESS_LEVEL) as dst:
+        shutil.copyfileobj(src, dst, CHUNK_SIZE)
+
+
+def _sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _readonly_uri(path):
+    return f'file:{pathname2url(os.path.abspath(path))}?mode=ro'
+
+
+class BackupBusy(BackupError):
+    """Escritas contínuas não deixaram a cópia em passos terminar; tentar na próxima verificação"""
+
+
+def backup_sqlite(database, target, pages=DEFAULT_PAGES_PER_STEP, pause=DEFAULT_STEP_PAUSE,
+                  max_restarts=DEFAULT_MAX_RESTARTS):
+    """Backup online do SQLite em passos de ``pages`` páginas, comprimido em ``target``
+
+    Uma escrita de outra conexão durante a cópia faz o SQLite recomeçar a
+    partir do início. Com escritas contínuas a cópia em passos nunca
+    terminaria: depois de ``max_restarts`` recomeços ela desiste com
+    BackupBusy. Copiar de uma vez só seguraria o lock SHARED do arquivo (o
+    banco do app usa o journal padrão, não WAL) e pararia as escritas.
+    """
+    state = {'steps': 0, 'restarts': 0, 'remaining': None}
+
+    def progress(status, remaining, total):
+        if state['remaining'] is not None and remaining > state['remaining']:
+            state['restarts'] += 1
+            if state['restarts'] > max_restarts:
+                raise BackupBusy(f'Cópia recomeçada {state["restarts"]} vezes por escritas concorrentes')
+        state['remaining'] = remaining
+        state['steps'] += 1
+        if pause:
+            time.sleep(pause)  # Abre espaço para as escritas entre um passo e outro
+
+    fd, snapshot = tempfile.mkstemp(suffix='.sqlite3', dir=os.path.dirname(target))
+    os.close(fd)
+    try:
+        source = sqlite3.connect(_readonly_uri(database), uri=True)
+        destination = sqlite3.connect(snapshot)
+        try:
+            source.backup(destination, pages=pages, progress=progress)
+        finally:
+            destination.close()
+            source.close()
+        _gzip_file(snapshot, target)
+    finally:
+        os.remove(snapshot)
+    return {'steps': state['steps'], 'restarts': state['restarts']}
+
+
+def backup_postgresql(url, target):
+    """``pg_dump`` em texto, comprimido enquanto é lido; a senha vai por variável de ambiente"""
+    env = dict(os.environ)
+    if url.password:
+        env['PGPASSWORD'] = str(url.password)
+    dsn = url.set(drivername='postgresql', password=None).render_as_string(hide_password=False)
+    command = ['pg_dump', '--format=plain', '--no-owner', '--no-privileges', f'--dbname={dsn}']
+    # Prioridade baixa pelo próprio argv: preexec_fn não é seguro com os threads do worker
+    if shutil.which('nice'):
+        command = ['nice', '-n', '10', *command]
+    process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE, env=env)
+    try:
+        with gzip.open(target, 'wb', compresslevel=COMPRESS_LEVEL) as dst:
+            shutil.copyfileobj(process.stdout, dst, CHUNK_SIZE)
+    finally:
+        process.stdout.close()
+        stderr = process.stderr.read().decode('utf-8', 'replace')
+        process.stderr.close()
+        returncode = process.wait()
+    if returncode != 0:
+        raise BackupError(f'pg_dump terminou com código {returncode}: {stderr.strip()[:500]}')
+    return {}
+
+
+def _snapshot_counts_sqlite(path):
+    fd, snapshot = tempfile.mkstemp(suffix='.sqlite3', dir=os.path.dirname(path))
+    os.close(fd)
+    try:
+        with gzip.open(path, 'rb') as src, open(snapshot, 'wb') as dst:
+            shutil.copyfileobj(src, dst, CHUNK_SIZE)
+        connection = sqlite3.connect(_readonly_uri(snapshot), uri=True)
+        try:
+            integrity = connection.execute('PRAGMA quick_check').fetchone()[0]
+            tables = [row[0] for row in connection.execute("SELECT name FROM sqlite_master WHERE type = 'table'")]
+            counts = {table: connection.execute(f'SELECT count(*) FROM "{table}"').fetchone()[0] for table in tables}
+        finally:
+            connection.close()
+    finally:
+        os.remove(snapshot)
+    return integrity, counts
+
+
+def _snapshot_counts_sql(path):
+    """Conta as linhas dos blocos COPY do dump, sem precisar restaurá-lo num banco"""
+    counts = {}
+    table = None
+    complete = False
+    with gzip.open(path, 'rt', encoding='utf-8', errors='replace') as dump:
+        for line in dump:
+            if table is None:
+                match = COPY_START.match(line)
+                if match:
+                    table = match.group(1).split('.')[-1].strip('"')
+                    counts[table] = 0
+                elif line.startswith('-- PostgreSQL database dump complete'):
+                    complete = True
+            elif line.startswith('\\.'):
+                table = None
+            else:
+                counts[table] += 1
+    return ('ok' if complete else 'dump incompleto'), counts
+
+
+def verify_backup(path):
+    """Abre a cópia e compara as linhas de cada tabela dos modelos com o banco atual
+
+    Falha se a cópia estiver corrompida ou faltar uma tabela que existe no
+    banco; diferenças de contagem são esperadas (escritas depois da cópia) e
+    só vão para o relatório.
+    """
+    started = time.perf_counter()
+    if path.endswith('.sqlite3.gz'):
+        integrity, counts = _snapshot_counts_sqlite(path)
+    else:
+        integrity, counts = _snapshot_counts_sql(path)
+
+    live_tables = set(inspect(db.session.get_bind()).get_table_names())
+    tables = {}
+    missing = []
+    for table in db.metadata.sorted_tables:
+        if table.name not in live_tables:
+            continue
+        live = db.session.execute(select(func.count()).select_from(table)).scalar()
+        if table.name not in counts:
+            # No pg_dump uma tabela vazia também gera um bloco COPY
+            missing.append(table.name)
+            continue
+        tables[table.name] = {'backup': counts[table.name], 'live': live}
+    db.session.rollback()
+
+    return {
+        'path': path,
+        'ok': integrity == 'ok' and not missing,
+        'integrity': integrity,
+        'missing_tables': missing,
+        'tables': tables,
+        'duration_ms': round((time.perf_counter() - started) * 1000, 2)
+    }
+
+
+def rotate_backups(directory, keep=DEFAULT_BACKUP_KEEP):
+    """Apaga as cópias além das ``keep`` mais recentes (e seus manifestos)"""
+    removed = []
+    for _taken_at, path in list_backups(directory)[keep:]:
+        for name in (path, path + '.json'):
+            if os.path.exists(name):
+                os.remove(name)
+        removed.append(os.path.basename(path))
+    return removed
+
+
+def quarantine_backup(path):
+    """Tira da rotação a cópia reprovada (``.failed``), mantendo só a última para análise"""
+    directory = os.path.dirname(path)
+    for name in os.listdir(directory):
+        if name.endswith(QUARANTINE_SUFFIX) or name.endswith(QUARANTINE_SUFFIX + '.json'):
+            os.remove(os.path.join(directory, name))
+    quarantined = path + QUARANTINE_SUFFIX
+    os.replace(path, quarantined)
+    if os.path.exists(path + '.json'):
+        os.replace(path + '.json', quarantined + '.json')
+    return quarantined
+
+
+def gira_in_progress(now=None, quiet_hours=DEFAULT_GIRA_QUIET_HOURS):
+    """Há gira (não cancelada) começando na próxima hora ou nas últimas ``quiet_hours`` horas?"""
+    now = now or datetime.utcnow()
+    return db.session.query(Gira.id).filter(
+        Gira.status != 'cancelada',
+        Gira.data_hora <= now + timedelta(hours=1),
+        Gira.data_hora >= now - timedelta(hours=quiet_hours)
+    ).first() is not None
+
+
+def backup_database(app, force=False, verify=True, now=None):
+    """Faz a cópia do banco do terreiro atual, confere e aplica a retenção
+
+    Sem ``force`` não faz nada se a última cópia for mais nova que
+    BACKUP_INTERVAL ou se houver gira acontecendo.
+    """
+    started = time.perf_counter()
+    now = now or datetime.utcnow()
+    directory = backup_dir(app)
+    backups = list_backups(directory)
+
+    if not force:
+        if backups and (now - backups[0][0]).total_seconds() < app.config['BACKUP_INTERVAL']:
+            return {'count': 0, 'skipped': 'recente', 'duration_ms': 0}
+        if gira_in_progress(now, app.config['BACKUP_GIRA_QUIET_HOURS']):
+            return {'count': 0, 'skipped': 'gira em andamento', 'duration_ms': 0}
+    # Não segurar uma transação da sessão durante a cópia
+    db.session.rollback()
+
+    url = db.session.get_bind().url
+    backend = url.get_backend_name()
+    extension = {'sqlite': 'sqlite3', 'postgresql': 'sql'}.get(backend)
+    if extension is None:
+        raise BackupError(f'Backup não suportado para {backend}')
+    if backend == 'sqlite' and url.database in (None, '', ':memory:'):
+        raise BackupError('Banco SQLite em memória não tem o que copiar')
+
+    path = os.path.join(directory, f'backup-{now.strftime("%Y%m%dT%H%M%S")}.{extension}.gz')
+    partial = path + '.partial'
+    try:
+        if backend == 'sqlite':
+            try:
+                details = backup_sqlite(
+                    url.database, partial,
+                    pages=app.config['BACKUP_PAGES_PER_STEP'],
+                    pause=app.config['BACKUP_STEP_PAUSE'],
+                    max_restarts=app.config['BACKUP_MAX_RESTARTS']
+                )
+            except BackupBusy as e:
+                return {'count': 0, 'skipped': str(e), 'duration_ms': round((time.perf_counter() - started) * 1000, 2)}
+        else:
+            details = backup_postgresql(url, partial)
+        os.replace(partial, path)
+    finally:
+        if os.path.exists(partial):
+            os.remove(partial)
+
+    manifest = {
+        'tenant': current_tenant(),
+        'backend': backend,
+        'taken_at': now.isoformat(),
+        'size': os.path.getsize(path),
+        'sha256': _sha256(path),
+        **details
+    }
+    if verify:
+        manifest['verification'] = verify_backup(path)
+    with open(path + '.json', 'w') as f:
+        json.dump(manifest, f, indent=2)
+
+    if verify and not manifest['verification']['ok']:
+        # Nada é apagado: as cópias antigas continuam sendo as últimas boas
+        quarantined = quarantine_backup(path)
+        raise BackupError(f'Cópia {quarantined} não passou na conferência: {manifest["verification"]["integrity"]}, '
+                          f'tabelas faltando: {manifest["verification"]["missing_tables"]}')
+
+    removed = rotate_backups(directory, app.config['BACKUP_KEEP'])
+
+    return {
+        'path': path,
+        'size': manifest['size'],
+        'removed': removed,
+        'count': 1,
+        'duration_ms': round((time.perf_counter() - started) * 1000, 2)
+    }
+
+
+def _backup_job(app):
+    result = backup_database(app)
+    if result['count']:
+        app.logger.info('Backup %s (%d bytes) em %.1fms', result['path'], result['size'], result['duration_ms'])
+    return result
+
+
+def init_database_backup(app):
+    """Registra a cópia periódica do banco e os comandos CLI"""
+    app.config.setdefault('BACKUP_DIR', os.path.join(app.instance_path, 'backups'))
+    app.config.setdefault('BACKUP_INTERVAL', DEFAULT_BACKUP_INTERVAL)
+    app.config.setdefault('BACKUP_CHECK_INTERVAL', DEFAULT_BACKUP_CHECK_INTERVAL)
+    app.config.setdefault('BACKUP_KEEP', DEFAULT_BACKUP_KEEP)
+    app.config.setdefault('BACKUP_PAGES_PER_STEP', DEFAULT_PAGES_PER_STEP)
+    app.config.setdefault('BACKUP_STEP_PAUSE', DEFAULT_STEP_PAUSE)
+    app.config.setdefault('BACKUP_MAX_RESTARTS', DEFAULT_MAX_RESTARTS)
+    app.config.setdefault('BACKUP_GIRA_QUIET_HOURS', DEFAULT_GIRA_QUIET_HOURS)
+    get_scheduler(app).add_job('database_backup', _backup_job, app.config['BACKUP_CHECK_INTERVAL'])
+
+    @app.cli.command('backup-db')
+    @click.option('--no-verify', is_flag=True, help='Não conferir a cópia depois de gravada')
+    def backup_db_command(no_verify):
+        """Copiar agora o banco padrão e o de cada terreiro"""
+        for tenant in tenant_names(app):
+            with app.app_context():
+                use_tenant(app, tenant)
+                result = backup_database(app, force=True, verify=not no_verify)
+            if result.get('skipped'):
+                click.echo(f"{tenant or 'padrão'}: não copiado ({result['skipped']})")
+                continue
+            click.echo(f"{tenant or 'padrão'}: {result['path']} ({result['size']} bytes, "
+                       f"{result['duration_ms']}ms), removidas: {len(result['removed'])}")
+
+    @app.cli.command('verify-backup')
+    @click.argument('path')
+    @click.option('--tenant', default=None, help='Terreiro do banco para comparar as contagens')
+    def verify_backup_command(path, tenant):
+        """Conferir uma cópia: integridade e linhas por tabela comparadas com o banco"""
+        with app.app_context():
+            use_tenant(app, tenant)
+            result = verify_backup(path)
+        for name, counts in result['tables'].items():
+            click.echo(f"{name}: {counts['backup']} na cópia, {counts['live']} no banco")
+        for name in result['missing_tables']:
+            click.echo(f'{name}: FALTANDO na cópia')
+        click.echo(f"Integridade: {result['integrity']} - {'OK' if result['ok'] else 'FALHOU'}")
@@ -0,0 +1,62 @@
+from datetime import date, datetime
+from decimal import Decimal
+
+from flask import request
+
+
+class FieldsetError(ValueError):
+    """?fields= com campos que a rota não oferece"""
+
+
+def parse_fields(model=None, extra=(), allowed=None):
+    """Campos pedidos em ?fields=a,b,c; None quando o parâmetro não veio (resposta completa)
+
+    Os campos possíveis são as colunas do modelo listadas em
+    ``__sparse_fields__`` (chaves do to_dict) mais os ``extra`` da rota
+    (relacionamentos, totais calculados). O id sempre vem na resposta.
+    """
+    raw = request.args.get('fields')
+    if raw is None:
+        return None
+    fields = {name.strip() for name in raw.split(',') if name.strip()}
+    if allowed is None:
+        allowed = set(getattr(model, '__sparse_fields__', ())) | set(extra)
+    unknown = fields - set(allowed)
+    if unknown:
+        raise FieldsetError(f'Campos desconhecidos em fields: {", ".join(sorted(unknown))}')
+    return fields | {'id'}
+
+
+def sparse_columns(model, fields):
+    """Colunas do modelo (ou alias) para o SELECT: só as pedidas"""
+    names = [name for name in model.__sparse_fields__ if name in fields]
+    if 'id' not in names:
+        names.insert(0, 'id')
+    return [getattr(model, name) for name in names]
+
+
+def json_value(value):
+    """Mesmas conversões dos to_dict dos modelos"""
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return float(value)
+    return value
+
+
+def sparse_dict(row, fields):
+    """Linha de ``with_entities(*sparse_columns(...))`` -> dicionário só com os campos pedidos"""
+    mapping = row._mapping
+    return {name: json_value(mapping[name]) for name in mapping.keys() if name in fields}
+
+
+def sparse_rows(query, model, fields):
+    """Executa a consulta selecionando só as colunas pedidas"""
+    return [sparse_dict(row, fields) for row in query.with_entities(*sparse_columns(model, fields)).all()]
+
+
+def pick_fields(data, fields):
+    """Recorta um dicionário já montado (campos calculados ou aninhados)"""
+    if fields is None:
+        return data
+    return {key: value for key, value in data.items() if key in fields}
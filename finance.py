@@ -16,7 +16,7 @@ class FinancialTransaction(db.Model):
     
     # Relacionamentos
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=True)  # Quem registrou
-    appointment_id = db.Column(db.Integer, db.ForeignKey('appointments.id'), nullable=True)  # Se relacionado a consulta
+    appointment_id = db.Column(db.Integer, db.ForeignKey('appointments.id'), nullable=True, index=True)  # Se relacionado a consulta
     
     # Timestamps
     data_transacao = db.Column(db.DateTime, default=datetime.utcnow)
@@ -91,7 +91,8 @@ class Receipt(db.Model):
     
     id = db.Column(db.Integer, primary_key=True)
     numero = db.Column(db.String(50), unique=True, nullable=False)
-    transaction_id = db.Column(db.Integer, db.ForeignKey('financial_transactions.id'), nullable=False)
+    # Único: duas emissões concorrentes para a mesma transação não passam do commit
+    transaction_id = db.Column(db.Integer, db.ForeignKey('financial_transactions.id'), nullable=False, unique=True)
     cliente_nome = db.Column(db.String(100), nullable=False)
     cliente_documento = db.Column(db.String(20), nullable=True)
     descricao_servico = db.Column(db.String(200), nullable=False)
@@ -117,3 +118,13 @@ class Receipt(db.Model):
             'created_at': self.created_at.isoformat() if self.created_at else None
         }
 
+
+
+class ReceiptCounter(db.Model):
+    __tablename__ = 'receipt_counters'
+    
+    nome = db.Column(db.String(50), primary_key=True)  # receipt-<ano>
+    valor = db.Column(db.Integer, default=0, nullable=False)  # Último número emitido
+    
+    def __repr__(self):
+        return f'<ReceiptCounter {self.nome}={self.valor}>'
@@ -0,0 +1,246 @@
+from datetime import datetime
+
+from flask import Blueprint, request, jsonify
+from flask_jwt_extended import jwt_required, get_jwt_identity
+from sqlalchemy import and_, or_, case
+from sqlalchemy.exc import IntegrityError
+from src.models.user import db, User
+from src.models.library import ForumTopic, ForumPost, ForumReadMarker
+from src.services.archival import archived_topic_stats, history_source
+from src.services.fieldsets import FieldsetError, parse_fields, pick_fields, sparse_columns, sparse_dict
+
+forum_bp = Blueprint('forum', __name__)
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+
+def encode_cursor(post):
+    return f'{post.created_at.isoformat()}_{post.id}'
+
+
+def decode_cursor(cursor):
+    """Converte o cursor '<created_at>_<id>'; retorna None se inválido"""
+    try:
+        created_at, post_id = cursor.rsplit('_', 1)
+        return datetime.fromisoformat(created_at), int(post_id)
+    except (ValueError, AttributeError):
+        return None
+
+
+def _after(created_at, post_id, post=ForumPost):
+    """Posts posteriores a (created_at, id) na ordem da thread"""
+    return or_(
+        post.created_at > created_at,
+        and_(post.created_at == created_at, post.id > post_id)
+    )
+
+
+def _find_post(post, topic_id, post_id=None):
+    """(id, created_at) do post informado ou do último post do tópico"""
+    query = db.session.query(post.id, post.created_at).filter(post.topic_id == topic_id)
+    if post_id:
+        return query.filter(post.id == post_id).first()
+    return query.order_by(post.created_at.desc(), post.id.desc()).first()
+
+
+@forum_bp.route('/topics', methods=['GET'])
+@jwt_required()
+def get_topics():
+    """Listar tópicos com total de posts e não lidos do usuário (uma consulta agrupada)"""
+    try:
+        current_user_id = get_jwt_identity()
+        user = User.query.get(current_user_id)
+
+        if not user:
+            return jsonify({'error': 'Usuário não encontrado'}), 404
+
+        fields = parse_fields(ForumTopic, extra=('posts_count', 'unread_count', 'last_post_at'))
+
+        unread = case(
+            (
+                and_(
+                    ForumPost.id.isnot(None),
+                    ForumPost.author_id != user.id,
+                    or_(
+                        ForumReadMarker.id.is_(None),
+                        _after(ForumReadMarker.last_read_at, ForumReadMarker.last_read_post_id)
+                    )
+                ),
+                1
+            ),
+            else_=0
+        )
+
+        query = db.session.query(
+            ForumTopic,
+            db.func.count(ForumPost.id).label('posts_count'),
+            db.func.coalesce(db.func.sum(unread), 0).label('unread_count'),
+            db.func.max(ForumPost.created_at).label('last_post_at')
+        ).outerjoin(
+            ForumPost, ForumPost.topic_id == ForumTopic.id
+        ).outerjoin(
+            ForumReadMarker, and_(
+                ForumReadMarker.topic_id == ForumTopic.id,
+                ForumReadMarker.user_id == user.id
+            )
+        ).filter(
+            ForumTopic.grau_minimo <= user.grau
+        )
+
+        categoria = request.args.get('categoria')
+        if categoria:
+            query = query.filter(ForumTopic.categoria == categoria)
+
+        rows = query.group_by(ForumTopic.id).order_by(
+            ForumTopic.is_pinned.desc(),
+            ForumTopic.updated_at.desc()
+        ).all()
+
+        # Posts arquivados entram nos totais, mas contam como lidos
+        archived = archived_topic_stats.get()
+
+        topics = []
+        for topic, posts_count, unread_count, last_post_at in rows:
+            archived_count, archived_last = archived.get(topic.id, (0, None))
+            posts_count += archived_count
+            last_post_at = last_post_at or archived_last
+            data = topic.to_dict(posts_count=posts_count)
+            data['unread_count'] = int(unread_count)
+            data['last_post_at'] = last_post_at.isoformat() if last_post_at else None
+            topics.append(pick_fields(data, fields))
+
+        return jsonify({'topics': topics}), 200
+
+    except FieldsetError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@forum_bp.route('/topics/<int:topic_id>/posts', methods=['GET'])
+@jwt_required()
+def get_topic_posts(topic_id):
+    """Listar posts de um tópico com paginação por cursor (created_at, id)"""
+    try:
+        current_user_id = get_jwt_identity()
+        user = User.query.get(current_user_id)
+
+        if not user:
+            return jsonify({'error': 'Usuário não encontrado'}), 404
+
+        topic = ForumTopic.query.get(topic_id)
+        if not topic:
+            return jsonify({'error': 'Tópico não encontrado'}), 404
+
+        if topic.grau_minimo > user.grau:
+            return jsonify({'error': 'Acesso negado. Grau insuficiente para este tópico'}), 403
+
+        limit = min(request.args.get('limit', DEFAULT_PAGE_SIZE, type=int), MAX_PAGE_SIZE)
+        if limit < 1:
+            return jsonify({'error': 'Limite deve ser positivo'}), 400
+
+        fields = parse_fields(ForumPost)
+
+        # Posts de threads antigas podem estar no arquivo: a união só entra se a página começar antes do limite
+        cursor = None
+        after = request.args.get('after')
+        if after:
+            cursor = decode_cursor(after)
+            if cursor is None:
+                return jsonify({'error': 'Cursor inválido'}), 400
+        elif request.args.get('unread') == '1':
+            # Começar do primeiro post não lido
+            marker = ForumReadMarker.query.filter_by(user_id=user.id, topic_id=topic_id).first()
+            if marker:
+                cursor = (marker.last_read_at, marker.last_read_post_id)
+
+        post = history_source(ForumPost, since=cursor[0] if cursor else None)
+        query = db.session.query(post).filter(post.topic_id == topic_id)
+        if cursor:
+            query = query.filter(_after(*cursor, post=post))
+        query = query.order_by(post.created_at, post.id).limit(limit + 1)
+
+        if fields:
+            # created_at entra no SELECT mesmo se não foi pedido: é parte do cursor
+            posts = query.with_entities(*sparse_columns(post, fields | {'created_at'})).all()
+        else:
+            posts = query.all()
+        has_more = len(posts) > limit
+        posts = posts[:limit]
+
+        return jsonify({
+            'topic': topic.to_dict(),
+            'posts': [sparse_dict(row, fields) if fields else row.to_dict() for row in posts],
+            'next_cursor': encode_cursor(posts[-1]) if has_more else None,
+            'has_more': has_more
+        }), 200
+
+    except FieldsetError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+def _advance_marker(user_id, topic_id, read_at, post_id):
+    """Avança o marcador até o post num único UPDATE: só avança, mesmo com abas concorrentes"""
+    ForumReadMarker.query.filter(
+        ForumReadMarker.user_id == user_id,
+        ForumReadMarker.topic_id == topic_id,
+        or_(
+            ForumReadMarker.last_read_at < read_at,
+            and_(ForumReadMarker.last_read_at == read_at, ForumReadMarker.last_read_post_id < post_id)
+        )
+    ).update({'last_read_at': read_at, 'last_read_post_id': post_id}, synchronize_session=False)
+    db.session.commit()
+
+@forum_bp.route('/topics/<int:topic_id>/read', methods=['POST'])
+@jwt_required()
+def mark_topic_read(topic_id):
+    """Marcar o tópico como lido até um post (ou até o último)"""
+    try:
+        current_user_id = get_jwt_identity()
+        user = User.query.get(current_user_id)
+
+        if not user:
+            return jsonify({'error': 'Usuário não encontrado'}), 404
+
+        topic = ForumTopic.query.get(topic_id)
+        if not topic or topic.grau_minimo > user.grau:
+            return jsonify({'error': 'Tópico não encontrado'}), 404
+
+        data = request.get_json(silent=True) or {}
+
+        post = _find_post(ForumPost, topic_id, data.get('post_id'))
+        if not post:
+            # Tópico antigo: o post pode estar no arquivo
+            source = history_source(ForumPost)
+            if source is not ForumPost:
+                post = _find_post(source, topic_id, data.get('post_id'))
+
+        if not post:
+            return jsonify({'error': 'Post não encontrado'}), 404
+
+        read_at, post_id = post.created_at, post.id
+        marker = ForumReadMarker.query.filter_by(user_id=user.id, topic_id=topic_id).first()
+        if marker is None:
+            try:
+                db.session.add(ForumReadMarker(
+                    user_id=user.id,
+                    topic_id=topic_id,
+                    last_read_at=read_at,
+                    last_read_post_id=post_id
+                ))
+                db.session.commit()
+            except IntegrityError:
+                # Outra aba criou o marcador entre a leitura e o commit: avança o dela
+                db.session.rollback()
+                _advance_marker(user.id, topic_id, read_at, post_id)
+        else:
+            _advance_marker(user.id, topic_id, read_at, post_id)
+
+        marker = ForumReadMarker.query.filter_by(user_id=user.id, topic_id=topic_id).one()
+
+        return jsonify({'marker': marker.to_dict()}), 200
+
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 500
@@ -1,6 +1,11 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, Response, current_app, request, jsonify
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from src.models.user import db, User, Gira, Attendance, WorkScale
+from src.services.live_events import get_broker, sse_supported, stream_gira_events
+from src.services.archival import gira_attendance_since, history_source
+from src.services.fieldsets import FieldsetError, parse_fields, sparse_columns, sparse_dict, sparse_rows
+from src.services.work_scale_solver import WorkScaleError, propose_work_scale, apply_work_scale
+from sqlalchemy import cast, literal, null, select, union_all
 from datetime import datetime
 
 gira_bp = Blueprint('gira', __name__)
@@ -8,7 +13,7 @@ gira_bp = Blueprint('gira', __name__)
 @gira_bp.route('/', methods=['GET'])
 @jwt_required()
 def get_giras():
-    """Listar todas as giras"""
+    """Listar todas as giras (fields=titulo,data_hora,... para só alguns campos)"""
     try:
         current_user_id = get_jwt_identity()
         user = User.query.get(current_user_id)
@@ -16,6 +21,8 @@ def get_giras():
         if not user:
             return jsonify({'error': 'Usuário não encontrado'}), 404
         
+        fields = parse_fields(Gira)
+        
         # Filtros opcionais
         status = request.args.get('status')
         tipo = request.args.get('tipo')
@@ -27,12 +34,19 @@ def get_giras():
         if tipo:
             query = query.filter_by(tipo=tipo)
         
-        giras = query.order_by(Gira.data_hora.desc()).all()
+        query = query.order_by(Gira.data_hora.desc())
+        
+        if fields:
+            return jsonify({'giras': sparse_rows(query, Gira, fields)}), 200
+        
+        giras = query.all()
         
         return jsonify({
             'giras': [gira.to_dict() for gira in giras]
         }), 200
         
+    except FieldsetError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -82,10 +96,68 @@ def create_gira():
         db.session.rollback()
         return jsonify({'error': str(e)}), 500
 
+def _gira_history(gira):
+    """Presenças e escalas da gira numa só consulta (UNION ALL nas colunas em comum)
+
+    As presenças de giras antigas podem estar no arquivo.
+    """
+    attendance = history_source(Attendance, since=gira_attendance_since(gira))
+    presencas = select(
+        literal('presenca').label('tipo'), attendance.id, attendance.user_id, attendance.presente,
+        cast(null(), WorkScale.funcao.type).label('funcao'),
+        attendance.observacoes, attendance.created_at, attendance.updated_at
+    ).where(attendance.gira_id == gira.id)
+    escalas = select(
+        literal('escala'), WorkScale.id, WorkScale.user_id, cast(null(), Attendance.presente.type),
+        WorkScale.funcao, WorkScale.observacoes, WorkScale.created_at, WorkScale.updated_at
+    ).where(WorkScale.gira_id == gira.id)
+    
+    presencas_data, escalas_data = [], []
+    for row in db.session.execute(union_all(presencas, escalas)):
+        common = dict(
+            id=row.id, gira_id=gira.id, user_id=row.user_id, observacoes=row.observacoes,
+            created_at=row.created_at, updated_at=row.updated_at
+        )
+        if row.tipo == 'presenca':
+            presencas_data.append(Attendance(presente=row.presente, **common).to_dict())
+        else:
+            escalas_data.append(WorkScale(funcao=row.funcao, **common).to_dict())
+    return presencas_data, escalas_data
+
 @gira_bp.route('/<int:gira_id>', methods=['GET'])
 @jwt_required()
 def get_gira(gira_id):
     """Obter detalhes de uma gira específica"""
+    try:
+        current_user_id = get_jwt_identity()
+        
+        # Usuário e gira na mesma consulta
+        row = db.session.query(User, Gira).outerjoin(Gira, Gira.id == gira_id).filter(
+            User.id == int(current_user_id)
+        ).first()
+        
+        if not row:
+            return jsonify({'error': 'Usuário não encontrado'}), 404
+        
+        user, gira = row
+        if not gira:
+            return jsonify({'error': 'Gira não encontrada'}), 404
+        
+        presencas, escalas = _gira_history(gira)
+        
+        gira_data = gira.to_dict()
+        gira_data['presencas'] = presencas
+        gira_data['escalas'] = escalas
+        
+        return jsonify({'gira': gira_data}), 200
+        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@gira_bp.route('/<int:gira_id>/events', methods=['GET'])
+@jwt_required(locations=['headers', 'query_string'])
+def gira_events(gira_id):
+    """Stream SSE com as alterações de presença, escala e status da gira"""
     try:
         current_user_id = get_jwt_identity()
         user = User.query.get(current_user_id)
@@ -97,15 +169,27 @@ def get_gira(gira_id):
         if not gira:
             return jsonify({'error': 'Gira não encontrada'}), 404
         
-        # Buscar presenças e escalas
-        presencas = Attendance.query.filter_by(gira_id=gira_id).all()
-        escalas = WorkScale.query.filter_by(gira_id=gira_id).all()
+        if current_app.config['GIRA_EVENTS_REQUIRE_GEVENT'] and not sse_supported(request.environ):
+            return jsonify({'error': 'Eventos ao vivo exigem o worker gevent (GUNICORN_WORKER_MODEL=gevent)'}), 503
         
-        gira_data = gira.to_dict()
-        gira_data['presencas'] = [p.to_dict() for p in presencas]
-        gira_data['escalas'] = [e.to_dict() for e in escalas]
+        # EventSource reenvia o último id recebido ao reconectar
+        last_event_id = request.headers.get('Last-Event-ID') or request.args.get('last_event_id')
+        try:
+            last_event_id = int(last_event_id) if last_event_id else None
+        except ValueError:
+            return jsonify({'error': 'Last-Event-ID inválido'}), 400
         
-        return jsonify({'gira': gira_data}), 200
+        stream = stream_gira_events(
+            get_broker(current_app),
+            gira_id,
+            last_event_id,
+            heartbeat=current_app.config['GIRA_EVENTS_HEARTBEAT']
+        )
+        
+        return Response(stream, mimetype='text/event-stream', headers={
+            'Cache-Control': 'no-cache',
+            'X-Accel-Buffering': 'no'
+        })
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -209,6 +293,69 @@ def create_work_scale(gira_id):
         db.session.rollback()
         return jsonify({'error': str(e)}), 500
 
+@gira_bp.route('/<int:gira_id>/work-scale/proposal', methods=['POST'])
+@jwt_required()
+def propose_gira_work_scale(gira_id):
+    """Propor a escala dos médiuns confirmados, com rodízio das funções (apenas grau 6+ ou Pai/Mãe de Trono)"""
+    try:
+        current_user_id = get_jwt_identity()
+        user = User.query.get(current_user_id)
+        
+        if not user or (user.grau < 6 and not user.is_pai_mae_trono()):
+            return jsonify({'error': 'Acesso negado. Apenas usuários grau 6+ podem criar escalas'}), 403
+        
+        gira = Gira.query.get(gira_id)
+        if not gira:
+            return jsonify({'error': 'Gira não encontrada'}), 404
+        
+        data = request.get_json(silent=True) or {}
+        
+        # Vagas por função podem ser ajustadas para esta gira: {"vagas": {"Atabaqueiro": 2}}
+        proposal = propose_work_scale(
+            gira,
+            roles=current_app.config['WORK_SCALE_ROLES'],
+            overrides=data.get('vagas'),
+            history_days=current_app.config['WORK_SCALE_HISTORY_DAYS']
+        )
+        
+        return jsonify({'proposal': proposal}), 200
+        
+    except WorkScaleError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@gira_bp.route('/<int:gira_id>/work-scale/apply', methods=['POST'])
+@jwt_required()
+def apply_gira_work_scale(gira_id):
+    """Gravar de uma vez a escala proposta (apenas grau 6+ ou Pai/Mãe de Trono)"""
+    try:
+        current_user_id = get_jwt_identity()
+        user = User.query.get(current_user_id)
+        
+        if not user or (user.grau < 6 and not user.is_pai_mae_trono()):
+            return jsonify({'error': 'Acesso negado. Apenas usuários grau 6+ podem criar escalas'}), 403
+        
+        gira = Gira.query.get(gira_id)
+        if not gira:
+            return jsonify({'error': 'Gira não encontrada'}), 404
+        
+        data = request.get_json(silent=True) or {}
+        
+        scales = apply_work_scale(gira, data.get('assignments'), roles=current_app.config['WORK_SCALE_ROLES'])
+        
+        return jsonify({
+            'message': 'Escala criada com sucesso',
+            'work_scales': [scale.to_dict() for scale in scales]
+        }), 201
+        
+    except WorkScaleError as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 500
+
 @gira_bp.route('/<int:gira_id>/status', methods=['PUT'])
 @jwt_required()
 def update_gira_status(gira_id):
@@ -250,7 +397,7 @@ def update_gira_status(gira_id):
 @gira_bp.route('/my-attendance', methods=['GET'])
 @jwt_required()
 def get_my_attendance():
-    """Obter histórico de presenças do usuário atual"""
+    """Obter histórico de presenças do usuário atual (intervalo [desde, ate) opcional, em ISO 8601)"""
     try:
         current_user_id = get_jwt_identity()
         user = User.query.get(current_user_id)
@@ -258,7 +405,37 @@ def get_my_attendance():
         if not user:
             return jsonify({'error': 'Usuário não encontrado'}), 404
         
-        attendances = Attendance.query.filter_by(user_id=current_user_id).all()
+        fields = parse_fields(Attendance, extra=('gira',))
+        
+        try:
+            desde = datetime.fromisoformat(request.args['desde']) if request.args.get('desde') else None
+            ate = datetime.fromisoformat(request.args['ate']) if request.args.get('ate') else None
+        except ValueError:
+            return jsonify({'error': 'Datas devem estar no formato ISO (AAAA-MM-DD)'}), 400
+        
+        # O arquivo só entra na consulta se o intervalo começar antes do limite
+        source = history_source(Attendance, since=desde)
+        
+        query = db.session.query(source).filter(source.user_id == current_user_id)
+        if desde:
+            query = query.filter(source.created_at >= desde)
+        if ate:
+            query = query.filter(source.created_at < ate)
+        
+        if fields:
+            # Só as colunas pedidas; a gira vem no mesmo SELECT se for pedida
+            columns = sparse_columns(source, fields)
+            if 'gira' not in fields:
+                return jsonify({'attendances': [
+                    sparse_dict(row, fields) for row in query.with_entities(*columns).all()
+                ]}), 200
+            rows = query.join(Gira, Gira.id == source.gira_id).with_entities(*columns, Gira).all()
+            return jsonify({'attendances': [
+                dict(sparse_dict(row, fields), gira=row.Gira.to_dict()) for row in rows
+            ]}), 200
+        
+        # Carrega as giras no mesmo SELECT para evitar uma consulta por presença
+        attendances = query.options(db.joinedload(source.gira)).all()
         
         attendance_data = []
         for attendance in attendances:
@@ -268,6 +445,8 @@ def get_my_attendance():
         
         return jsonify({'attendances': attendance_data}), 200
         
+    except FieldsetError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -0,0 +1,68 @@
+import json
+
+from src.models.user import db, Gira, Attendance, WorkScale
+from datetime import datetime
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session
+
+
+class GiraEvent(db.Model):
+    __tablename__ = 'gira_events'
+
+    id = db.Column(db.Integer, primary_key=True)
+    gira_id = db.Column(db.Integer, nullable=False, index=True)
+    tipo = db.Column(db.String(50), nullable=False)  # attendance, attendance_removed, work_scale, work_scale_removed, status
+    payload = db.Column(db.Text, nullable=False)  # JSON com o delta
+
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False, index=True)
+
+    def __repr__(self):
+        return f'<GiraEvent {self.tipo} Gira:{self.gira_id}>'
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'gira_id': self.gira_id,
+            'tipo': self.tipo,
+            'payload': json.loads(self.payload),
+            'created_at': self.created_at.isoformat() if self.created_at else None
+        }
+
+
+def _event_row(gira_id, tipo, payload):
+    return {
+        'gira_id': gira_id,
+        'tipo': tipo,
+        'payload': json.dumps(payload, separators=(',', ':')),
+        'created_at': datetime.utcnow()
+    }
+
+
+@event.listens_for(Session, 'after_flush')
+def _collect_gira_events(session, flush_context):
+    """Grava os deltas de presença, escala e status na mesma transação"""
+    rows = []
+
+    for obj in session.new:
+        if isinstance(obj, Attendance):
+            rows.append(_event_row(obj.gira_id, 'attendance', obj.to_dict()))
+        elif isinstance(obj, WorkScale):
+            rows.append(_event_row(obj.gira_id, 'work_scale', obj.to_dict()))
+
+    for obj in session.dirty:
+        if isinstance(obj, Attendance) and session.is_modified(obj, include_collections=False):
+            rows.append(_event_row(obj.gira_id, 'attendance', obj.to_dict()))
+        elif isinstance(obj, WorkScale) and session.is_modified(obj, include_collections=False):
+            rows.append(_event_row(obj.gira_id, 'work_scale', obj.to_dict()))
+        elif isinstance(obj, Gira) and inspect(obj).attrs.status.history.has_changes():
+            rows.append(_event_row(obj.id, 'status', {'gira_id': obj.id, 'status': obj.status}))
+
+    for obj in session.deleted:
+        if isinstance(obj, Attendance):
+            rows.append(_event_row(obj.gira_id, 'attendance_removed', {'id': obj.id, 'user_id': obj.user_id}))
+        elif isinstance(obj, WorkScale):
+            rows.append(_event_row(obj.gira_id, 'work_scale_removed', {'id': obj.id, 'user_id': obj.user_id}))
+
+    if rows:
+        session.connection().execute(GiraEvent.__table__.insert(), rows)
+        session.info['gira_events_pending'] = True
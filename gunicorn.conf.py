@@ -0,0 +1,107 @@
+import multiprocessing
+import os
+import subprocess
+import sys
+
+# Configuração do gunicorn para produção
+#
+#   gunicorn -c gunicorn.conf.py
+#   GUNICORN_WORKER_MODEL=gevent gunicorn -c gunicorn.conf.py
+#
+# Modelos de worker (GUNICORN_WORKER_MODEL):
+#   sync    - um processo por requisição; melhor para rotas presas em CPU (bcrypt no login)
+#   gthread - processos com várias threads; bom equilíbrio para rotas de I/O (giras)
+#   gevent  - greenlets; muitas conexões ociosas/lentas (requer gevent instalado).
+#             Único modelo que serve o SSE de /api/giras/<id>/events (503 nos outros)
+
+wsgi_app = 'src.wsgi:application'
+
+bind = os.environ.get('GUNICORN_BIND', f"0.0.0.0:{os.environ.get('PORT', 5000)}")
+
+cpu_count = multiprocessing.cpu_count()
+worker_model = os.environ.get('GUNICORN_WORKER_MODEL', 'gthread')
+
+if worker_model == 'sync':
+    worker_class = 'sync'
+    default_workers = cpu_count * 2 + 1
+    default_threads = 1
+elif worker_model == 'gevent':
+    worker_class = 'gevent'
+    default_workers = cpu_count + 1
+    default_threads = 1
+    worker_connections = int(os.environ.get('GUNICORN_WORKER_CONNECTIONS', 1000))
+elif worker_model == 'gthread':
+    worker_class = 'gthread'
+    default_workers = cpu_count + 1
+    default_threads = 4
+else:
+    raise ValueError(f'GUNICORN_WORKER_MODEL inválido: {worker_model} (use sync, gthread ou gevent)')
+
+workers = int(os.environ.get('GUNICORN_WORKERS', default_workers))
+threads = int(os.environ.get('GUNICORN_THREADS', default_threads))
+
+# O app não tem efeitos colaterais na importação, então pode ser carregado uma
+# vez no mestre e compartilhado (copy-on-write) entre os workers. No gevent o
+# monkey-patch acontece no worker, depois do fork, por isso o preload fica
+# desligado por padrão nesse modelo.
+preload_app = os.environ.get('GUNICORN_PRELOAD', '0' if worker_model == 'gevent' else '1') == '1'
+
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 30))
+graceful_timeout = int(os.environ.get('GUNICORN_GRACEFUL_TIMEOUT', 30))
+keepalive = int(os.environ.get('GUNICORN_KEEPALIVE', 5))
+
+# Reciclar workers periodicamente limita o crescimento de memória
+max_requests = int(os.environ.get('GUNICORN_MAX_REQUESTS', 2000))
+max_requests_jitter = int(os.environ.get('GUNICORN_MAX_REQUESTS_JITTER', 200))
+
+accesslog = os.environ.get('GUNICORN_ACCESSLOG', '-') or None
+errorlog = '-'
+loglevel = os.environ.get('GUNICORN_LOGLEVEL', 'info')
+
+
+def on_starting(server):
+    """Criar tabelas e dados iniciais uma única vez, no processo mestre"""
+    if os.environ.get('GUNICORN_INIT_DB', '1') != '1':
+        return
+
+    if not preload_app:
+        # Sem preload (gevent) o app não pode ser importado no mestre: os workers
+        # herdariam os módulos já carregados, antes do monkey-patch
+        subprocess.run([sys.executable, '-m', 'flask', '--app', 'src.main', 'init-db'], check=True)
+        return
+
+    from src.main import app, init_database
+    from src.models.user import db
+
+    init_database()
+
+    # Não deixar conexões abertas no mestre para serem herdadas pelos workers
+    with app.app_context():
+        db.engine.dispose()
+
+
+def post_fork(server, worker):
+    """Descarta as conexões herdadas do mestre quando o app foi pré-carregado
+
+    Roda antes do monkey-patch do worker gevent: nada do app é criado aqui.
+    """
+    if not preload_app:
+        return
+
+    from src.main import app
+    from src.models.user import db
+    from src.services.tenancy import get_tenancy
+
+    with app.app_context():
+        db.engine.dispose(close=False)
+    tenancy = get_tenancy(app)
+    if tenancy is not None:
+        tenancy.registry.dispose_all(close=False)
+
+
+def post_worker_init(worker):
+    """Cada worker disputa o agendador (depois do monkey-patch, no gevent)"""
+    from src.main import app
+    from src.services.scheduler import start_scheduler
+
+    start_scheduler(app)
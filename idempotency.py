@@ -0,0 +1,229 @@
+"""Cabeçalho Idempotency-Key nos POST/PUT
+
+O celular que perdeu o sinal no meio da gira repete a requisição com a mesma
+chave. A primeira requisição grava a chave antes de rodar o handler e a
+resposta (status e corpo) depois dele; as repetições custam uma consulta
+pelo índice único e recebem a resposta gravada, sem rodar o handler de novo.
+Uma repetição que chega enquanto a original ainda roda espera por ela.
+
+As chaves valem por IDEMPOTENCY_TTL e são separadas por método, caminho e
+usuário (o ``sub`` do JWT, ou anônimo): a mesma chave em outra rota ou de
+outro usuário é outra requisição, e continua valendo depois de o celular
+renovar o token. Reusar a chave com outro corpo dá 422.
+Respostas 5xx e 429 não são gravadas: a repetição roda o handler de novo.
+"""
+import hashlib
+import time
+from datetime import datetime, timedelta
+
+from flask import Response, current_app, jsonify, request
+from flask_jwt_extended import get_jwt_identity, verify_jwt_in_request
+from sqlalchemy import delete, select, update
+from sqlalchemy.exc import IntegrityError
+
+from src.models.user import db
+from src.models.idempotency_key import IdempotencyKey
+from src.services.scheduler import get_scheduler
+
+HEADER = 'Idempotency-Key'
+REPLAY_HEADER = 'Idempotent-Replayed'
+METHODS = ('POST', 'PUT')
+MAX_KEY_LENGTH = 255
+
+DEFAULT_TTL = 24 * 3600
+DEFAULT_WAIT = 10
+DEFAULT_LOCK_TIMEOUT = 60
+DEFAULT_PRUNE_INTERVAL = 3600
+POLL_INTERVAL = 0.05
+CLAIM_ENVIRON_KEY = 'idempotency.claim'
+
+table = IdempotencyKey.__table__
+
+
+def _transaction():
+    # Conexão própria, fora da sessão: a chave fica visível para os outros
+    # workers na hora, e gravar a resposta não confirma nada que o handler
+    # tenha deixado pendente na sessão
+    return db.session.get_bind().begin()
+
+
+def _identity():
+    """Usuário do JWT válido; 'anon' sem token ou com token inválido (a rota responde o erro)"""
+    try:
+        if verify_jwt_in_request(optional=True) is None:
+            return 'anon'
+    except Exception:
+        return 'anon'
+    return f'user:{get_jwt_identity()}'
+
+
+def _scope():
+    return hashlib.sha256(f'{request.method} {request.path} {_identity()}'.encode()).hexdigest()
+
+
+def _lookup(scope, key):
+    with _transaction() as conn:
+        return conn.execute(select(table).where(table.c.scope == scope, table.c.key == key)).first()
+
+
+def _insert(scope, key, request_hash, now, expired=None):
+    """Reserva a chave; False se outra requisição reservou primeiro"""
+    try:
+        with _transaction() as conn:
+            if expired is not None:
+                conn.execute(delete(table).where(table.c.id == expired.id))
+            conn.execute(table.insert().values(
+                key=key,
+                scope=scope,
+                request_hash=request_hash,
+                created_at=now,
+                expires_at=now + timedelta(seconds=current_app.config['IDEMPOTENCY_TTL'])
+            ))
+        return True
+    except IntegrityError:
+        return False
+
+
+def _take_over(row, request_hash, now):
+    """Assume uma reserva abandonada (worker que morreu no meio do handler)"""
+    with _transaction() as conn:
+        return conn.execute(update(table).where(
+            table.c.id == row.id,
+            table.c.status_code.is_(None),
+            table.c.created_at == row.created_at
+        ).values(
+            request_hash=request_hash,
+            created_at=now,
+            expires_at=now + timedelta(seconds=current_app.config['IDEMPOTENCY_TTL'])
+        )).rowcount == 1
+
+
+def _replay(row):
+    response = Response(row.response_body, status=row.status_code, content_type=row.content_type)
+    response.headers[REPLAY_HEADER] = 'true'
+    return response
+
+
+def _error(message, status, retry_after=None):
+    response = jsonify({'error': message})
+    response.status_code = status
+    if retry_after:
+        response.headers['Retry-After'] = str(retry_after)
+    return response
+
+
+def _set_claim(scope, key):
+    # No environ da requisição, e não em g: as sub-requisições do /api/batch
+    # dividem o g da requisição externa e não podem liberar a chave dela
+    request.environ[CLAIM_ENVIRON_KEY] = (scope, key)
+
+
+def _pop_claim():
+    return request.environ.pop(CLAIM_ENVIRON_KEY, None)
+
+
+def _claim_key():
+    if request.method not in METHODS:
+        return None
+    key = (request.headers.get(HEADER) or '').strip()
+    if not key:
+        return None
+    if len(key) > MAX_KEY_LENGTH:
+        return _error(f'{HEADER} deve ter no máximo {MAX_KEY_LENGTH} caracteres', 400)
+
+    scope = _scope()
+    request_hash = hashlib.sha256(request.get_data(cache=True)).hexdigest()
+    config = current_app.config
+    deadline = time.monotonic() + config['IDEMPOTENCY_WAIT']
+    while True:
+        now = datetime.utcnow()
+        row = _lookup(scope, key)
+        if row is None or row.expires_at <= now:
+            if _insert(scope, key, request_hash, now, expired=row):
+                _set_claim(scope, key)
+                return None
+            continue  # Outra requisição reservou no meio tempo: ler de novo
+
+        if row.request_hash != request_hash:
+            return _error(f'{HEADER} já usada com outro conteúdo', 422)
+        if row.status_code is not None:
+            return _replay(row)
+
+        if row.created_at <= now - timedelta(seconds=config['IDEMPOTENCY_LOCK_TIMEOUT']):
+            if _take_over(row, request_hash, now):
+                _set_claim(scope, key)
+                return None
+            continue
+        if time.monotonic() >= deadline:
+            return _error('Requisição com a mesma chave ainda em andamento', 409, retry_after=1)
+        time.sleep(POLL_INTERVAL)
+
+
+def _release(claim):
+    scope, key = claim
+    with _transaction() as conn:
+        conn.execute(delete(table).where(
+            table.c.scope == scope, table.c.key == key, table.c.status_code.is_(None)
+        ))
+
+
+def _store_response(response):
+    claim = _pop_claim()
+    if claim is None:
+        return response
+    if response.status_code >= 500 or response.status_code == 429 or response.is_streamed \
+            or response.direct_passthrough:
+        _release(claim)
+        return response
+
+    scope, key = claim
+    with _transaction() as conn:
+        conn.execute(update(table).where(
+            table.c.scope == scope, table.c.key == key, table.c.status_code.is_(None)
+        ).values(
+            status_code=response.status_code,
+            content_type=response.content_type,
+            response_body=response.get_data()
+        ))
+    return response
+
+
+def _release_on_error(exc):
+    # Exceção que não chegou ao after_request: libera a chave para a repetição
+    claim = _pop_claim()
+    if claim is not None:
+        _release(claim)
+
+
+def prune_idempotency_keys(now=None):
+    """Remove, em um único DELETE, as chaves vencidas"""
+    started = time.perf_counter()
+    now = now or datetime.utcnow()
+    count = db.session.execute(delete(IdempotencyKey).where(IdempotencyKey.expires_at <= now)).rowcount
+    db.session.commit()
+    return {
+        'count': count,
+        'duration_ms': round((time.perf_counter() - started) * 1000, 2)
+    }
+
+
+def _prune_job(app):
+    return prune_idempotency_keys()
+
+
+def init_idempotency(app):
+    """Registra os ganchos do Idempotency-Key e a limpeza periódica das chaves
+
+    Chamar depois de init_tenancy (a chave fica no banco do terreiro), de
+    init_compression (a resposta é gravada antes de comprimida) e de
+    init_scheduler.
+    """
+    app.config.setdefault('IDEMPOTENCY_TTL', DEFAULT_TTL)
+    app.config.setdefault('IDEMPOTENCY_WAIT', DEFAULT_WAIT)
+    app.config.setdefault('IDEMPOTENCY_LOCK_TIMEOUT', DEFAULT_LOCK_TIMEOUT)
+    app.config.setdefault('IDEMPOTENCY_PRUNE_INTERVAL', DEFAULT_PRUNE_INTERVAL)
+
+    app.before_request(_claim_key)
+    app.after_request(_store_response)
+    app.teardown_request(_release_on_error)
+    get_scheduler(app).add_job('prune_idempotency_keys', _prune_job, app.config['IDEMPOTENCY_PRUNE_INTERVAL'])
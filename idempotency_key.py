@@ -0,0 +1,34 @@
+from src.models.user import db
+from datetime import datetime
+
+
+class IdempotencyKey(db.Model):
+    """Primeira resposta de um POST/PUT com cabeçalho Idempotency-Key
+
+    Enquanto ``status_code`` é nulo a requisição original ainda está rodando
+    e as repetições esperam por ela; depois disso elas recebem a resposta
+    gravada até ``expires_at``.
+    """
+    __tablename__ = 'idempotency_keys'
+    __table_args__ = (
+        db.UniqueConstraint('scope', 'key', name='uq_idempotency_keys_scope_key'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    key = db.Column(db.String(255), nullable=False)
+    scope = db.Column(db.String(64), nullable=False)  # sha256 de método, caminho e credencial
+    request_hash = db.Column(db.String(64), nullable=False)  # sha256 do corpo enviado
+
+    status_code = db.Column(db.Integer, nullable=True)
+    content_type = db.Column(db.String(100), nullable=True)
+    response_body = db.Column(db.LargeBinary, nullable=True)
+
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    expires_at = db.Column(db.DateTime, nullable=False, index=True)
+
+    def __repr__(self):
+        return f'<IdempotencyKey {self.key}>'
+
+    @property
+    def is_complete(self):
+        return self.status_code is not None
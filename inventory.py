@@ -14,7 +14,7 @@ class InventoryItem(db.Model):
     preco_unitario = db.Column(db.Numeric(10, 2), nullable=True)
     
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
-    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, index=True)
     
     # Relacionamentos
     movimentacoes = db.relationship('InventoryMovement', backref='item', lazy='dynamic')
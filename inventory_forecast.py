@@ -0,0 +1,274 @@
+import json
+import math
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+
+try:
+    import numpy as np
+except ImportError:  # numpy é opcional; sem ele o relatório de reposição fica indisponível
+    np = None
+
+from sqlalchemy import select
+
+from src.models.user import db, Gira
+from src.models.inventory import InventoryItem, GiraConsumption
+from src.services.scheduler import get_scheduler
+from src.services.tenancy import tenant_path
+
+DEFAULT_HISTORY_DAYS = 730
+DEFAULT_COVERAGE_DAYS = 30
+DEFAULT_FORECAST_INTERVAL = 3600
+CALENDAR_HORIZON_DAYS = 180
+
+
+def forecast_available():
+    return np is not None
+
+
+def _load_items():
+    rows = db.session.execute(select(
+        InventoryItem.id, InventoryItem.nome, InventoryItem.unidade,
+        InventoryItem.quantidade_atual, InventoryItem.quantidade_minima
+    ).order_by(InventoryItem.id)).all()
+    return rows
+
+
+def _load_history(since, now):
+    """Consumo somado por (item, tipo de gira) em colunas, numa única consulta
+
+    A soma fica no banco: anos de histórico viram (itens x tipos) linhas.
+    Usa a conexão (Core) para não pagar a montagem de linhas do ORM.
+    """
+    rows = db.session.connection().execute(select(
+        GiraConsumption.item_id, Gira.tipo, db.func.sum(GiraConsumption.quantidade_consumida)
+    ).join(
+        Gira, Gira.id == GiraConsumption.gira_id
+    ).where(
+        Gira.data_hora >= since, Gira.data_hora < now, Gira.status != 'cancelada'
+    ).group_by(GiraConsumption.item_id, Gira.tipo)).all()
+    if not rows:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=str), np.empty(0, dtype=np.float64)
+    item_ids, tipos, quantidades = zip(*rows)
+    return (
+        np.asarray(item_ids, dtype=np.int64),
+        np.asarray(tipos, dtype=str),
+        np.asarray(quantidades, dtype=np.float64)
+    )
+
+
+def _load_gira_counts(since, now):
+    """Giras realizadas por tipo na janela, e a data da primeira (para a taxa diária)"""
+    rows = db.session.execute(select(
+        Gira.tipo, db.func.count(Gira.id), db.func.min(Gira.data_hora)
+    ).where(
+        Gira.data_hora >= since, Gira.data_hora < now, Gira.status != 'cancelada'
+    ).group_by(Gira.tipo)).all()
+    counts = {tipo: count for tipo, count, _ in rows}
+    first = min((first for _, _, first in rows if first), default=None)
+    return counts, first
+
+
+def _load_calendar(now, horizon):
+    rows = db.session.execute(select(Gira.tipo, Gira.data_hora).where(
+        Gira.status == 'agendada', Gira.data_hora >= now, Gira.data_hora < now + horizon
+    ).order_by(Gira.data_hora)).all()
+    return [tipo for tipo, _ in rows], [data_hora for _, data_hora in rows]
+
+
+def build_reorder_report(history_days=DEFAULT_HISTORY_DAYS, coverage_days=DEFAULT_COVERAGE_DAYS, now=None):
+    """Projeta o esgotamento de cada item a partir do consumo por tipo de gira
+
+    A taxa de um item num tipo de gira é o consumo total dividido pelo número
+    de giras daquele tipo na janela. O consumo previsto segue o calendário de
+    giras agendadas; depois dele, a média diária do histórico.
+    """
+    if np is None:
+        raise RuntimeError('numpy não está instalado')
+
+    started = time.perf_counter()
+    now = now or datetime.utcnow()
+    since = now - timedelta(days=history_days)
+
+    items = _load_items()
+    h_item, h_tipo, h_qty = _load_history(since, now)
+    gira_counts, first_gira = _load_gira_counts(since, now)
+    cal_tipos, cal_dates = _load_calendar(now, timedelta(days=CALENDAR_HORIZON_DAYS))
+
+    item_ids = np.asarray([row.id for row in items], dtype=np.int64)
+    stock = np.asarray([row.quantidade_atual for row in items], dtype=np.float64)
+    minimum = np.asarray([row.quantidade_minima for row in items], dtype=np.float64)
+
+    # Tipos: os do histórico (via np.unique) e os que só aparecem no calendário
+    tipos, h_tipo_idx = np.unique(h_tipo, return_inverse=True)
+    tipos = [str(tipo) for tipo in tipos]
+    for tipo in set(gira_counts) | set(cal_tipos):
+        if tipo not in tipos:
+            tipos.append(tipo)
+    tipo_index = {tipo: i for i, tipo in enumerate(tipos)}
+
+    # Matriz de consumo (item x tipo), ignorando itens já removidos
+    usage = np.zeros((len(item_ids), len(tipos)))
+    if len(h_item) and len(item_ids):
+        pos = np.clip(np.searchsorted(item_ids, h_item), 0, len(item_ids) - 1)
+        valid = item_ids[pos] == h_item
+        np.add.at(usage, (pos[valid], h_tipo_idx[valid]), h_qty[valid])
+
+    giras_per_tipo = np.asarray([gira_counts.get(tipo, 0) for tipo in tipos], dtype=np.float64)
+    rate = np.divide(usage, giras_per_tipo, out=np.zeros_like(usage), where=giras_per_tipo > 0)
+
+    # Tipos sem histórico usam a média do item por gira, de qualquer tipo
+    total_giras = giras_per_tipo.sum()
+    per_gira = usage.sum(axis=1) / total_giras if total_giras else np.zeros(len(item_ids))
+    rate[:, giras_per_tipo == 0] = per_gira[:, None]
+
+    span_days = max((now - first_gira).total_seconds() / 86400, 1.0) if first_gira else float(history_days)
+    daily = usage.sum(axis=1) / span_days
+
+    # Consumo acumulado ao longo das giras agendadas (item x gira)
+    cal_idx = np.asarray([tipo_index[tipo] for tipo in cal_tipos], dtype=np.int64)
+    cumulative = np.cumsum(rate[:, cal_idx], axis=1)
+    if cal_dates:
+        exhausted = (cumulative >= stock[:, None]) & (cumulative > 0)
+        reorder = ((stock[:, None] - cumulative) <= minimum[:, None]) & (cumulative > 0)
+        remaining = stock - cumulative[:, -1]
+    else:
+        exhausted = reorder = np.zeros((len(item_ids), 0), dtype=bool)
+        remaining = stock.copy()
+    exhausted_at = np.where(exhausted.any(axis=1), exhausted.argmax(axis=1), -1)
+    reorder_at = np.where(reorder.any(axis=1), reorder.argmax(axis=1), -1)
+
+    # Depois do calendário, a média diária
+    calendar_end = cal_dates[-1] if cal_dates else now
+    days_left = np.divide(remaining, daily, out=np.full_like(remaining, np.inf), where=daily > 0)
+    days_to_minimum = np.divide(remaining - minimum, daily, out=np.full_like(remaining, np.inf), where=daily > 0)
+
+    coverage_end = now + timedelta(days=coverage_days)
+    in_coverage = np.asarray([date < coverage_end for date in cal_dates], dtype=bool)
+    if in_coverage.any():
+        coverage_demand = rate[:, cal_idx[in_coverage]].sum(axis=1)
+    else:
+        coverage_demand = daily * coverage_days
+    suggested = np.ceil(np.maximum(coverage_demand + minimum - stock, 0))
+
+    def _projected(index, days):
+        if index >= 0:
+            return cal_dates[index], 'calendario'
+        if math.isfinite(days):
+            return calendar_end + timedelta(days=max(days, 0.0)), 'media_diaria'
+        return None, None
+
+    report_items = []
+    for i, row in enumerate(items):
+        depletion, method = _projected(exhausted_at[i], days_left[i])
+        reorder_by, _ = _projected(reorder_at[i], days_to_minimum[i])
+        if stock[i] <= minimum[i]:
+            reorder_by = now
+        report_items.append({
+            'item_id': row.id,
+            'nome': row.nome,
+            'unidade': row.unidade,
+            'quantidade_atual': row.quantidade_atual,
+            'quantidade_minima': row.quantidade_minima,
+            'consumo_por_gira': {
+                tipo: round(float(rate[i, j]), 3) for j, tipo in enumerate(tipos) if usage[i, j] > 0
+            },
+            'consumo_diario': round(float(daily[i]), 4),
+            'data_esgotamento': depletion.isoformat() if depletion else None,
+            'repor_ate': reorder_by.isoformat() if reorder_by else None,
+            'metodo': method,
+            'quantidade_sugerida': int(suggested[i])
+        })
+
+    report_items.sort(key=lambda item: (item['repor_ate'] is None, item['repor_ate'] or '', item['nome']))
+
+    return {
+        'generated_at': now.isoformat(),
+        'history_days': history_days,
+        'coverage_days': coverage_days,
+        'giras_agendadas': len(cal_dates),
+        'items': report_items,
+        'count': int((suggested > 0).sum()),
+        'duration_ms': round((time.perf_counter() - started) * 1000, 2)
+    }
+
+
+class ReorderReportCache:
+    """Relatório pré-calculado, compartilhado entre os workers por um arquivo JSON
+
+    Com vários terreiros cada um tem o seu arquivo (ver tenant_path).
+    """
+
+    def __init__(self, path, max_age):
+        self.path = path
+        self.max_age = max_age
+        self._lock = threading.Lock()
+        self._loaded = {}  # caminho -> (mtime, relatório)
+
+    def load(self):
+        """Relatório salvo, relido do disco só quando o arquivo muda"""
+        path = tenant_path(self.path)
+        try:
+            mtime = os.stat(path).st_mtime
+        except OSError:
+            return None
+        with self._lock:
+            loaded = self._loaded.get(path)
+            if loaded is None or loaded[0] != mtime:
+                try:
+                    with open(path, encoding='utf-8') as f:
+                        loaded = self._loaded[path] = (mtime, json.load(f))
+                except (OSError, ValueError):
+                    return None
+            if time.time() - mtime > self.max_age:
+                return None
+            return loaded[1]
+
+    def store(self, report):
+        path = tenant_path(self.path)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f'{path}.{os.getpid()}.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+
+    def refresh(self, app):
+        report = build_reorder_report(
+            history_days=app.config['INVENTORY_FORECAST_HISTORY_DAYS'],
+            coverage_days=app.config['INVENTORY_FORECAST_COVERAGE_DAYS']
+        )
+        self.store(report)
+        return report
+
+    def get(self, app):
+        """Relatório em cache; recalcula se não houver um recente"""
+        report = self.load()
+        if report is None:
+            report = self.refresh(app)
+        return report
+
+
+def get_forecast_cache(app):
+    return app.extensions['inventory_forecast']
+
+
+def _forecast_job(app):
+    return get_forecast_cache(app).refresh(app)
+
+
+def init_inventory_forecast(app):
+    """Configura o cache do relatório de reposição e a tarefa que o recalcula"""
+    app.config.setdefault('INVENTORY_FORECAST_FILE', os.path.join(app.instance_path, 'inventory_forecast.json'))
+    app.config.setdefault('INVENTORY_FORECAST_INTERVAL', DEFAULT_FORECAST_INTERVAL)
+    app.config.setdefault('INVENTORY_FORECAST_HISTORY_DAYS', DEFAULT_HISTORY_DAYS)
+    app.config.setdefault('INVENTORY_FORECAST_COVERAGE_DAYS', DEFAULT_COVERAGE_DAYS)
+
+    interval = app.config['INVENTORY_FORECAST_INTERVAL']
+    # Vale por dois ciclos: se a tarefa falhar uma vez, o cache ainda é servido
+    cache = ReorderReportCache(app.config['INVENTORY_FORECAST_FILE'], max_age=2 * interval)
+    app.extensions['inventory_forecast'] = cache
+
+    if forecast_available():
+        get_scheduler(app).add_job('inventory_forecast', _forecast_job, interval)
+    return cache
@@ -1,4 +1,4 @@
-from src.models.user import db
+from src.models.user import db, text_preview
 from datetime import datetime
 
 class LibraryContent(db.Model):
@@ -26,11 +26,16 @@ class LibraryContent(db.Model):
     views_count = db.Column(db.Integer, default=0, nullable=False)
     
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
-    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, index=True)
     
     # Relacionamentos
     acessos = db.relationship('ContentAccess', backref='content', lazy='dynamic')
     
+    # Prévia calculada no SQL (ver text_load_options)
+    descricao_preview = db.query_expression()
+    
+    __text_previews__ = {'descricao': 'descricao_preview'}
+    
     def can_be_accessed_by(self, user):
         """Verifica se o usuário pode acessar este conteúdo"""
         return user.grau >= self.grau_minimo
@@ -38,11 +43,10 @@ class LibraryContent(db.Model):
     def __repr__(self):
         return f'<LibraryContent {self.titulo}>'
     
-    def to_dict(self, user=None):
+    def to_dict(self, user=None, full=True):
         data = {
             'id': self.id,
             'titulo': self.titulo,
-            'descricao': self.descricao,
             'tipo': self.tipo,
             'categoria': self.categoria,
             'grau_minimo': self.grau_minimo,
@@ -55,6 +59,11 @@ class LibraryContent(db.Model):
             'updated_at': self.updated_at.isoformat() if self.updated_at else None
         }
         
+        if full:
+            data['descricao'] = self.descricao
+        else:
+            data['descricao_preview'] = text_preview(self, 'descricao')
+        
         # Só inclui informações do arquivo se o usuário pode acessar
         if user and self.can_be_accessed_by(user):
             data.update({
@@ -116,18 +125,35 @@ class ForumTopic(db.Model):
     author = db.relationship('User', backref='forum_topics')
     posts = db.relationship('ForumPost', backref='topic', lazy='dynamic')
     
+    __sparse_fields__ = (
+        'id', 'titulo', 'descricao', 'categoria', 'grau_minimo', 'author_id', 'is_closed', 'is_pinned',
+        'created_at', 'updated_at'
+    )
+    
+    # ``posts`` só vê a tabela quente; os totais abaixo somam os posts arquivados
+    # (services/archival importa este módulo, daí os imports dentro dos métodos)
+    
     @property
     def posts_count(self):
-        return self.posts.count()
+        from src.services.archival import archived_topic_stats
+        return self.posts.count() + archived_topic_stats.get().get(self.id, (0, None))[0]
     
     @property
     def last_post(self):
-        return self.posts.order_by(ForumPost.created_at.desc()).first()
+        from src.services.archival import archived_topic_stats, history_source
+        post = self.posts.order_by(ForumPost.created_at.desc(), ForumPost.id.desc()).first()
+        if post is not None or self.id not in archived_topic_stats.get():
+            return post
+        # Tópico sem posts recentes: o último está no arquivo
+        source = history_source(ForumPost)
+        return db.session.query(source).filter(source.topic_id == self.id).order_by(
+            source.created_at.desc(), source.id.desc()
+        ).first()
     
     def __repr__(self):
         return f'<ForumTopic {self.titulo}>'
     
-    def to_dict(self):
+    def to_dict(self, posts_count=None):
         return {
             'id': self.id,
             'titulo': self.titulo,
@@ -137,7 +163,7 @@ class ForumTopic(db.Model):
             'author_id': self.author_id,
             'is_closed': self.is_closed,
             'is_pinned': self.is_pinned,
-            'posts_count': self.posts_count,
+            'posts_count': self.posts_count if posts_count is None else posts_count,
             'created_at': self.created_at.isoformat() if self.created_at else None,
             'updated_at': self.updated_at.isoformat() if self.updated_at else None
         }
@@ -145,6 +171,10 @@ class ForumTopic(db.Model):
 
 class ForumPost(db.Model):
     __tablename__ = 'forum_posts'
+    __table_args__ = (
+        # Paginação por (created_at, id) dentro do tópico
+        db.Index('ix_forum_posts_topic_created', 'topic_id', 'created_at', 'id'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     topic_id = db.Column(db.Integer, db.ForeignKey('forum_topics.id'), nullable=False)
@@ -157,16 +187,55 @@ class ForumPost(db.Model):
     # Relacionamentos
     author = db.relationship('User', backref='forum_posts')
     
+    # Prévia calculada no SQL (ver text_load_options)
+    conteudo_preview = db.query_expression()
+    
+    __text_previews__ = {'conteudo': 'conteudo_preview'}
+    
+    __sparse_fields__ = ('id', 'topic_id', 'author_id', 'conteudo', 'created_at', 'updated_at')
+    
     def __repr__(self):
         return f'<ForumPost Topic:{self.topic_id} Author:{self.author_id}>'
     
-    def to_dict(self):
-        return {
+    def to_dict(self, full=True):
+        data = {
             'id': self.id,
             'topic_id': self.topic_id,
             'author_id': self.author_id,
-            'conteudo': self.conteudo,
             'created_at': self.created_at.isoformat() if self.created_at else None,
             'updated_at': self.updated_at.isoformat() if self.updated_at else None
         }
+        
+        if full:
+            data['conteudo'] = self.conteudo
+        else:
+            data['conteudo_preview'] = text_preview(self, 'conteudo')
+            
+        return data
+
 
+class ForumReadMarker(db.Model):
+    __tablename__ = 'forum_read_markers'
+    __table_args__ = (
+        db.UniqueConstraint('user_id', 'topic_id', name='uq_forum_read_markers_user_topic'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    topic_id = db.Column(db.Integer, db.ForeignKey('forum_topics.id'), nullable=False)
+    
+    # Último post lido, na ordem (created_at, id)
+    last_read_at = db.Column(db.DateTime, nullable=False)
+    last_read_post_id = db.Column(db.Integer, nullable=False)
+    
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    def __repr__(self):
+        return f'<ForumReadMarker User:{self.user_id} Topic:{self.topic_id}>'
+    
+    def to_dict(self):
+        return {
+            'topic_id': self.topic_id,
+            'last_read_at': self.last_read_at.isoformat() if self.last_read_at else None,
+            'last_read_post_id': self.last_read_post_id
+        }
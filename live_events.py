@@ -0,0 +1,272 @@
+import queue
+import threading
+import time
+from datetime import datetime, timedelta
+
+from flask import current_app, has_app_context
+from sqlalchemy import event, or_
+from sqlalchemy.orm import Session
+
+from src.models.user import db
+from src.models.gira_event import GiraEvent
+from src.services.tenancy import current_tenant, use_tenant
+
+DEFAULT_POLL_INTERVAL = 1.0
+DEFAULT_HEARTBEAT = 15.0
+DEFAULT_RETENTION = timedelta(days=1)
+SUBSCRIBER_QUEUE_SIZE = 256
+PRUNE_INTERVAL = 600
+
+# Ids de sequência são reservados no INSERT, não no commit: o id 10 pode ficar
+# visível depois do 11. Buracos no cursor são procurados de novo por GAP_GRACE
+# segundos (até MAX_TRACKED_GAPS ids), e o replay reenvia os eventos desse período.
+GAP_GRACE = 30.0
+MAX_TRACKED_GAPS = 1000
+
+
+@event.listens_for(Session, 'after_commit')
+def _wake_broker(session):
+    # Commit local que gravou eventos: acorda o broker do terreiro para entregar sem esperar o poll
+    if session.info.pop('gira_events_pending', False) and has_app_context():
+        broker = current_app.extensions.get('gira_events', {}).get(current_tenant())
+        if broker is not None:
+            broker.wake()
+
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_pending(session):
+    session.info.pop('gira_events_pending', None)
+
+
+class GiraEventBroker:
+    """Distribui os eventos de gira para as conexões SSE deste processo
+
+    Cada worker tem um único thread lendo a tabela gira_events (a fonte
+    compartilhada entre processos) e repassando para filas em memória, então
+    o custo no banco é um SELECT por intervalo por worker, não por cliente.
+    """
+
+    def __init__(self, app, tenant=None, poll_interval=DEFAULT_POLL_INTERVAL, retention=DEFAULT_RETENTION):
+        self.app = app
+        self.tenant = tenant
+        self.poll_interval = poll_interval
+        self.retention = retention
+        self._lock = threading.Lock()
+        self._subscribers = {}  # gira_id -> set(queue)
+        self._last_id = None
+        self._gaps = {}  # id ainda não visto abaixo do cursor -> prazo (monotonic)
+        self._thread = None
+        self._last_prune = 0.0
+        self._local_commit = threading.Event()
+
+    def wake(self):
+        self._local_commit.set()
+
+    def subscribe(self, gira_id):
+        """Fila do assinante; chamar antes do ``replay`` no contexto da requisição
+
+        Com o broker parado, o cursor é posicionado aqui, antes do replay: os
+        eventos gravados entre o replay e o primeiro poll chegam pela fila.
+        """
+        subscriber = queue.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+        with self._lock:
+            self._subscribers.setdefault(gira_id, set()).add(subscriber)
+            seeded = self._last_id is not None
+        if not seeded:
+            self._seed_cursor()
+        self._ensure_running()
+        return subscriber
+
+    def unsubscribe(self, gira_id, subscriber):
+        with self._lock:
+            subscribers = self._subscribers.get(gira_id)
+            if subscribers:
+                subscribers.discard(subscriber)
+                if not subscribers:
+                    del self._subscribers[gira_id]
+
+    def replay(self, gira_id, last_event_id):
+        """Eventos posteriores ao Last-Event-ID informado pelo cliente
+
+        Inclui os eventos dos últimos GAP_GRACE segundos mesmo com id menor:
+        podem ter sido confirmados depois do último que o cliente recebeu
+        (repetidos são tratados como upsert pelo cliente).
+        """
+        recent = datetime.utcnow() - timedelta(seconds=GAP_GRACE)
+        rows = GiraEvent.query.filter(
+            GiraEvent.gira_id == gira_id,
+            or_(GiraEvent.id > last_event_id, GiraEvent.created_at >= recent)
+        ).order_by(GiraEvent.id).all()
+        return [(row.id, row.tipo, row.payload) for row in rows]
+
+    def _ensure_running(self):
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(target=self._run, name='gira-event-broker', daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            with self._lock:
+                if not self._subscribers:
+                    self._thread = None
+                    self._last_id = None
+                    self._gaps = {}
+                    return
+            try:
+                with self.app.app_context():
+                    use_tenant(self.app, self.tenant)
+                    self._poll()
+                    db.session.remove()
+            except Exception:
+                self.app.logger.exception('Falha ao buscar eventos de gira')
+            self._local_commit.wait(self.poll_interval)
+            self._local_commit.clear()
+
+    def _track_gaps(self, first, last, now):
+        """Ids em [first, last) ainda não vistos: podem estar em transações abertas"""
+        for missing in range(max(first, last - MAX_TRACKED_GAPS), last):
+            self._gaps.setdefault(missing, now + GAP_GRACE)
+
+    def _seed_cursor(self):
+        last_id = db.session.query(db.func.max(GiraEvent.id)).scalar() or 0
+        # Buracos logo abaixo do cursor inicial também podem ser transações abertas
+        seen = {row[0] for row in db.session.query(GiraEvent.id).filter(GiraEvent.id > last_id - MAX_TRACKED_GAPS)}
+        with self._lock:
+            if self._last_id is None:
+                self._last_id = last_id
+                now = time.monotonic()
+                for missing in range(max(1, last_id - MAX_TRACKED_GAPS + 1), last_id):
+                    if missing not in seen:
+                        self._gaps[missing] = now + GAP_GRACE
+
+    def _poll(self):
+        if self._last_id is None:
+            self._seed_cursor()
+            return
+
+        now = time.monotonic()
+        self._gaps = {event_id: deadline for event_id, deadline in self._gaps.items() if deadline > now}
+        criteria = GiraEvent.id > self._last_id
+        if self._gaps:
+            criteria = or_(criteria, GiraEvent.id.in_(list(self._gaps)))
+        rows = db.session.query(GiraEvent.id, GiraEvent.gira_id, GiraEvent.tipo, GiraEvent.payload).filter(
+            criteria
+        ).order_by(GiraEvent.id).all()
+
+        for event_id, gira_id, tipo, payload in rows:
+            if event_id > self._last_id:
+                self._track_gaps(self._last_id + 1, event_id, now)
+                self._last_id = event_id
+            else:
+                # Confirmado depois de um id maior: entregue agora, fora de ordem
+                self._gaps.pop(event_id, None)
+            with self._lock:
+                subscribers = list(self._subscribers.get(gira_id, ()))
+            for subscriber in subscribers:
+                try:
+                    subscriber.put_nowait((event_id, tipo, payload))
+                except queue.Full:
+                    # Cliente lento: encerra o stream; o EventSource reconecta pelo Last-Event-ID
+                    _drain(subscriber)
+                    subscriber.put_nowait(None)
+
+        now = time.monotonic()
+        if now - self._last_prune > PRUNE_INTERVAL:
+            self._last_prune = now
+            GiraEvent.query.filter(GiraEvent.created_at < datetime.utcnow() - self.retention).delete()
+            db.session.commit()
+
+
+def _drain(subscriber):
+    try:
+        while True:
+            subscriber.get_nowait()
+    except queue.Empty:
+        pass
+
+
+def sse_supported(environ):
+    """O servidor desta requisição aguenta streams SSE longos?
+
+    No gunicorn, só o worker gevent: nos workers sync e gthread cada stream
+    ocupa um processo ou thread até o cliente desconectar, e poucos celulares
+    abertos na gira bastam para parar a API. Fora do gunicorn (servidor de
+    desenvolvimento) cada conexão tem o seu thread.
+    """
+    if not environ.get('SERVER_SOFTWARE', '').startswith('gunicorn'):
+        return True
+    try:
+        from gevent import monkey
+    except ImportError:
+        return False
+    return monkey.is_module_patched('threading')
+
+
+def format_sse(event_id, tipo, payload):
+    return f'id: {event_id}\nevent: {tipo}\ndata: {payload}\n\n'
+
+
+def stream_gira_events(broker, gira_id, last_event_id, heartbeat=DEFAULT_HEARTBEAT):
+    """Gera o stream SSE: eventos perdidos, depois eventos ao vivo e heartbeats"""
+    subscriber = broker.subscribe(gira_id)
+    try:
+        backlog = broker.replay(gira_id, last_event_id) if last_event_id is not None else []
+    except Exception:
+        broker.unsubscribe(gira_id, subscriber)
+        raise
+    db.session.remove()
+
+    # Eventos do replay que também podem chegar pela fila
+    replayed = {event_id for event_id, _tipo, _payload in backlog}
+
+    def generate():
+        try:
+            yield f'retry: 3000\n: conectado à gira {gira_id}\n\n'
+            for event_id, tipo, payload in backlog:
+                yield format_sse(event_id, tipo, payload)
+
+            while True:
+                try:
+                    item = subscriber.get(timeout=heartbeat)
+                except queue.Empty:
+                    yield f': heartbeat {int(time.time())}\n\n'
+                    continue
+                if item is None:
+                    return
+                event_id, tipo, payload = item
+                if event_id in replayed:
+                    replayed.discard(event_id)
+                    continue
+                yield format_sse(event_id, tipo, payload)
+        finally:
+            broker.unsubscribe(gira_id, subscriber)
+
+    return generate()
+
+
+_brokers_lock = threading.Lock()
+
+
+def get_broker(app):
+    """Broker do terreiro atual; cada banco tem o seu, criado na primeira conexão"""
+    brokers = app.extensions['gira_events']
+    tenant = current_tenant()
+    with _brokers_lock:
+        broker = brokers.get(tenant)
+        if broker is None:
+            broker = brokers[tenant] = GiraEventBroker(
+                app, tenant=tenant, poll_interval=app.config['GIRA_EVENTS_POLL_INTERVAL']
+            )
+    return broker
+
+
+def init_live_events(app):
+    """Cria o broker de eventos de gira deste processo"""
+    app.config.setdefault('GIRA_EVENTS_POLL_INTERVAL', DEFAULT_POLL_INTERVAL)
+    app.config.setdefault('GIRA_EVENTS_HEARTBEAT', DEFAULT_HEARTBEAT)
+    app.config.setdefault('GIRA_EVENTS_REQUIRE_GEVENT', True)
+    broker = GiraEventBroker(app, poll_interval=app.config['GIRA_EVENTS_POLL_INTERVAL'])
+    app.extensions['gira_events'] = {None: broker}
+    return broker
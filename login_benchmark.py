@@ -0,0 +1,168 @@
+"""Latência do login legítimo sob um ataque de credential stuffing, com e sem o limitador
+
+Uso:
+    python -m src.services.login_benchmark --attackers 32 --duration 15
+    python -m src.services.login_benchmark --url http://localhost:5000 --duration 15
+
+Sem --url sobe dois gunicorn (limitador ligado e desligado) com
+LOGIN_RATE_LIMIT_TRUST_PROXY=1, para que cada cliente simulado tenha o seu
+IP via X-Forwarded-For. Os logins legítimos vêm de IPs sempre diferentes
+(usuários distintos); o ataque usa poucos IPs e os e-mails dos membros
+sintéticos (seed_data), para que cada tentativa chegue ao bcrypt.
+"""
+import argparse
+import json
+import random
+import sys
+import threading
+import time
+
+from src.services.benchmark import DEFAULT_EMAIL, DEFAULT_PASSWORD, HttpTransport, percentile
+from src.services.worker_benchmark import free_port, start_gunicorn, stop_gunicorn, wait_until_ready
+
+LOGIN_PATH = '/api/auth/login'
+ATTACKER_IPS = [f'203.0.113.{n}' for n in range(1, 5)]
+
+# Contas existentes (seed_data --members): a senha errada só é testada com bcrypt se o usuário existir
+DEFAULT_VICTIMS = 200
+
+
+def attacker(transport, stop, statuses, lock, victims):
+    local = {}
+    while not stop.is_set():
+        headers = {'X-Forwarded-For': random.choice(ATTACKER_IPS)}
+        body = {'email': f'seed{random.randrange(victims)}@seed.local', 'password': 'senha-vazada'}
+        try:
+            status, _body = transport.request('POST', LOGIN_PATH, headers=headers, body=body)
+        except Exception:
+            status = 0
+        local[status] = local.get(status, 0) + 1
+    with lock:
+        for status, count in local.items():
+            statuses[status] = statuses.get(status, 0) + count
+
+
+def legitimate(transport, stop, email, password, interval, latencies, statuses, lock, offset):
+    n = offset
+    while not stop.is_set():
+        n += 1
+        headers = {'X-Forwarded-For': f'198.51.{n // 250 % 250}.{n % 250 + 1}'}
+        started = time.perf_counter()
+        try:
+            status, _body = transport.request('POST', LOGIN_PATH, headers=headers,
+                                              body={'email': email, 'password': password})
+        except Exception:
+            status = 0
+        elapsed = time.perf_counter() - started
+        with lock:
+            latencies.append(elapsed)
+            statuses[status] = statuses.get(status, 0) + 1
+        stop.wait(interval)
+
+
+def run_scenario(transport, attackers, users, duration, interval, email=DEFAULT_EMAIL, password=DEFAULT_PASSWORD,
+                 victims=DEFAULT_VICTIMS):
+    stop = threading.Event()
+    lock = threading.Lock()
+    latencies = []
+    legit_statuses = {}
+    attack_statuses = {}
+
+    threads = [
+        threading.Thread(target=attacker, args=(transport, stop, attack_statuses, lock, victims), daemon=True)
+        for _ in range(attackers)
+    ] + [
+        threading.Thread(
+            target=legitimate,
+            args=(transport, stop, email, password, interval, latencies, legit_statuses, lock, i * 100000),
+            daemon=True
+        )
+        for i in range(users)
+    ]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    time.sleep(duration)
+    stop.set()
+    for thread in threads:
+        thread.join(timeout=60)
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    attack_total = sum(attack_statuses.values())
+    return {
+        'legit_requests': len(latencies),
+        'legit_ok': legit_statuses.get(200, 0),
+        'legit_p50_ms': percentile(latencies, 50) * 1000,
+        'legit_p95_ms': percentile(latencies, 95) * 1000,
+        'legit_p99_ms': percentile(latencies, 99) * 1000,
+        'attack_rps': attack_total / elapsed if elapsed else 0.0,
+        'attack_blocked_pct': attack_statuses.get(429, 0) * 100.0 / attack_total if attack_total else 0.0,
+    }
+
+
+def format_results(results):
+    lines = [f'{"cenário":<22} {"ok/total":>10} {"p50 ms":>9} {"p95 ms":>9} {"p99 ms":>9} '
+             f'{"ataque req/s":>13} {"bloqueado":>10}']
+    for name, stats in results.items():
+        lines.append(
+            f'{name:<22} {stats["legit_ok"]:>4}/{stats["legit_requests"]:<5} {stats["legit_p50_ms"]:>9.1f} '
+            f'{stats["legit_p95_ms"]:>9.1f} {stats["legit_p99_ms"]:>9.1f} {stats["attack_rps"]:>13.1f} '
+            f'{stats["attack_blocked_pct"]:>9.1f}%'
+        )
+    return '\n'.join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Login legítimo sob ataque, com e sem limitador')
+    parser.add_argument('--url', help='Servidor já em execução (só mede o cenário atual)')
+    parser.add_argument('--config', default='gunicorn.conf.py')
+    parser.add_argument('--model', default='gthread', help='Modelo de worker do gunicorn')
+    parser.add_argument('--workers', type=int)
+    parser.add_argument('--attackers', type=int, default=32, help='Threads de ataque')
+    parser.add_argument('--users', type=int, default=2, help='Threads de usuários legítimos')
+    parser.add_argument('--interval', type=float, default=0.2, help='Pausa entre logins legítimos (s)')
+    parser.add_argument('--victims', type=int, default=DEFAULT_VICTIMS, help='Membros sintéticos atacados')
+    parser.add_argument('--duration', type=float, default=15.0)
+    parser.add_argument('--output', help='Gravar os resultados em JSON')
+    args = parser.parse_args(argv)
+
+    results = {}
+    if args.url:
+        transport = HttpTransport(args.url)
+        results['sem ataque'] = run_scenario(transport, 0, args.users, args.duration, args.interval,
+                                             victims=args.victims)
+        results['ataque'] = run_scenario(transport, args.attackers, args.users, args.duration, args.interval,
+                                         victims=args.victims)
+    else:
+        for enabled in ('0', '1'):
+            port = free_port()
+            process = start_gunicorn(args.model, port, args.config, args.workers, extra_env={
+                'LOGIN_RATE_LIMIT_ENABLED': enabled,
+                'LOGIN_RATE_LIMIT_TRUST_PROXY': '1',
+                'SCHEDULER_ENABLED': '0'
+            })
+            transport = HttpTransport(f'http://127.0.0.1:{port}')
+            label = 'com limite' if enabled == '1' else 'sem limite'
+            try:
+                wait_until_ready(transport)
+                print(f'{label}: medindo...', file=sys.stderr)
+                if enabled == '0':
+                    results['sem ataque'] = run_scenario(
+                        transport, 0, args.users, args.duration, args.interval, victims=args.victims
+                    )
+                results[f'ataque {label}'] = run_scenario(
+                    transport, args.attackers, args.users, args.duration, args.interval, victims=args.victims
+                )
+            finally:
+                stop_gunicorn(process)
+
+    print(format_results(results))
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,231 @@
+import abc
+import importlib
+import os
+import sqlite3
+import threading
+import time
+from functools import wraps
+
+from flask import current_app, jsonify, request
+
+from src.services.tenancy import current_tenant
+
+# (capacidade, segundos para encher o balde): 20 tentativas de rajada por IP,
+# repostas ao longo de um minuto; 5 por e-mail.
+DEFAULT_IP_LIMIT = (20, 60)
+DEFAULT_EMAIL_LIMIT = (5, 60)
+PRUNE_INTERVAL = 300
+
+
+class RateLimitBackend(abc.ABC):
+    """Interface dos armazenamentos de baldes (token bucket)
+
+    ``consume`` tira uma ficha do balde ``key`` e retorna (permitido,
+    segundos até a próxima ficha). Para um armazenamento externo (Redis,
+    memcached) basta implementar estes três métodos e apontar
+    LOGIN_RATE_LIMIT_BACKEND para 'modulo:Classe'.
+    """
+
+    @abc.abstractmethod
+    def consume(self, key, capacity, period, now=None):
+        pass
+
+    @abc.abstractmethod
+    def reset(self, key):
+        pass
+
+    def prune(self, max_idle, now=None):
+        pass
+
+
+def _refill(tokens, updated, capacity, period, now):
+    if tokens is None:
+        return float(capacity)
+    return min(float(capacity), tokens + (now - updated) * capacity / period)
+
+
+def _result(tokens, capacity, period):
+    if tokens >= 1:
+        return True, 0.0
+    return False, (1 - tokens) * period / capacity
+
+
+class MemoryRateLimitBackend(RateLimitBackend):
+    """Baldes em memória: só vale para um processo (desenvolvimento e testes)"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._buckets = {}  # chave -> (fichas, atualizado em)
+
+    def consume(self, key, capacity, period, now=None):
+        now = time.time() if now is None else now
+        with self._lock:
+            tokens, updated = self._buckets.get(key, (None, now))
+            tokens = _refill(tokens, updated, capacity, period, now)
+            allowed, retry_after = _result(tokens, capacity, period)
+            self._buckets[key] = (tokens - 1 if allowed else tokens, now)
+        return allowed, retry_after
+
+    def reset(self, key):
+        with self._lock:
+            self._buckets.pop(key, None)
+
+    def prune(self, max_idle, now=None):
+        now = time.time() if now is None else now
+        with self._lock:
+            for key in [key for key, (_t, updated) in self._buckets.items() if now - updated > max_idle]:
+                del self._buckets[key]
+
+
+class SQLiteRateLimitBackend(RateLimitBackend):
+    """Baldes num SQLite local, compartilhado pelos workers do gunicorn na mesma máquina
+
+    Cada consumo é uma transação curta (BEGIN IMMEDIATE) em modo WAL e sem
+    fsync: o estado é descartável e o custo fica em dezenas de microssegundos.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+
+    def _connection(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None and self._local.pid == os.getpid():
+            return conn
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=OFF')
+        conn.execute(
+            'CREATE TABLE IF NOT EXISTS buckets '
+            '(key TEXT PRIMARY KEY, tokens REAL NOT NULL, updated REAL NOT NULL)'
+        )
+        self._local.conn = conn
+        self._local.pid = os.getpid()
+        return conn
+
+    def consume(self, key, capacity, period, now=None):
+        now = time.time() if now is None else now
+        conn = self._connection()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            row = conn.execute('SELECT tokens, updated FROM buckets WHERE key = ?', (key,)).fetchone()
+            tokens = _refill(row[0] if row else None, row[1] if row else now, capacity, period, now)
+            allowed, retry_after = _result(tokens, capacity, period)
+            conn.execute(
+                'INSERT INTO buckets (key, tokens, updated) VALUES (?, ?, ?) '
+                'ON CONFLICT(key) DO UPDATE SET tokens = excluded.tokens, updated = excluded.updated',
+                (key, tokens - 1 if allowed else tokens, now)
+            )
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+        return allowed, retry_after
+
+    def reset(self, key):
+        self._connection().execute('DELETE FROM buckets WHERE key = ?', (key,))
+
+    def prune(self, max_idle, now=None):
+        now = time.time() if now is None else now
+        self._connection().execute('DELETE FROM buckets WHERE updated < ?', (now - max_idle,))
+
+
+class LoginRateLimiter:
+    def __init__(self, backend, ip_limit=DEFAULT_IP_LIMIT, email_limit=DEFAULT_EMAIL_LIMIT, trust_proxy=False):
+        self.backend = backend
+        self.ip_limit = ip_limit
+        self.email_limit = email_limit
+        self.trust_proxy = trust_proxy
+        self._last_prune = 0.0
+
+    def client_ip(self):
+        # Atrás de um proxy confiável (nginx), o IP real vem no X-Forwarded-For
+        if self.trust_proxy and request.access_route:
+            return request.access_route[0]
+        return request.remote_addr or 'desconhecido'
+
+    def _key(self, kind, value):
+        return f'{current_tenant() or ""}:{kind}:{value}'
+
+    def check(self, email):
+        """Consome as fichas do IP e do e-mail; retorna os segundos de espera se bloqueado"""
+        now = time.time()
+        if now - self._last_prune > PRUNE_INTERVAL:
+            self._last_prune = now
+            # Balde parado por um período inteiro já está cheio: pode sair do armazenamento
+            self.backend.prune(max(self.ip_limit[1], self.email_limit[1]), now)
+
+        allowed, retry_after = self.backend.consume(self._key('ip', self.client_ip()), *self.ip_limit, now=now)
+        if allowed and email:
+            allowed, retry_after = self.backend.consume(self._key('email', email), *self.email_limit, now=now)
+        return None if allowed else retry_after
+
+    def reset_email(self, email):
+        if email:
+            self.backend.reset(self._key('email', email))
+
+
+def _status_code(response):
+    if isinstance(response, tuple):
+        return response[1] if len(response) > 1 else 200
+    return response.status_code
+
+
+def limit_login(view):
+    """Recusa tentativas de login acima do limite antes de qualquer consulta ou bcrypt"""
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        limiter = current_app.extensions.get('login_limiter')
+        if limiter is None:
+            return view(*args, **kwargs)
+
+        data = request.get_json(silent=True) or {}
+        email = str(data.get('email') or '').strip().lower()
+
+        retry_after = limiter.check(email)
+        if retry_after is not None:
+            response = jsonify({'error': 'Muitas tentativas de login. Tente novamente em instantes'})
+            response.status_code = 429
+            response.headers['Retry-After'] = str(max(1, int(retry_after + 0.999)))
+            return response
+
+        response = view(*args, **kwargs)
+        if _status_code(response) == 200:
+            # Login certo libera o e-mail; o balde do IP segue valendo
+            limiter.reset_email(email)
+        return response
+
+    return wrapper
+
+
+def _make_backend(app):
+    backend = app.config['LOGIN_RATE_LIMIT_BACKEND']
+    if backend == 'sqlite':
+        return SQLiteRateLimitBackend(app.config['LOGIN_RATE_LIMIT_FILE'])
+    if backend == 'memory':
+        return MemoryRateLimitBackend()
+    module_name, _sep, class_name = backend.partition(':')
+    return getattr(importlib.import_module(module_name), class_name)()
+
+
+def init_login_limit(app):
+    """Configura o limitador de tentativas de login compartilhado entre os workers"""
+    app.config.setdefault('LOGIN_RATE_LIMIT_ENABLED', True)
+    app.config.setdefault('LOGIN_RATE_LIMIT_BACKEND', 'sqlite')
+    app.config.setdefault('LOGIN_RATE_LIMIT_FILE', os.path.join(app.instance_path, 'login_limits.sqlite'))
+    app.config.setdefault('LOGIN_RATE_LIMIT_IP', DEFAULT_IP_LIMIT)
+    app.config.setdefault('LOGIN_RATE_LIMIT_EMAIL', DEFAULT_EMAIL_LIMIT)
+    app.config.setdefault('LOGIN_RATE_LIMIT_TRUST_PROXY', False)
+
+    if not app.config['LOGIN_RATE_LIMIT_ENABLED']:
+        return None
+
+    limiter = LoginRateLimiter(
+        _make_backend(app),
+        ip_limit=tuple(app.config['LOGIN_RATE_LIMIT_IP']),
+        email_limit=tuple(app.config['LOGIN_RATE_LIMIT_EMAIL']),
+        trust_proxy=app.config['LOGIN_RATE_LIMIT_TRUST_PROXY']
+    )
+    app.extensions['login_limiter'] = limiter
+    return limiter
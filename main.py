@@ -3,7 +3,8 @@ import sys
 # DON'T CHANGE THIS !!!
 sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
 
-from flask import Flask, send_from_directory
+import click
+from flask import Flask, request
 from flask_cors import CORS
 from flask_jwt_extended import JWTManager
 from datetime import timedelta
@@ -12,8 +13,14 @@ from datetime import timedelta
 from src.models.user import db, User, Entity, Gira, Attendance, WorkScale, Proof, DiaryEntry
 from src.models.inventory import InventoryItem, InventoryMovement, GiraConsumption
 from src.models.finance import FinancialTransaction, Budget, Receipt
-from src.models.library import LibraryContent, ContentAccess, ForumTopic, ForumPost
-from src.models.appointment import Client, Appointment, AppointmentSlot, WhatsAppMessage
+from src.models.library import LibraryContent, ContentAccess, ForumTopic, ForumPost, ForumReadMarker
+from src.models.appointment import (
+    Client, Appointment, AppointmentSlot, AvailabilityRule, AvailabilityException, WhatsAppMessage
+)
+from src.models.tombstone import SyncTombstone
+from src.models.gira_event import GiraEvent
+from src.models.archive import ArchiveWatermark
+from src.models.idempotency_key import IdempotencyKey
 
 # Importar blueprints
 from src.routes.user import user_bp
@@ -23,6 +30,37 @@ from src.routes.inventory import inventory_bp
 from src.routes.finance import finance_bp
 from src.routes.library import library_bp
 from src.routes.appointment import appointment_bp
+from src.routes.sync import sync_bp, backfill_sync_timestamps
+from src.routes.receipt import receipt_bp
+from src.routes.forum import forum_bp
+from src.routes.client_search import client_search_bp
+from src.routes.reconciliation import reconciliation_bp
+from src.routes.reorder import reorder_bp
+from src.routes.bulk_import import bulk_import_bp
+from src.routes.catalog import catalog_bp
+from src.routes.availability import availability_bp
+from src.routes.batch import batch_bp
+
+from src.services.tenancy import init_tenancy, provision_tenant, get_tenancy
+from src.services.login_limit import init_login_limit
+from src.services.static_assets import init_static_assets, serve_static
+from src.services.metrics import init_metrics
+from src.services.live_events import init_live_events
+from src.services.receipt_service import init_receipts
+from src.services.scheduler import init_scheduler, start_scheduler
+from src.services.proof_sweeper import init_proof_sweeper
+from src.services.reconciliation_service import init_reconciliation
+from src.services.inventory_forecast import init_inventory_forecast
+from src.services.bulk_import_service import init_bulk_import
+from src.services.archival import init_archival
+from src.services.database_backup import init_database_backup
+from src.services.compression import init_compression
+from src.services.catalog_cache import init_catalog_cache
+from src.services.work_scale_solver import init_work_scale_solver
+from src.services.idempotency import init_idempotency
+from src.services.batch_service import init_batch
+from src.services.client_lookup import backfill_client_search
+from src.services.schema_upgrade import upgrade_schema
 
 app = Flask(__name__, static_folder=os.path.join(os.path.dirname(__file__), 'static'))
 
@@ -42,6 +80,24 @@ else:
 
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
 
+# Instrumentação de requisições
+app.config['METRICS_SLOW_REQUEST_MS'] = int(os.environ.get('METRICS_SLOW_REQUEST_MS', 500))
+app.config['METRICS_TOKEN'] = os.environ.get('METRICS_TOKEN')
+
+# Tarefas agendadas (rodam em um único worker, via trava de arquivo)
+app.config['SCHEDULER_ENABLED'] = os.environ.get('SCHEDULER_ENABLED', '1') == '1'
+
+# Vários terreiros no mesmo deploy: um banco por terreiro, escolhido pelo
+# subdomínio (dragao.TENANT_BASE_DOMAIN) ou pelo claim 'tenant' do JWT.
+# Sem TENANT_DATABASE_URL tudo usa o banco padrão acima.
+app.config['TENANT_DATABASE_URL'] = os.environ.get('TENANT_DATABASE_URL')  # ex.: postgresql://.../nzila_{tenant}
+app.config['TENANTS'] = [t.strip() for t in os.environ.get('TENANTS', '').split(',') if t.strip()]
+app.config['TENANT_BASE_DOMAIN'] = os.environ.get('TENANT_BASE_DOMAIN')
+
+# Limite de tentativas de login por IP e por e-mail (estado compartilhado entre workers)
+app.config['LOGIN_RATE_LIMIT_ENABLED'] = os.environ.get('LOGIN_RATE_LIMIT_ENABLED', '1') == '1'
+app.config['LOGIN_RATE_LIMIT_TRUST_PROXY'] = os.environ.get('LOGIN_RATE_LIMIT_TRUST_PROXY', '0') == '1'
+
 # Inicializar extensões
 db.init_app(app)
 jwt = JWTManager(app)
@@ -55,37 +111,124 @@ app.register_blueprint(inventory_bp, url_prefix='/api/inventory')
 app.register_blueprint(finance_bp, url_prefix='/api/finance')
 app.register_blueprint(library_bp, url_prefix='/api/library')
 app.register_blueprint(appointment_bp, url_prefix='/api/appointments')
+app.register_blueprint(sync_bp, url_prefix='/api/sync')
+app.register_blueprint(receipt_bp, url_prefix='/api/finance/receipts')
+app.register_blueprint(forum_bp, url_prefix='/api/forum')
+app.register_blueprint(client_search_bp, url_prefix='/api/appointments')
+app.register_blueprint(reconciliation_bp, url_prefix='/api/finance/reconciliation')
+app.register_blueprint(reorder_bp, url_prefix='/api/inventory')
+app.register_blueprint(bulk_import_bp, url_prefix='/api')
+app.register_blueprint(catalog_bp, url_prefix='/api')
+app.register_blueprint(availability_bp, url_prefix='/api/appointments')
+app.register_blueprint(batch_bp, url_prefix='/api')
+
+# Roteamento por terreiro (depois do JWTManager)
+init_tenancy(app)
+
+# Limite de tentativas de login (antes do bcrypt)
+init_login_limit(app)
+
+# Métricas por endpoint em /api/metrics
+init_metrics(app)
+
+# Respostas JSON comprimidas (gzip/brotli)
+init_compression(app)
+
+# Catálogo da biblioteca e entidades em memória (por grau)
+init_catalog_cache(app)
+
+# Funções e rodízio da proposta automática de escala
+init_work_scale_solver(app)
+
+# Eventos ao vivo das giras (SSE)
+init_live_events(app)
+
+# Renderização de recibos em pool de processos
+init_receipts(app)
 
-# Criar tabelas do banco de dados
-with app.app_context():
-    db.create_all()
+# Tarefas periódicas
+init_scheduler(app)
+init_proof_sweeper(app)
+init_reconciliation(app)
+init_inventory_forecast(app)
+init_archival(app)
+init_database_backup(app)
+
+# Idempotency-Key nos POST/PUT: repetições recebem a primeira resposta
+init_idempotency(app)
+
+# Várias chamadas numa só ida e volta em /api/batch
+init_batch(app)
+
+# Importação em massa de membros e clientes (hash bcrypt em pool de processos)
+init_bulk_import(app)
+
+# Manifesto dos arquivos do frontend (montado uma vez na inicialização)
+init_static_assets(app)
+
+def seed_initial_data():
+    """Criar dados iniciais se não existirem (requer contexto da aplicação)"""
+    if Entity.query.first():
+        return False
+    
+    # Criar algumas entidades padrão
+    entities = [
+        Entity(nome='Exu Tranca Ruas', tipo='Exu', linha='Encruzilhada'),
+        Entity(nome='Pombagira Maria Padilha', tipo='Pombagira', linha='Cruzeiro'),
+        Entity(nome='Exu Caveira', tipo='Exu', linha='Cemitério'),
+        Entity(nome='Pombagira Cigana', tipo='Pombagira', linha='Cigana'),
+        Entity(nome='Exu Marabô', tipo='Exu', linha='Lira'),
+    ]
+    for entity in entities:
+        db.session.add(entity)
     
-    # Criar dados iniciais se não existirem
-    if not Entity.query.first():
-        # Criar algumas entidades padrão
-        entities = [
-            Entity(nome='Exu Tranca Ruas', tipo='Exu', linha='Encruzilhada'),
-            Entity(nome='Pombagira Maria Padilha', tipo='Pombagira', linha='Cruzeiro'),
-            Entity(nome='Exu Caveira', tipo='Exu', linha='Cemitério'),
-            Entity(nome='Pombagira Cigana', tipo='Pombagira', linha='Cigana'),
-            Entity(nome='Exu Marabô', tipo='Exu', linha='Lira'),
-        ]
-        for entity in entities:
-            db.session.add(entity)
-        
-        # Criar usuário administrador padrão
-        admin_user = User(
-            nome_civil='Administrador do Sistema',
-            nome_ritual='Pai/Mãe de Trono',
-            email='admin@nziladragao.com',
-            grau=7,
-            role='pai_mae_trono'
-        )
-        admin_user.set_password('admin123')
-        db.session.add(admin_user)
-        
-        db.session.commit()
-        print("Dados iniciais criados com sucesso!")
+    # Criar usuário administrador padrão
+    admin_user = User(
+        nome_civil='Administrador do Sistema',
+        nome_ritual='Pai/Mãe de Trono',
+        email='admin@nziladragao.com',
+        grau=7,
+        role='pai_mae_trono'
+    )
+    admin_user.set_password('admin123')
+    db.session.add(admin_user)
+    
+    db.session.commit()
+    print("Dados iniciais criados com sucesso!")
+    return True
+
+def prepare_database():
+    """Carga inicial e correção de dados antigos (requer contexto da aplicação)"""
+    upgrade_schema()
+    backfill_sync_timestamps()
+    backfill_client_search()
+    return seed_initial_data()
+
+def init_database():
+    """Criar tabelas e dados iniciais do banco de dados
+
+    Não roda na importação do módulo, para que o app possa ser pré-carregado
+    pelo gunicorn (preload_app) sem abrir conexões antes do fork.
+    """
+    with app.app_context():
+        db.create_all()
+        prepare_database()
+
+@app.cli.command('init-db')
+def init_db_command():
+    """Criar tabelas e dados iniciais"""
+    init_database()
+
+@app.cli.command('provision-tenant')
+@click.argument('tenants', nargs=-1)
+def provision_tenant_command(tenants):
+    """Criar tabelas e dados iniciais no banco de cada terreiro (todos, se nenhum for informado)"""
+    tenancy = get_tenancy(app)
+    if tenancy is None:
+        raise click.UsageError('Defina TENANT_DATABASE_URL e TENANTS')
+    for tenant in tenants or sorted(tenancy.tenants):
+        created = provision_tenant(app, tenant, seed=prepare_database)
+        click.echo(f"{tenant}: {'provisionado' if created else 'já provisionado'}")
 
 @app.route('/api/health')
 def health_check():
@@ -96,19 +239,17 @@ def health_check():
 @app.route('/<path:path>')
 def serve(path):
     """Servir arquivos estáticos do frontend"""
-    static_folder_path = app.static_folder
-    if static_folder_path is None:
+    if app.static_folder is None:
         return "Static folder not configured", 404
 
-    if path != "" and os.path.exists(os.path.join(static_folder_path, path)):
-        return send_from_directory(static_folder_path, path)
-    else:
-        index_path = os.path.join(static_folder_path, 'index.html')
-        if os.path.exists(index_path):
-            return send_from_directory(static_folder_path, 'index.html')
-        else:
-            return "index.html not found", 404
+    response = serve_static(app, request, path)
+    if response is None:
+        return "index.html not found", 404
+    return response
 
 if __name__ == '__main__':
-    app.run(host='0.0.0.0', port=5000, debug=True)
+    # Servidor de desenvolvimento; em produção use gunicorn -c gunicorn.conf.py
+    init_database()
+    start_scheduler(app)
+    app.run(host='0.0.0.0', port=int(os.environ.get('PORT', 5000)), debug=os.environ.get('FLASK_DEBUG', '1') == '1')
 
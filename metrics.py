@@ -0,0 +1,279 @@
+"""Métricas de requisições, tarefas e caches no formato do Prometheus
+
+Os contadores ficam na memória de cada processo: com vários workers do
+gunicorn cada scrape de /api/metrics responde só pelo worker que o
+atendeu. Toda série leva o label ``worker`` (pid) para que o Prometheus não
+misture os contadores de processos diferentes (somar com
+``sum without (worker)``); um worker reciclado recomeça do zero com outro pid.
+"""
+import logging
+import os
+import threading
+import time
+from bisect import bisect_left
+
+from flask import Blueprint, Response, current_app, g, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+logger = logging.getLogger(__name__)
+
+metrics_bp = Blueprint('metrics', __name__)
+
+# Limites (em segundos) dos buckets do histograma de latência
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+DEFAULT_SLOW_REQUEST_MS = 500
+SLOW_REQUEST_TOP_STATEMENTS = 5
+
+
+class RequestMetrics:
+    """Agregador em memória das métricas de requisição (por processo)"""
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = tuple(buckets)
+        self._lock = threading.Lock()
+        self._series = {}
+
+    def observe(self, endpoint, method, status, duration, sql_count, sql_time):
+        key = (endpoint, method, str(status))
+        index = bisect_left(self.buckets, duration)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = {
+                    'buckets': [0] * (len(self.buckets) + 1),
+                    'count': 0,
+                    'sum': 0.0,
+                    'sql_count': 0,
+                    'sql_time': 0.0
+                }
+            series['buckets'][index] += 1
+            series['count'] += 1
+            series['sum'] += duration
+            series['sql_count'] += sql_count
+            series['sql_time'] += sql_time
+
+    def reset(self):
+        with self._lock:
+            self._series.clear()
+
+    def render(self):
+        """Exporta as métricas no formato texto do Prometheus"""
+        with self._lock:
+            snapshot = {key: dict(value, buckets=list(value['buckets'])) for key, value in self._series.items()}
+        worker = _worker_label()
+
+        lines = [
+            '# HELP http_request_duration_seconds Latência das requisições por endpoint e status',
+            '# TYPE http_request_duration_seconds histogram'
+        ]
+        for (endpoint, method, status), series in sorted(snapshot.items()):
+            labels = f'{worker},endpoint="{_escape(endpoint)}",method="{method}",status="{status}"'
+            cumulative = 0
+            for bound, count in zip(self.buckets, series['buckets']):
+                cumulative += count
+                lines.append(f'http_request_duration_seconds_bucket{{{labels},le="{bound}"}} {cumulative}')
+            lines.append(f'http_request_duration_seconds_bucket{{{labels},le="+Inf"}} {series["count"]}')
+            lines.append(f'http_request_duration_seconds_sum{{{labels}}} {series["sum"]:.6f}')
+            lines.append(f'http_request_duration_seconds_count{{{labels}}} {series["count"]}')
+
+        lines.append('# HELP http_request_sql_statements_total Comandos SQL executados por endpoint e status')
+        lines.append('# TYPE http_request_sql_statements_total counter')
+        for (endpoint, method, status), series in sorted(snapshot.items()):
+            labels = f'{worker},endpoint="{_escape(endpoint)}",method="{method}",status="{status}"'
+            lines.append(f'http_request_sql_statements_total{{{labels}}} {series["sql_count"]}')
+
+        lines.append('# HELP http_request_sql_seconds_total Tempo total gasto em SQL por endpoint e status')
+        lines.append('# TYPE http_request_sql_seconds_total counter')
+        for (endpoint, method, status), series in sorted(snapshot.items()):
+            labels = f'{worker},endpoint="{_escape(endpoint)}",method="{method}",status="{status}"'
+            lines.append(f'http_request_sql_seconds_total{{{labels}}} {series["sql_time"]:.6f}')
+
+        return '\n'.join(lines) + '\n'
+
+
+class JobMetrics:
+    """Duração e resultado das tarefas em segundo plano (varreduras, arquivamento...)"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._jobs = {}
+
+    def observe(self, name, duration, ok=True, affected=None):
+        with self._lock:
+            job = self._jobs.setdefault(name, {
+                'runs': 0, 'failures': 0, 'duration_sum': 0.0, 'last_duration': 0.0,
+                'last_run': 0.0, 'affected': 0
+            })
+            job['runs'] += 1
+            job['failures'] += 0 if ok else 1
+            job['duration_sum'] += duration
+            job['last_duration'] = duration
+            job['last_run'] = time.time()
+            job['affected'] += affected or 0
+
+    def render(self):
+        with self._lock:
+            snapshot = {name: dict(job) for name, job in self._jobs.items()}
+        if not snapshot:
+            return ''
+        worker = _worker_label()
+
+        metrics = [
+            ('job_runs_total', 'counter', 'Execuções da tarefa', 'runs', '{}'),
+            ('job_failures_total', 'counter', 'Execuções com erro', 'failures', '{}'),
+            ('job_duration_seconds_sum', 'counter', 'Tempo total de execução', 'duration_sum', '{:.6f}'),
+            ('job_last_duration_seconds', 'gauge', 'Duração da última execução', 'last_duration', '{:.6f}'),
+            ('job_last_run_timestamp_seconds', 'gauge', 'Horário da última execução', 'last_run', '{:.0f}'),
+            ('job_affected_rows_total', 'counter', 'Linhas afetadas pela tarefa', 'affected', '{}'),
+        ]
+        lines = []
+        for metric, kind, help_text, field, fmt in metrics:
+            lines.append(f'# HELP {metric} {help_text}')
+            lines.append(f'# TYPE {metric} {kind}')
+            for name, job in sorted(snapshot.items()):
+                lines.append(f'{metric}{{{worker},job="{_escape(name)}"}} {fmt.format(job[field])}')
+        return '\n'.join(lines) + '\n'
+
+
+class CacheMetrics:
+    """Acertos, faltas, descartes e invalidações dos caches em memória (por processo)"""
+
+    EVENTS = ('hits', 'misses', 'evictions', 'invalidations')
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._caches = {}
+
+    def observe(self, name, event, count=1):
+        with self._lock:
+            cache = self._caches.setdefault(name, dict.fromkeys(self.EVENTS, 0))
+            cache[event] += count
+
+    def snapshot(self):
+        with self._lock:
+            return {name: dict(cache) for name, cache in self._caches.items()}
+
+    def render(self):
+        snapshot = self.snapshot()
+        if not snapshot:
+            return ''
+        worker = _worker_label()
+
+        lines = []
+        for event in self.EVENTS:
+            lines.append(f'# HELP cache_{event}_total Eventos "{event}" do cache')
+            lines.append(f'# TYPE cache_{event}_total counter')
+            for name, cache in sorted(snapshot.items()):
+                lines.append(f'cache_{event}_total{{{worker},cache="{_escape(name)}"}} {cache[event]}')
+        lines.append('# HELP cache_hit_ratio Fração das leituras atendidas pelo cache')
+        lines.append('# TYPE cache_hit_ratio gauge')
+        for name, cache in sorted(snapshot.items()):
+            lookups = cache['hits'] + cache['misses']
+            ratio = cache['hits'] / lookups if lookups else 0.0
+            lines.append(f'cache_hit_ratio{{{worker},cache="{_escape(name)}"}} {ratio:.4f}')
+        return '\n'.join(lines) + '\n'
+
+
+request_metrics = RequestMetrics()
+job_metrics = JobMetrics()
+cache_metrics = CacheMetrics()
+
+
+def _worker_label():
+    # Lido a cada render: o pid muda depois do fork do mestre (preload_app)
+    return f'worker="{os.getpid()}"'
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+@event.listens_for(Engine, 'before_cursor_execute')
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('query_start_time', []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, 'after_cursor_execute')
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    starts = conn.info.get('query_start_time')
+    if not starts:
+        return
+    elapsed = time.perf_counter() - starts.pop()
+
+    if not has_request_context():
+        return
+    stats = g.get('sql_stats')
+    if stats is None:
+        return
+
+    stats['count'] += 1
+    stats['time'] += elapsed
+    entry = stats['statements'].get(statement)
+    if entry is None:
+        stats['statements'][statement] = [1, elapsed]
+    else:
+        entry[0] += 1
+        entry[1] += elapsed
+
+
+def _start_request():
+    g.request_start_time = time.perf_counter()
+    g.sql_stats = {'count': 0, 'time': 0.0, 'statements': {}}
+
+
+def _finish_request(response):
+    start = g.get('request_start_time')
+    if start is None:
+        return response
+
+    duration = time.perf_counter() - start
+    stats = g.pop('sql_stats', None) or {'count': 0, 'time': 0.0, 'statements': {}}
+    endpoint = request.endpoint or 'none'
+
+    request_metrics.observe(endpoint, request.method, response.status_code, duration, stats['count'], stats['time'])
+
+    threshold = current_app.config.get('METRICS_SLOW_REQUEST_MS', DEFAULT_SLOW_REQUEST_MS) / 1000.0
+    if duration >= threshold:
+        _log_slow_request(endpoint, response.status_code, duration, stats)
+
+    return response
+
+
+def _log_slow_request(endpoint, status, duration, stats):
+    """Registra requisições lentas com os comandos SQL mais caros"""
+    top = sorted(stats['statements'].items(), key=lambda item: item[1][1], reverse=True)[:SLOW_REQUEST_TOP_STATEMENTS]
+    details = '\n'.join(
+        f'  {total * 1000:.1f}ms x{count}: {" ".join(statement.split())[:300]}'
+        for statement, (count, total) in top
+    )
+    logger.warning(
+        'Requisição lenta %s %s (%s) %.1fms, %d comandos SQL em %.1fms\n%s',
+        request.method, request.path, endpoint, duration * 1000,
+        stats['count'], stats['time'] * 1000, details
+    )
+
+
+@metrics_bp.route('/metrics', methods=['GET'])
+def get_metrics():
+    """Expor métricas no formato do Prometheus"""
+    token = current_app.config.get('METRICS_TOKEN')
+    if token and request.headers.get('Authorization') != f'Bearer {token}':
+        return Response('Acesso negado\n', status=403, mimetype='text/plain')
+
+    return Response(
+        request_metrics.render() + job_metrics.render() + cache_metrics.render(),
+        mimetype='text/plain; version=0.0.4; charset=utf-8'
+    )
+
+
+def init_metrics(app):
+    """Instala os hooks de instrumentação e o endpoint /api/metrics"""
+    app.config.setdefault('METRICS_SLOW_REQUEST_MS', DEFAULT_SLOW_REQUEST_MS)
+    app.config.setdefault('METRICS_TOKEN', None)
+    # Primeiro before_request do app: requisições respondidas por um hook
+    # anterior (limite de login, terreiro inválido) também são medidas
+    app.before_request_funcs.setdefault(None, []).insert(0, _start_request)
+    app.after_request(_finish_request)
+    app.register_blueprint(metrics_bp, url_prefix='/api')
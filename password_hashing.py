@@ -0,0 +1,13 @@
+import bcrypt
+
+# Este módulo roda dentro do pool de processos da importação em massa: só
+# depende do bcrypt e recebe listas de strings, sem sessão nem modelos.
+
+
+def hash_password(password):
+    """Mesmo hash de User.set_password"""
+    return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
+
+
+def hash_many(passwords):
+    return [hash_password(password) for password in passwords]
@@ -0,0 +1,79 @@
+import time
+from datetime import datetime
+
+import click
+from blinker import Namespace
+from sqlalchemy import update
+
+from src.models.user import db, Proof
+from src.services.scheduler import get_scheduler
+
+DEFAULT_SWEEP_INTERVAL = 300
+
+# Sinal disparado com os ids vencidos, para notificações (WhatsApp, e-mail...)
+_signals = Namespace()
+proofs_expired = _signals.signal('proofs-expired')
+
+
+def _overdue_filter(now):
+    # Casa com o índice parcial ix_proofs_pendente_vencimento
+    return (Proof.status == 'pendente', Proof.data_vencimento < now)
+
+
+def expire_proofs(dry_run=False, now=None):
+    """Marca como vencidas, em um único UPDATE, as provas pendentes com prazo expirado
+
+    Retorna os ids afetados. Em ``dry_run`` só consulta quais seriam afetadas.
+    """
+    started = time.perf_counter()
+    now = now or datetime.utcnow()
+
+    if dry_run:
+        ids = [row[0] for row in db.session.query(Proof.id).filter(*_overdue_filter(now)).all()]
+    else:
+        statement = update(Proof).where(*_overdue_filter(now)).values(status='vencida', updated_at=now)
+        dialect = db.session.get_bind().dialect
+        if getattr(dialect, 'update_returning', False):
+            ids = [row[0] for row in db.session.execute(
+                statement.returning(Proof.id), execution_options={'synchronize_session': False}
+            )]
+        else:
+            # Sem RETURNING: trava as linhas na mesma transação e atualiza por id
+            ids = [row[0] for row in db.session.query(Proof.id).filter(*_overdue_filter(now)).with_for_update().all()]
+            if ids:
+                db.session.execute(
+                    update(Proof).where(Proof.id.in_(ids)).values(status='vencida', updated_at=now),
+                    execution_options={'synchronize_session': False}
+                )
+        db.session.commit()
+
+    return {
+        'ids': ids,
+        'count': len(ids),
+        'dry_run': dry_run,
+        'duration_ms': round((time.perf_counter() - started) * 1000, 2)
+    }
+
+
+def _sweep_job(app):
+    result = expire_proofs()
+    if result['ids']:
+        app.logger.info('%d provas marcadas como vencidas em %.1fms', result['count'], result['duration_ms'])
+        proofs_expired.send(app, ids=result['ids'])
+    return result
+
+
+def init_proof_sweeper(app):
+    """Registra a varredura periódica de provas vencidas e o comando CLI"""
+    app.config.setdefault('PROOF_SWEEP_INTERVAL', DEFAULT_SWEEP_INTERVAL)
+    get_scheduler(app).add_job('expire_proofs', _sweep_job, app.config['PROOF_SWEEP_INTERVAL'])
+
+    @app.cli.command('expire-proofs')
+    @click.option('--dry-run', is_flag=True, help='Apenas listar as provas que venceriam')
+    def expire_proofs_command(dry_run):
+        """Marcar provas pendentes vencidas"""
+        result = expire_proofs(dry_run=dry_run)
+        if not dry_run and result['ids']:
+            proofs_expired.send(app, ids=result['ids'])
+        acao = 'venceriam' if dry_run else 'vencidas'
+        click.echo(f"{result['count']} provas {acao} em {result['duration_ms']}ms: {result['ids']}")
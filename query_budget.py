@@ -0,0 +1,199 @@
+import re
+import threading
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from functools import wraps
+
+from flask.testing import FlaskClient
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+try:
+    import pytest
+except ImportError:  # pytest só é necessário ao rodar os testes
+    pytest = None
+
+# Orçamento padrão de comandos SQL por rota (regra de URL -> máximo)
+ENDPOINT_BUDGETS = {
+    '/api/health': 0,
+    '/api/auth/me': 1,
+    '/api/giras/': 2,
+    '/api/giras/<int:gira_id>': 2,
+    '/api/giras/my-attendance': 2,
+    '/api/forum/topics': 2,
+}
+
+_POSTCOMPILE_RE = re.compile(r'__\[POSTCOMPILE_\w+\]')
+_STRING_LITERAL_RE = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_RE = re.compile(r'\b\d+(?:\.\d+)?\b')
+_PLACEHOLDER_RE = re.compile(r'%\(\w+\)s|%s|:\w+|\?')
+_PLACEHOLDER_LIST_RE = re.compile(r'\(\s*\?(?:\s*,\s*\?)*\s*\)')
+_WHITESPACE_RE = re.compile(r'\s+')
+
+
+def normalize_sql(statement):
+    """Normaliza um comando SQL para agrupar variações do mesmo padrão"""
+    sql = _POSTCOMPILE_RE.sub('?', statement)
+    sql = _STRING_LITERAL_RE.sub('?', sql)
+    sql = _NUMBER_RE.sub('?', sql)
+    sql = _PLACEHOLDER_RE.sub('?', sql)
+    sql = _PLACEHOLDER_LIST_RE.sub('(?)', sql)
+    return _WHITESPACE_RE.sub(' ', sql).strip()
+
+
+class QueryCounter:
+    """Context manager que captura os comandos SQL executados no bloco"""
+
+    def __init__(self):
+        self.statements = []
+        self._thread_id = None
+
+    def _record(self, conn, cursor, statement, parameters, context, executemany):
+        if threading.get_ident() == self._thread_id:
+            self.statements.append(statement)
+
+    def __enter__(self):
+        self._thread_id = threading.get_ident()
+        event.listen(Engine, 'after_cursor_execute', self._record)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        event.remove(Engine, 'after_cursor_execute', self._record)
+        return False
+
+    @property
+    def count(self):
+        return len(self.statements)
+
+    def grouped(self):
+        """Agrupa os comandos capturados pelo SQL normalizado"""
+        groups = OrderedDict()
+        for statement in self.statements:
+            key = normalize_sql(statement)
+            groups[key] = groups.get(key, 0) + 1
+        return groups
+
+
+class QueryBudgetExceeded(AssertionError):
+    """Erro lançado quando uma rota executa mais SQL que o orçamento"""
+
+    def __init__(self, method, path, rule, budget, counter):
+        self.rule = rule
+        self.budget = budget
+        self.count = counter.count
+        lines = [
+            f'{method} {path} ({rule}) executou {counter.count} comandos SQL; orçamento: {budget}'
+        ]
+        for sql, times in sorted(counter.grouped().items(), key=lambda item: item[1], reverse=True):
+            lines.append(f'  {times}x {sql}')
+        super().__init__('\n'.join(lines))
+
+
+class QueryBudgetClient(FlaskClient):
+    """Test client que confere o orçamento de SQL de cada requisição"""
+
+    def __init__(self, *args, budgets=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.budgets = dict(ENDPOINT_BUDGETS)
+        if budgets:
+            self.budgets.update(budgets)
+        self.history = []
+
+    def _resolve_rule(self, path, method):
+        adapter = self.application.url_map.bind('localhost')
+        try:
+            rule, _args = adapter.match(path.split('?', 1)[0], method=method, return_rule=True)
+        except Exception:
+            return None
+        return rule
+
+    def open(self, *args, **kwargs):
+        with QueryCounter() as counter:
+            response = super().open(*args, **kwargs)
+
+        request = response.request
+        rule = self._resolve_rule(request.path, request.method)
+        rule_key = rule.rule if rule is not None else None
+        self.history.append((request.method, request.path, rule_key, counter))
+
+        budget = None
+        if rule is not None:
+            budget = self.budgets.get(rule.rule, self.budgets.get(rule.endpoint))
+        if budget is not None and counter.count > budget:
+            raise QueryBudgetExceeded(request.method, request.path, rule_key, budget, counter)
+
+        return response
+
+
+def query_budget(rule_or_budgets, max_queries=None):
+    """Decorator que declara orçamentos de SQL para um teste
+
+    Uso: ``@query_budget('/api/giras/<int:gira_id>', 2)`` ou
+    ``@query_budget({'gira.get_giras': 2, '/api/auth/me': 1})``.
+    """
+    if isinstance(rule_or_budgets, dict):
+        declared = dict(rule_or_budgets)
+    else:
+        declared = {rule_or_budgets: max_queries}
+
+    def decorator(func):
+        merged = dict(getattr(func, '_query_budgets', {}))
+        merged.update(declared)
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            return func(*args, **kwargs)
+
+        wrapper._query_budgets = merged
+        return wrapper
+
+    return decorator
+
+
+def seed_multi_row(db, members=5, giras=4):
+    """Popula várias linhas relacionadas para que consultas N+1 apareçam"""
+    from src.models.user import User, Entity, Gira, Attendance, WorkScale
+
+    entity = Entity(nome='Exu Teste', tipo='Exu', linha='Encruzilhada')
+    db.session.add(entity)
+    db.session.flush()
+
+    users = []
+    for i in range(members):
+        user = User(
+            nome_civil=f'Membro {i}',
+            nome_ritual=f'Ritual {i}',
+            email=f'membro{i}@example.com',
+            grau=(i % 7) + 1,
+            entidade_cabeca_id=entity.id,
+            role='pai_mae_trono' if i == 0 else 'filho',
+            password_hash='x'
+        )
+        users.append(user)
+    db.session.add_all(users)
+    db.session.flush()
+
+    base = datetime(2024, 1, 1, 20, 0)
+    gira_rows = [
+        Gira(titulo=f'Gira {i}', data_hora=base + timedelta(days=7 * i), tipo='desenvolvimento')
+        for i in range(giras)
+    ]
+    db.session.add_all(gira_rows)
+    db.session.flush()
+
+    for gira in gira_rows:
+        for user in users:
+            db.session.add(Attendance(user_id=user.id, gira_id=gira.id, presente=True))
+            db.session.add(WorkScale(user_id=user.id, gira_id=gira.id, funcao='Auxiliar'))
+
+    db.session.commit()
+    return users, gira_rows
+
+
+if pytest is not None:
+
+    @pytest.fixture
+    def query_budget_client(app, request):
+        """Test client com orçamento de SQL por rota (requer a fixture ``app``)"""
+        budgets = getattr(request.function, '_query_budgets', None)
+        return QueryBudgetClient(app, app.response_class, use_cookies=True, budgets=budgets)
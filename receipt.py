@@ -0,0 +1,127 @@
+from flask import Blueprint, current_app, request, jsonify, send_file
+from flask_jwt_extended import jwt_required, get_jwt_identity
+from sqlalchemy.exc import IntegrityError
+from src.models.user import db, User
+from src.models.finance import FinancialTransaction, Receipt
+from src.services.receipt_service import (
+    create_receipt, create_month_receipts, get_renderer, receipt_payload
+)
+
+receipt_bp = Blueprint('receipt', __name__)
+
+@receipt_bp.route('/', methods=['POST'])
+@jwt_required()
+def create_transaction_receipt():
+    """Emitir recibo para uma transação (apenas Tesoureiro ou Pai/Mãe de Trono)"""
+    try:
+        current_user_id = get_jwt_identity()
+        user = User.query.get(current_user_id)
+
+        if not user or not user.is_tesoureiro():
+            return jsonify({'error': 'Acesso negado. Apenas tesoureiros podem emitir recibos'}), 403
+
+        data = request.get_json()
+
+        if not data or not data.get('transaction_id'):
+            return jsonify({'error': 'ID da transação é obrigatório'}), 400
+
+        transaction = FinancialTransaction.query.get(data['transaction_id'])
+        if not transaction:
+            return jsonify({'error': 'Transação não encontrada'}), 404
+
+        if Receipt.query.filter_by(transaction_id=transaction.id).first():
+            return jsonify({'error': 'Transação já possui recibo'}), 400
+
+        try:
+            receipt = create_receipt(
+                transaction,
+                cliente_nome=data.get('cliente_nome'),
+                cliente_documento=data.get('cliente_documento'),
+                descricao_servico=data.get('descricao_servico')
+            )
+            db.session.commit()
+        except IntegrityError:
+            # Outra requisição emitiu o recibo entre a verificação e o commit
+            db.session.rollback()
+            if Receipt.query.filter_by(transaction_id=transaction.id).first():
+                return jsonify({'error': 'Transação já possui recibo'}), 400
+            raise
+
+        # Renderização em segundo plano; o documento fica em cache por id
+        get_renderer(current_app).submit(receipt_payload(receipt, transaction))
+
+        return jsonify({
+            'message': 'Recibo emitido com sucesso',
+            'receipt': receipt.to_dict()
+        }), 201
+
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 500
+
+@receipt_bp.route('/batch', methods=['POST'])
+@jwt_required()
+def create_batch_receipts():
+    """Emitir os recibos de todas as entradas confirmadas de um mês"""
+    try:
+        current_user_id = get_jwt_identity()
+        user = User.query.get(current_user_id)
+
+        if not user or not user.is_tesoureiro():
+            return jsonify({'error': 'Acesso negado. Apenas tesoureiros podem emitir recibos'}), 403
+
+        data = request.get_json()
+
+        if not data or not data.get('mes') or not data.get('ano'):
+            return jsonify({'error': 'Mês e ano são obrigatórios'}), 400
+
+        mes = int(data['mes'])
+        ano = int(data['ano'])
+        if mes < 1 or mes > 12:
+            return jsonify({'error': 'Mês deve ser entre 1 e 12'}), 400
+
+        try:
+            created = create_month_receipts(mes, ano)
+            db.session.commit()
+        except IntegrityError:
+            # Emissão concorrente para as mesmas transações (recibo único por transação)
+            db.session.rollback()
+            return jsonify({'error': 'Recibos do mês já estão sendo emitidos; tente novamente'}), 409
+
+        payloads = [receipt_payload(receipt, transaction) for receipt, transaction in created]
+        get_renderer(current_app).submit_many(payloads)
+
+        return jsonify({
+            'message': f'{len(created)} recibos emitidos',
+            'total': len(created),
+            'numeros': [receipt.numero for receipt, _transaction in created]
+        }), 201
+
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 500
+
+@receipt_bp.route('/<int:receipt_id>/document', methods=['GET'])
+@jwt_required()
+def get_receipt_document(receipt_id):
+    """Baixar o documento do recibo (renderizado sob demanda se necessário)"""
+    try:
+        current_user_id = get_jwt_identity()
+        user = User.query.get(current_user_id)
+
+        if not user or not user.is_tesoureiro():
+            return jsonify({'error': 'Acesso negado'}), 403
+
+        renderer = get_renderer(current_app)
+        path = renderer.cached_path(receipt_id)
+
+        if not path:
+            receipt = Receipt.query.get(receipt_id)
+            if not receipt:
+                return jsonify({'error': 'Recibo não encontrado'}), 404
+            path = renderer.get_document(receipt_payload(receipt))
+
+        return send_file(path, mimetype='text/html', max_age=3600)
+
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
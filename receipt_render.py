@@ -0,0 +1,69 @@
+import os
+from html import escape
+
+# Este módulo roda dentro do pool de processos: só usa a biblioteca padrão
+# e recebe dicionários simples, sem sessão nem modelos do SQLAlchemy.
+
+RECEIPT_TEMPLATE = """<!DOCTYPE html>
+<html lang="pt-BR">
+<head>
+<meta charset="utf-8">
+<title>Recibo {numero}</title>
+<style>
+body {{ font-family: Georgia, serif; max-width: 720px; margin: 40px auto; color: #111; }}
+h1 {{ font-size: 22px; border-bottom: 2px solid #7f1d1d; padding-bottom: 8px; }}
+.valor {{ font-size: 20px; font-weight: bold; }}
+table {{ width: 100%; border-collapse: collapse; margin: 24px 0; }}
+td {{ padding: 6px 0; vertical-align: top; }}
+td.label {{ width: 180px; color: #555; }}
+.assinatura {{ margin-top: 64px; border-top: 1px solid #111; width: 320px; text-align: center; padding-top: 4px; }}
+</style>
+</head>
+<body>
+<h1>{emissor} &mdash; Recibo n&ordm; {numero}</h1>
+<p>Recebemos de <strong>{cliente_nome}</strong>{documento} a importância de
+<span class="valor">R$ {valor}</span> referente a {descricao_servico}.</p>
+<table>
+<tr><td class="label">Número</td><td>{numero}</td></tr>
+<tr><td class="label">Data</td><td>{data}</td></tr>
+<tr><td class="label">Forma de pagamento</td><td>{metodo_pagamento}</td></tr>
+<tr><td class="label">Transação</td><td>#{transaction_id}</td></tr>
+</table>
+<div class="assinatura">{emissor}</div>
+</body>
+</html>
+"""
+
+
+def format_brl(valor):
+    """Formata um valor no padrão brasileiro (1.234,56)"""
+    texto = f'{float(valor):,.2f}'
+    return texto.replace(',', 'X').replace('.', ',').replace('X', '.')
+
+
+def render_receipt(receipt, output_dir, emissor='Templo Dragão Negro'):
+    """Renderiza o recibo em HTML e grava em ``output_dir``; retorna o caminho"""
+    documento = receipt.get('cliente_documento')
+    html = RECEIPT_TEMPLATE.format(
+        emissor=escape(emissor),
+        numero=escape(receipt['numero']),
+        cliente_nome=escape(receipt['cliente_nome']),
+        documento=f', documento {escape(documento)},' if documento else '',
+        valor=format_brl(receipt['valor']),
+        descricao_servico=escape(receipt['descricao_servico']),
+        data=escape(receipt.get('data') or ''),
+        metodo_pagamento=escape(receipt.get('metodo_pagamento') or '-'),
+        transaction_id=receipt['transaction_id']
+    )
+
+    path = os.path.join(output_dir, f"{receipt['id']}.html")
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        f.write(html)
+    os.replace(tmp_path, path)
+    return path
+
+
+def render_many(receipts, output_dir, emissor='Templo Dragão Negro'):
+    """Renderiza um lote de recibos no mesmo processo (menos overhead de IPC)"""
+    return [render_receipt(receipt, output_dir, emissor) for receipt in receipts]
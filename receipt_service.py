@@ -0,0 +1,253 @@
+import logging
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from multiprocessing import get_context
+
+from sqlalchemy import update
+from sqlalchemy.dialects import postgresql, sqlite
+
+from src.models.user import db, User
+from src.models.finance import FinancialTransaction, Receipt, ReceiptCounter
+from src.models.appointment import Appointment, Client
+from src.services.receipt_render import render_receipt, render_many
+from src.services.tenancy import tenant_dir
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_RENDER_WORKERS = 2
+BATCH_RENDER_CHUNK = 50
+
+
+def _counter_name(ano):
+    return f'receipt-{ano}'
+
+
+def format_numero(ano, sequencial):
+    return f'{ano}-{sequencial:06d}'
+
+
+def allocate_numbers(count=1, ano=None):
+    """Reserva ``count`` números consecutivos de recibo para o ano
+
+    Usa uma linha contadora travada pelo UPDATE até o commit: transações
+    concorrentes esperam em vez de colidir na constraint única, então não há
+    retry, e um rollback devolve os números (sem buracos na numeração).
+    """
+    ano = ano or datetime.utcnow().year
+    nome = _counter_name(ano)
+
+    # Garante a linha do contador sem corrida (INSERT ... ON CONFLICT DO NOTHING)
+    dialect = db.session.get_bind().dialect.name
+    if dialect == 'postgresql':
+        insert = postgresql.insert(ReceiptCounter).on_conflict_do_nothing(index_elements=['nome'])
+    elif dialect == 'sqlite':
+        insert = sqlite.insert(ReceiptCounter).on_conflict_do_nothing(index_elements=['nome'])
+    else:
+        insert = None
+
+    if insert is not None:
+        db.session.execute(insert.values(nome=nome, valor=0))
+    elif not db.session.get(ReceiptCounter, nome):
+        db.session.add(ReceiptCounter(nome=nome, valor=0))
+        db.session.flush()
+
+    db.session.execute(
+        update(ReceiptCounter)
+        .where(ReceiptCounter.nome == nome)
+        .values(valor=ReceiptCounter.valor + count)
+    )
+    last = db.session.query(ReceiptCounter.valor).filter(ReceiptCounter.nome == nome).scalar()
+    return [format_numero(ano, n) for n in range(last - count + 1, last + 1)]
+
+
+def _client_name(transaction, client_nome=None, user_nome=None):
+    return client_nome or user_nome or transaction.descricao
+
+
+def receipt_payload(receipt, transaction=None):
+    """Dados simples (serializáveis) usados pelo processo de renderização"""
+    transaction = transaction or receipt.transaction
+    return {
+        'id': receipt.id,
+        'numero': receipt.numero,
+        'transaction_id': receipt.transaction_id,
+        'cliente_nome': receipt.cliente_nome,
+        'cliente_documento': receipt.cliente_documento,
+        'descricao_servico': receipt.descricao_servico,
+        'valor': str(receipt.valor),
+        'metodo_pagamento': transaction.metodo_pagamento if transaction else None,
+        'data': (receipt.created_at or datetime.utcnow()).strftime('%d/%m/%Y')
+    }
+
+
+def create_receipt(transaction, cliente_nome=None, cliente_documento=None, descricao_servico=None):
+    """Cria o recibo de uma transação (o commit fica com quem chama)"""
+    numero = allocate_numbers(1)[0]
+    receipt = Receipt(
+        numero=numero,
+        transaction_id=transaction.id,
+        cliente_nome=cliente_nome or _client_name(
+            transaction,
+            transaction.appointment.client.nome if transaction.appointment else None,
+            transaction.user.nome_civil if transaction.user else None
+        ),
+        cliente_documento=cliente_documento,
+        descricao_servico=descricao_servico or transaction.descricao,
+        valor=transaction.valor
+    )
+    db.session.add(receipt)
+    db.session.flush()
+    return receipt
+
+
+def create_month_receipts(mes, ano):
+    """Cria, em uma transação, os recibos das entradas confirmadas do mês sem recibo"""
+    inicio = datetime(ano, mes, 1)
+    fim = datetime(ano + 1, 1, 1) if mes == 12 else datetime(ano, mes + 1, 1)
+
+    rows = db.session.query(FinancialTransaction, Client.nome, User.nome_civil).outerjoin(
+        Appointment, FinancialTransaction.appointment_id == Appointment.id
+    ).outerjoin(
+        Client, Appointment.client_id == Client.id
+    ).outerjoin(
+        User, FinancialTransaction.user_id == User.id
+    ).outerjoin(
+        Receipt, Receipt.transaction_id == FinancialTransaction.id
+    ).filter(
+        FinancialTransaction.tipo == 'entrada',
+        FinancialTransaction.status == 'confirmado',
+        FinancialTransaction.data_transacao >= inicio,
+        FinancialTransaction.data_transacao < fim,
+        Receipt.id.is_(None)
+    ).order_by(FinancialTransaction.data_transacao, FinancialTransaction.id).all()
+
+    if not rows:
+        return []
+
+    numeros = allocate_numbers(len(rows), ano)
+    now = datetime.utcnow()
+    receipts = [
+        Receipt(
+            numero=numero,
+            transaction_id=transaction.id,
+            cliente_nome=_client_name(transaction, client_nome, user_nome),
+            descricao_servico=transaction.descricao,
+            valor=transaction.valor,
+            created_at=now
+        )
+        for numero, (transaction, client_nome, user_nome) in zip(numeros, rows)
+    ]
+    db.session.add_all(receipts)
+    db.session.flush()
+
+    transactions = {transaction.id: transaction for transaction, _c, _u in rows}
+    return [(receipt, transactions[receipt.transaction_id]) for receipt in receipts]
+
+
+def _log_render_failure(future, numeros):
+    # Ninguém espera pelas renderizações em segundo plano: a falha só aparece no log
+    if future.cancelled():
+        return
+    error = future.exception()
+    if error is not None:
+        logger.error('Falha ao renderizar os recibos %s: %r', ', '.join(numeros), error)
+
+
+class ReceiptRenderer:
+    """Renderiza recibos em um pool de processos e guarda o arquivo por id
+
+    Os arquivos ficam em ``output_dir/<terreiro>`` quando há vários terreiros,
+    já que os ids de recibo se repetem entre os bancos.
+    """
+
+    def __init__(self, output_dir, max_workers=DEFAULT_RENDER_WORKERS, emissor='Templo Dragão Negro'):
+        self.output_dir = output_dir
+        self.max_workers = max_workers
+        self.emissor = emissor
+        self._pool = None
+        self._pool_pid = None
+        self._lock = threading.Lock()
+        self._pending = {}
+
+    @property
+    def pool(self):
+        # O pool é criado no próprio worker (depois do fork do gunicorn), com spawn
+        with self._lock:
+            if self._pool is None or self._pool_pid != os.getpid():
+                os.makedirs(self.output_dir, exist_ok=True)
+                self._pool = ProcessPoolExecutor(max_workers=self.max_workers, mp_context=get_context('spawn'))
+                self._pool_pid = os.getpid()
+            return self._pool
+
+    def directory(self):
+        directory = tenant_dir(self.output_dir)
+        if directory != self.output_dir:
+            os.makedirs(directory, exist_ok=True)
+        return directory
+
+    def cached_path(self, receipt_id):
+        path = os.path.join(tenant_dir(self.output_dir), f'{receipt_id}.html')
+        return path if os.path.exists(path) else None
+
+    def submit(self, payload):
+        """Agenda a renderização sem bloquear a requisição"""
+        directory = self.directory()
+        key = (directory, payload['id'])
+        with self._lock:
+            future = self._pending.get(key)
+            if future is not None:
+                return future
+        future = self.pool.submit(render_receipt, payload, directory, self.emissor)
+        with self._lock:
+            self._pending[key] = future
+        future.add_done_callback(lambda _f, key=key: self._forget(key))
+        future.add_done_callback(lambda f, numero=payload['numero']: _log_render_failure(f, [numero]))
+        return future
+
+    def submit_many(self, payloads):
+        """Divide um lote grande em pedaços para reduzir o overhead entre processos"""
+        futures = []
+        for start in range(0, len(payloads), BATCH_RENDER_CHUNK):
+            chunk = payloads[start:start + BATCH_RENDER_CHUNK]
+            future = self.pool.submit(render_many, chunk, self.directory(), self.emissor)
+            numeros = [payload['numero'] for payload in chunk]
+            future.add_done_callback(lambda f, numeros=numeros: _log_render_failure(f, numeros))
+            futures.append(future)
+        return futures
+
+    def _forget(self, key):
+        with self._lock:
+            self._pending.pop(key, None)
+
+    def get_document(self, payload, timeout=30):
+        """Retorna o caminho do arquivo, renderizando se ainda não existir"""
+        path = self.cached_path(payload['id'])
+        if path:
+            return path
+        return self.submit(payload).result(timeout=timeout)
+
+    def shutdown(self):
+        with self._lock:
+            if self._pool is not None and self._pool_pid == os.getpid():
+                self._pool.shutdown(wait=False)
+            self._pool = None
+
+
+def get_renderer(app):
+    return app.extensions['receipt_renderer']
+
+
+def init_receipts(app):
+    """Configura o renderizador de recibos da aplicação"""
+    app.config.setdefault('RECEIPTS_DIR', os.path.join(app.instance_path, 'receipts'))
+    app.config.setdefault('RECEIPT_RENDER_WORKERS', DEFAULT_RENDER_WORKERS)
+    app.config.setdefault('RECEIPT_ISSUER', 'Templo Dragão Negro')
+    renderer = ReceiptRenderer(
+        app.config['RECEIPTS_DIR'],
+        max_workers=app.config['RECEIPT_RENDER_WORKERS'],
+        emissor=app.config['RECEIPT_ISSUER']
+    )
+    app.extensions['receipt_renderer'] = renderer
+    return renderer
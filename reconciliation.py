@@ -0,0 +1,41 @@
+from flask import Blueprint, request, jsonify
+from flask_jwt_extended import jwt_required, get_jwt_identity
+from src.models.user import User
+from src.services.reconciliation_service import reconcile_appointments
+
+reconciliation_bp = Blueprint('reconciliation', __name__)
+
+@reconciliation_bp.route('', methods=['GET', 'POST'])
+@jwt_required()
+def reconcile():
+    """Conferir consultas x transações (GET relata; POST com create_missing cria as faltantes)"""
+    try:
+        current_user_id = get_jwt_identity()
+        user = User.query.get(current_user_id)
+
+        if not user or not user.is_tesoureiro():
+            return jsonify({'error': 'Acesso negado. Apenas tesoureiros podem reconciliar'}), 403
+
+        if request.method == 'POST':
+            data = request.get_json(silent=True) or {}
+        else:
+            data = request.args
+        try:
+            mes = int(data['mes']) if data.get('mes') else None
+            ano = int(data['ano']) if data.get('ano') else None
+        except (TypeError, ValueError):
+            return jsonify({'error': 'Mês e ano devem ser números'}), 400
+
+        if mes and not ano:
+            return jsonify({'error': 'Informe o ano junto com o mês'}), 400
+        if mes and not 1 <= mes <= 12:
+            return jsonify({'error': 'Mês inválido'}), 400
+
+        create_missing = request.method == 'POST' and bool(data.get('create_missing'))
+
+        report = reconcile_appointments(mes=mes, ano=ano, create_missing=create_missing, user_id=user.id)
+
+        return jsonify(report), 200
+
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
@@ -0,0 +1,221 @@
+import time
+from datetime import datetime
+
+import click
+from sqlalchemy import and_, exists, insert, literal, select
+
+from src.models.user import db
+from src.models.appointment import Appointment
+from src.models.finance import FinancialTransaction
+from src.services.scheduler import get_scheduler
+
+DEFAULT_RECONCILIATION_INTERVAL = 24 * 3600
+REPORT_ROW_LIMIT = 500
+
+
+def _period_filter(column, mes, ano):
+    """Intervalo [início, fim) do mês, usável pelos índices de data"""
+    if not ano:
+        return None
+    if mes:
+        start = datetime(ano, mes, 1)
+        end = datetime(ano + 1, 1, 1) if mes == 12 else datetime(ano, mes + 1, 1)
+    else:
+        start, end = datetime(ano, 1, 1), datetime(ano + 1, 1, 1)
+    return and_(column >= start, column < end)
+
+
+def _valid_transaction():
+    # Cancelamentos e saídas não contam como pagamento da consulta
+    return and_(FinancialTransaction.tipo == 'entrada', FinancialTransaction.status != 'cancelado')
+
+
+def _has_transaction():
+    return exists().where(and_(
+        FinancialTransaction.appointment_id == Appointment.id,
+        _valid_transaction()
+    ))
+
+
+def _paid_without_transaction(period):
+    """Consultas pagas sem nenhuma transação válida (anti-join)"""
+    query = select(Appointment.id, Appointment.valor, Appointment.metodo_pagamento, Appointment.data_hora).where(
+        Appointment.status_pagamento == 'pago',
+        ~_has_transaction()
+    )
+    if period is not None:
+        query = query.where(period)
+    return query
+
+
+def _amount_mismatches(period):
+    """Consultas cuja soma das transações válidas difere do valor (ou com mais de uma transação)"""
+    total = db.func.sum(FinancialTransaction.valor)
+    count = db.func.count(FinancialTransaction.id)
+    query = select(
+        Appointment.id, Appointment.valor, Appointment.status_pagamento,
+        total.label('valor_transacoes'), count.label('transacoes')
+    ).join(
+        FinancialTransaction, FinancialTransaction.appointment_id == Appointment.id
+    ).where(
+        _valid_transaction()
+    ).group_by(
+        Appointment.id, Appointment.valor, Appointment.status_pagamento
+    ).having(
+        db.or_(total != db.func.coalesce(Appointment.valor, 0), count > 1)
+    )
+    if period is not None:
+        query = query.where(period)
+    return query
+
+
+def _transactions_without_payment(period):
+    """Transações confirmadas de consultas que não estão marcadas como pagas"""
+    query = select(
+        FinancialTransaction.id, FinancialTransaction.appointment_id,
+        FinancialTransaction.valor, Appointment.status_pagamento
+    ).join(
+        Appointment, Appointment.id == FinancialTransaction.appointment_id
+    ).where(
+        _valid_transaction(),
+        FinancialTransaction.status == 'confirmado',
+        Appointment.status_pagamento != 'pago'
+    )
+    if period is not None:
+        query = query.where(period)
+    return query
+
+
+def _orphan_transactions(mes, ano):
+    """Transações que apontam para consultas inexistentes (o SQLite não força a FK)"""
+    query = select(FinancialTransaction.id, FinancialTransaction.appointment_id, FinancialTransaction.valor).where(
+        FinancialTransaction.appointment_id.isnot(None),
+        ~exists().where(Appointment.id == FinancialTransaction.appointment_id)
+    )
+    period = _period_filter(FinancialTransaction.data_transacao, mes, ano)
+    if period is not None:
+        query = query.where(period)
+    return query
+
+
+def _money(value):
+    return float(value) if value is not None else None
+
+
+def _create_missing_transactions(period, user_id, now):
+    """Cria, num único INSERT ... SELECT, as transações das consultas pagas sem transação"""
+    source = select(
+        literal('entrada'),
+        literal('consulta'),
+        literal('Consulta #', db.String) + db.cast(Appointment.id, db.String) + literal(' (reconciliação)', db.String),
+        Appointment.valor,
+        Appointment.metodo_pagamento,
+        literal('confirmado'),
+        literal(user_id, db.Integer),
+        Appointment.id,
+        Appointment.data_hora,
+        literal(now, db.DateTime),
+        literal(now, db.DateTime)
+    ).where(
+        Appointment.status_pagamento == 'pago',
+        Appointment.valor.isnot(None),
+        ~_has_transaction()
+    )
+    if period is not None:
+        source = source.where(period)
+
+    statement = insert(FinancialTransaction).from_select([
+        'tipo', 'categoria', 'descricao', 'valor', 'metodo_pagamento', 'status',
+        'user_id', 'appointment_id', 'data_transacao', 'created_at', 'updated_at'
+    ], source)
+    return db.session.execute(statement).rowcount
+
+
+def reconcile_appointments(mes=None, ano=None, create_missing=False, user_id=None):
+    """Confere consultas x transações financeiras com poucas consultas agregadas
+
+    Com ``create_missing`` cria as transações faltantes (consultas pagas com
+    valor e sem transação) e grava tudo numa única transação do banco.
+    """
+    started = time.perf_counter()
+    period = _period_filter(Appointment.data_hora, mes, ano)
+
+    missing = db.session.execute(_paid_without_transaction(period).limit(REPORT_ROW_LIMIT + 1)).all()
+    mismatched = db.session.execute(_amount_mismatches(period).limit(REPORT_ROW_LIMIT + 1)).all()
+    unpaid = db.session.execute(_transactions_without_payment(period).limit(REPORT_ROW_LIMIT + 1)).all()
+    orphans = db.session.execute(_orphan_transactions(mes, ano).limit(REPORT_ROW_LIMIT + 1)).all()
+
+    report = {
+        'periodo': {'mes': mes, 'ano': ano},
+        'pagas_sem_transacao': [
+            {'appointment_id': row.id, 'valor': _money(row.valor), 'metodo_pagamento': row.metodo_pagamento,
+             'data_hora': row.data_hora.isoformat() if row.data_hora else None}
+            for row in missing[:REPORT_ROW_LIMIT]
+        ],
+        'valores_divergentes': [
+            {'appointment_id': row.id, 'valor': _money(row.valor), 'valor_transacoes': _money(row.valor_transacoes),
+             'transacoes': row.transacoes, 'status_pagamento': row.status_pagamento}
+            for row in mismatched[:REPORT_ROW_LIMIT]
+        ],
+        'transacoes_sem_pagamento': [
+            {'transaction_id': row.id, 'appointment_id': row.appointment_id, 'valor': _money(row.valor),
+             'status_pagamento': row.status_pagamento}
+            for row in unpaid[:REPORT_ROW_LIMIT]
+        ],
+        'transacoes_orfas': [
+            {'transaction_id': row.id, 'appointment_id': row.appointment_id, 'valor': _money(row.valor)}
+            for row in orphans[:REPORT_ROW_LIMIT]
+        ],
+        'truncado': any(len(rows) > REPORT_ROW_LIMIT for rows in (missing, mismatched, unpaid, orphans)),
+        'criadas': 0
+    }
+
+    if create_missing:
+        try:
+            report['criadas'] = _create_missing_transactions(period, user_id, datetime.utcnow())
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+
+    report['count'] = sum(
+        len(report[key]) for key in
+        ('pagas_sem_transacao', 'valores_divergentes', 'transacoes_sem_pagamento', 'transacoes_orfas')
+    )
+    report['duration_ms'] = round((time.perf_counter() - started) * 1000, 2)
+    return report
+
+
+def _reconciliation_job(app):
+    # A tarefa agendada só relata; a criação de transações é decisão do tesoureiro
+    report = reconcile_appointments()
+    if report['count']:
+        app.logger.warning(
+            'Reconciliação: %d pagas sem transação, %d valores divergentes, %d transações sem pagamento, %d órfãs',
+            len(report['pagas_sem_transacao']), len(report['valores_divergentes']),
+            len(report['transacoes_sem_pagamento']), len(report['transacoes_orfas'])
+        )
+    return report
+
+
+def init_reconciliation(app):
+    """Registra a conferência diária de consultas x transações e o comando CLI"""
+    app.config.setdefault('RECONCILIATION_INTERVAL', DEFAULT_RECONCILIATION_INTERVAL)
+    get_scheduler(app).add_job('reconcile_appointments', _reconciliation_job, app.config['RECONCILIATION_INTERVAL'])
+
+    @app.cli.command('reconcile-appointments')
+    @click.option('--mes', type=int, help='Mês (1-12)')
+    @click.option('--ano', type=int, help='Ano')
+    @click.option('--create-missing', is_flag=True, help='Criar as transações faltantes')
+    def reconcile_command(mes, ano, create_missing):
+        """Conferir consultas x transações financeiras"""
+        if mes and not ano:
+            raise click.UsageError('Informe --ano junto com --mes')
+        report = reconcile_appointments(mes=mes, ano=ano, create_missing=create_missing)
+        click.echo(f"Pagas sem transação: {len(report['pagas_sem_transacao'])}")
+        click.echo(f"Valores divergentes: {len(report['valores_divergentes'])}")
+        click.echo(f"Transações sem pagamento: {len(report['transacoes_sem_pagamento'])}")
+        click.echo(f"Transações órfãs: {len(report['transacoes_orfas'])}")
+        if create_missing:
+            click.echo(f"Transações criadas: {report['criadas']}")
+        click.echo(f"Concluído em {report['duration_ms']}ms")
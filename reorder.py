@@ -0,0 +1,31 @@
+from flask import Blueprint, current_app, request, jsonify
+from flask_jwt_extended import jwt_required, get_jwt_identity
+from src.models.user import User
+from src.services.inventory_forecast import forecast_available, get_forecast_cache
+
+reorder_bp = Blueprint('reorder', __name__)
+
+@reorder_bp.route('/reorder-report', methods=['GET'])
+@jwt_required()
+def get_reorder_report():
+    """Relatório de reposição do estoque (pré-calculado; refresh=1 recalcula)"""
+    try:
+        current_user_id = get_jwt_identity()
+        user = User.query.get(current_user_id)
+
+        if not user or not (user.grau >= 6 or user.is_tesoureiro()):
+            return jsonify({'error': 'Acesso negado'}), 403
+
+        if not forecast_available():
+            return jsonify({'error': 'Previsão de estoque indisponível (numpy não instalado)'}), 503
+
+        cache = get_forecast_cache(current_app)
+        if request.args.get('refresh') == '1':
+            report = cache.refresh(current_app)
+        else:
+            report = cache.get(current_app)
+
+        return jsonify(report), 200
+
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
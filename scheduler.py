@@ -0,0 +1,125 @@
+import os
+import threading
+import time
+
+try:
+    import fcntl
+except ImportError:  # Windows: sem trava entre processos
+    fcntl = None
+
+from src.services.metrics import job_metrics
+from src.services.tenancy import tenant_names, use_tenant
+
+DEFAULT_TICK = 5.0
+
+
+class Job:
+    __slots__ = ('name', 'func', 'interval', 'next_run')
+
+    def __init__(self, name, func, interval):
+        self.name = name
+        self.func = func
+        self.interval = interval
+        self.next_run = time.monotonic() + interval
+
+
+class Scheduler:
+    """Executa tarefas periódicas em um thread de fundo
+
+    Com vários workers do gunicorn, só o processo que obtém a trava de
+    arquivo (SCHEDULER_LOCK_FILE) executa as tarefas; os demais ficam em
+    espera e assumem se o dono morrer.
+    """
+
+    def __init__(self, app, lock_file, tick=DEFAULT_TICK):
+        self.app = app
+        self.lock_file = lock_file
+        self.tick = tick
+        self.jobs = {}
+        self._lock_fd = None
+        self._thread = None
+        self._stop = threading.Event()
+
+    def add_job(self, name, func, interval):
+        """Registra ``func(app)`` para rodar a cada ``interval`` segundos"""
+        self.jobs[name] = Job(name, func, interval)
+
+    def run_job(self, name):
+        """Executa uma tarefa agora, registrando duração e resultado
+
+        Com vários terreiros a tarefa roda uma vez por banco; o resultado
+        retornado é o do último e o total afetado é somado.
+        """
+        job = self.jobs[name]
+        started = time.perf_counter()
+        result = None
+        ok = True
+        affected = None
+        for tenant in tenant_names(self.app):
+            try:
+                with self.app.app_context():
+                    use_tenant(self.app, tenant)
+                    result = job.func(self.app)
+            except Exception:
+                ok = False
+                self.app.logger.exception('Falha na tarefa agendada %s (terreiro %s)', name, tenant or 'padrão')
+                continue
+            if isinstance(result, dict) and result.get('count') is not None:
+                affected = (affected or 0) + result['count']
+        job_metrics.observe(name, time.perf_counter() - started, ok, affected)
+        return result
+
+    def _acquire_leadership(self):
+        if self._lock_fd is not None:
+            return True
+        if fcntl is None:
+            return True
+        fd = os.open(self.lock_file, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            os.close(fd)
+            return False
+        self._lock_fd = fd
+        return True
+
+    def _run(self):
+        while not self._stop.wait(self.tick):
+            if not self._acquire_leadership():
+                continue
+            now = time.monotonic()
+            for job in list(self.jobs.values()):
+                if now >= job.next_run:
+                    job.next_run = now + job.interval
+                    self.run_job(job.name)
+
+    def start(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='scheduler', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+
+def get_scheduler(app):
+    return app.extensions['scheduler']
+
+
+def init_scheduler(app):
+    """Cria o agendador; o thread só sobe com SCHEDULER_ENABLED"""
+    app.config.setdefault('SCHEDULER_ENABLED', False)
+    app.config.setdefault('SCHEDULER_LOCK_FILE', os.path.join(app.instance_path, 'scheduler.lock'))
+    scheduler = Scheduler(app, app.config['SCHEDULER_LOCK_FILE'])
+    app.extensions['scheduler'] = scheduler
+    return scheduler
+
+
+def start_scheduler(app):
+    """Inicia o thread do agendador neste processo (chamar após o fork)"""
+    if not app.config.get('SCHEDULER_ENABLED'):
+        return
+    os.makedirs(os.path.dirname(app.config['SCHEDULER_LOCK_FILE']), exist_ok=True)
+    get_scheduler(app).start()
@@ -0,0 +1,95 @@
+"""Colunas e índices novos em bancos já existentes
+
+O ``db.create_all()`` só cria tabelas que faltam: colunas e índices
+acrescentados depois a uma tabela existente (updated_at das presenças e
+escalas, colunas normalizadas dos clientes, rule_id/appointment_id dos
+horários...) nunca chegariam aos bancos antigos, e os preenchimentos de
+``prepare_database()`` falhariam com "no such column".
+"""
+import logging
+
+from sqlalchemy import inspect, text
+from sqlalchemy.schema import AddConstraint, UniqueConstraint
+
+from src.models.user import db
+
+logger = logging.getLogger(__name__)
+
+
+def _column_ddl(column, dialect):
+    """``ADD COLUMN`` aceito pelo SQLite e pelo PostgreSQL: sempre anulável
+
+    NOT NULL sem default falharia numa tabela com linhas; o default do modelo
+    cobre as linhas novas e os preenchimentos cuidam das antigas.
+    """
+    preparer = dialect.identifier_preparer
+    ddl = f'{preparer.format_column(column)} {column.type.compile(dialect=dialect)}'
+    if column.server_default is not None:
+        ddl += f' DEFAULT {column.server_default.arg}'
+    foreign_keys = list(column.foreign_keys)
+    if len(foreign_keys) == 1:
+        target = foreign_keys[0].column
+        ddl += f' REFERENCES {preparer.format_table(target.table)} ({preparer.format_column(target)})'
+    return ddl
+
+
+def _add_unique(connection, constraint):
+    # O SQLite não tem ALTER TABLE ADD CONSTRAINT: um índice único com o mesmo nome garante o mesmo
+    if connection.dialect.name == 'sqlite':
+        preparer = connection.dialect.identifier_preparer
+        columns = ', '.join(preparer.format_column(column) for column in constraint.columns)
+        connection.execute(text(
+            f'CREATE UNIQUE INDEX {preparer.quote(constraint.name)} '
+            f'ON {preparer.format_table(constraint.table)} ({columns})'
+        ))
+    else:
+        connection.execute(AddConstraint(constraint))
+
+
+def upgrade_schema():
+    """Acrescenta às tabelas existentes as colunas, índices e restrições únicas que faltam
+
+    Idempotente: compara o modelo com o banco (``inspect``) e só cria o que
+    não existe. Uma restrição única que os dados atuais violam é registrada
+    no log e fica de fora; o resto segue. Retorna a lista do que foi criado.
+    """
+    connection = db.session.connection()
+    dialect = connection.dialect
+    inspector = inspect(connection)
+    existing_tables = set(inspector.get_table_names())
+    created = []
+
+    for table in db.metadata.sorted_tables:
+        if table.name not in existing_tables:
+            continue
+
+        columns = {column['name'] for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name not in columns:
+                connection.execute(text(
+                    f'ALTER TABLE {dialect.identifier_preparer.format_table(table)} '
+                    f'ADD COLUMN {_column_ddl(column, dialect)}'
+                ))
+                created.append(f'{table.name}.{column.name}')
+
+        names = {index['name'] for index in inspector.get_indexes(table.name)}
+        names.update(unique['name'] for unique in inspector.get_unique_constraints(table.name))
+        for index in table.indexes:
+            if index.name not in names:
+                index.create(bind=connection)
+                created.append(index.name)
+
+        for constraint in table.constraints:
+            if isinstance(constraint, UniqueConstraint) and constraint.name and constraint.name not in names:
+                try:
+                    with connection.begin_nested():
+                        _add_unique(connection, constraint)
+                except Exception as e:
+                    logger.warning('Restrição %s não criada: %s', constraint.name, e)
+                else:
+                    created.append(constraint.name)
+
+    db.session.commit()
+    for name in created:
+        logger.info('Esquema atualizado: %s', name)
+    return created
@@ -0,0 +1,364 @@
+"""Gerador de dados sintéticos para reproduzir o volume de produção localmente
+
+Uso:
+    python -m src.services.seed_data --members 5000 --attendance 1000000
+
+Usa a mesma configuração de banco da aplicação (DATABASE_URL ou o SQLite
+local) e insere em lotes com INSERT em massa, sem passar pelo ORM por linha.
+"""
+import argparse
+import math
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+from src.models.user import db, User, Entity, Gira, Attendance, WorkScale
+from src.models.inventory import InventoryItem, InventoryMovement
+from src.models.finance import FinancialTransaction
+from src.models.library import LibraryContent, ContentAccess, ForumTopic, ForumPost
+from src.models.appointment import Client, Appointment, WhatsAppMessage, normalize_email, normalize_name, normalize_phone
+
+DEFAULT_VOLUMES = {
+    'members': 200,
+    'giras': 100,
+    'attendance': 10000,
+    'work_scales': 2000,
+    'inventory_items': 100,
+    'inventory_movements': 5000,
+    'transactions': 5000,
+    'library_contents': 300,
+    'content_accesses': 20000,
+    'forum_topics': 100,
+    'forum_posts': 5000,
+    'clients': 1000,
+    'appointments': 5000,
+    'whatsapp_messages': 5000,
+}
+
+SEED_PASSWORD = 'seed123'
+
+FUNCOES = ['Ogã', 'Atabaqueiro', 'Incorporante', 'Guarda', 'Auxiliar']
+TIPOS_GIRA = ['desenvolvimento', 'consulta', 'festa', 'estudo']
+CATEGORIAS_ESTOQUE = ['velas', 'bebidas', 'charutos', 'ervas', 'pembas', 'roupas', 'punhais']
+CATEGORIAS_FINANCEIRAS = ['consulta', 'doacao', 'curso', 'insumo', 'manutencao']
+METODOS_PAGAMENTO = ['pix', 'cartao', 'dinheiro']
+TIPOS_CONTEUDO = ['livro', 'audio', 'video', 'pdf']
+CATEGORIAS_CONTEUDO = ['doutrina', 'ritual', 'historia']
+TIPOS_MENSAGEM = ['confirmacao', 'lembrete', 'liberacao_grau', 'aniversario']
+
+
+class Seeder:
+    """Insere dados sintéticos em lotes, de forma reproduzível"""
+
+    def __init__(self, volumes, seed=42, chunk_size=5000, start=None, verbose=True):
+        self.volumes = volumes
+        self.random = random.Random(seed)
+        self.chunk_size = chunk_size
+        self.start = start or datetime(2020, 1, 1)
+        self.now = datetime.utcnow()
+        self.verbose = verbose
+
+    def log(self, message):
+        if self.verbose:
+            print(message, file=sys.stderr)
+
+    def random_datetime(self, start=None, end=None):
+        start = start or self.start
+        end = end or self.now
+        span = int((end - start).total_seconds())
+        return start + timedelta(seconds=self.random.randint(0, max(span, 1)))
+
+    def bulk_insert(self, model, rows):
+        """Insere as linhas em lotes de ``chunk_size`` e confirma cada lote"""
+        table = model.__table__
+        started = time.perf_counter()
+        total = 0
+        batch = []
+        for row in rows:
+            batch.append(row)
+            if len(batch) >= self.chunk_size:
+                db.session.execute(table.insert(), batch)
+                db.session.commit()
+                total += len(batch)
+                batch = []
+        if batch:
+            db.session.execute(table.insert(), batch)
+            db.session.commit()
+            total += len(batch)
+
+        self.log(f'{table.name}: {total} linhas em {time.perf_counter() - started:.1f}s')
+        return total
+
+    def ids(self, model):
+        return [row[0] for row in db.session.query(model.id).all()]
+
+    def run(self):
+        v = self.volumes
+        r = self.random
+
+        if not Entity.query.first():
+            self.bulk_insert(Entity, (
+                {'nome': f'Entidade {i}', 'tipo': r.choice(['Exu', 'Pombagira']), 'linha': 'Encruzilhada',
+                 'created_at': self.now}
+                for i in range(10)
+            ))
+        entity_ids = self.ids(Entity)
+
+        # Um único hash bcrypt para todos os membros sintéticos
+        hasher = User(nome_civil='', nome_ritual='', email='')
+        hasher.set_password(SEED_PASSWORD)
+        password_hash = hasher.password_hash
+
+        offset = User.query.count()
+        self.bulk_insert(User, (
+            {
+                'nome_civil': f'Membro Sintético {i}',
+                'nome_ritual': f'Seed {i}',
+                'email': f'seed{i}@seed.local',
+                'password_hash': password_hash,
+                'grau': r.randint(1, 7),
+                'entidade_cabeca_id': r.choice(entity_ids),
+                'role': 'filho',
+                'is_active': True,
+                'created_at': self.random_datetime(),
+                'updated_at': self.now
+            }
+            for i in range(offset, offset + v['members'])
+        ))
+        user_ids = self.ids(User)
+
+        # Presenças e escalas são pares (gira, membro) únicos: um volume acima de
+        # giras × membros seria cortado em silêncio, então as giras aumentam
+        giras = v['giras']
+        if user_ids:
+            pairs = max(v['attendance'], v['work_scales'])
+            giras = max(giras, math.ceil(pairs / len(user_ids)) - Gira.query.count())
+            if giras > v['giras']:
+                self.log(f"giras: {v['giras']} -> {giras} para {pairs} pares com {len(user_ids)} membros")
+
+        self.bulk_insert(Gira, (
+            {
+                'titulo': f'Gira {i}',
+                'descricao': 'Gira gerada para testes de carga',
+                'data_hora': self.random_datetime(end=self.now + timedelta(days=90)),
+                'local': 'Terreiro',
+                'tipo': r.choice(TIPOS_GIRA),
+                'status': r.choice(['agendada', 'realizada', 'cancelada']),
+                'created_at': self.now,
+                'updated_at': self.now
+            }
+            for i in range(giras)
+        ))
+        gira_ids = self.ids(Gira)
+
+        self.bulk_insert(Attendance, self._pairs(gira_ids, user_ids, v['attendance'], lambda gira_id, user_id: {
+            'user_id': user_id,
+            'gira_id': gira_id,
+            'presente': r.random() < 0.85,
+            'created_at': self.random_datetime()
+        }))
+
+        self.bulk_insert(WorkScale, self._pairs(gira_ids, user_ids, v['work_scales'], lambda gira_id, user_id: {
+            'user_id': user_id,
+            'gira_id': gira_id,
+            'funcao': r.choice(FUNCOES),
+            'created_at': self.now
+        }))
+
+        self.bulk_insert(InventoryItem, (
+            {
+                'nome': f'Item {i}',
+                'categoria': r.choice(CATEGORIAS_ESTOQUE),
+                'quantidade_atual': r.randint(0, 200),
+                'quantidade_minima': r.randint(1, 20),
+                'unidade': 'unidade',
+                'preco_unitario': Decimal(r.randint(100, 10000)) / 100,
+                'created_at': self.now,
+                'updated_at': self.now
+            }
+            for i in range(v['inventory_items'])
+        ))
+        item_ids = self.ids(InventoryItem)
+
+        self.bulk_insert(InventoryMovement, (
+            {
+                'item_id': r.choice(item_ids),
+                'tipo': r.choice(['entrada', 'saida']),
+                'quantidade': r.randint(1, 30),
+                'motivo': 'Movimentação sintética',
+                'gira_id': r.choice(gira_ids) if r.random() < 0.5 else None,
+                'user_id': r.choice(user_ids),
+                'created_at': self.random_datetime()
+            }
+            for _ in range(v['inventory_movements'])
+        ))
+
+        self.bulk_insert(Client, (
+            self._client(i)
+            for i in range(v['clients'])
+        ))
+        client_ids = self.ids(Client)
+
+        self.bulk_insert(Appointment, (self._appointment(client_ids, user_ids) for _ in range(v['appointments'])))
+        appointment_ids = self.ids(Appointment)
+
+        self.bulk_insert(FinancialTransaction, (
+            {
+                'tipo': r.choice(['entrada', 'saida']),
+                'categoria': r.choice(CATEGORIAS_FINANCEIRAS),
+                'descricao': 'Transação sintética',
+                'valor': Decimal(r.randint(1000, 50000)) / 100,
+                'metodo_pagamento': r.choice(METODOS_PAGAMENTO),
+                'status': r.choice(['pendente', 'confirmado', 'cancelado']),
+                'user_id': r.choice(user_ids),
+                'appointment_id': r.choice(appointment_ids) if appointment_ids and r.random() < 0.3 else None,
+                'data_transacao': self.random_datetime(),
+                'created_at': self.now,
+                'updated_at': self.now
+            }
+            for _ in range(v['transactions'])
+        ))
+
+        self.bulk_insert(LibraryContent, (
+            {
+                'titulo': f'Conteúdo {i}',
+                'descricao': 'Descrição sintética ' * 20,
+                'tipo': r.choice(TIPOS_CONTEUDO),
+                'categoria': r.choice(CATEGORIAS_CONTEUDO),
+                'grau_minimo': r.randint(1, 7),
+                'arquivo_nome': f'conteudo{i}.pdf',
+                'arquivo_tamanho': r.randint(10000, 5000000),
+                'is_active': True,
+                'views_count': 0,
+                'created_at': self.now,
+                'updated_at': self.now
+            }
+            for i in range(v['library_contents'])
+        ))
+        content_ids = self.ids(LibraryContent)
+
+        self.bulk_insert(ContentAccess, (
+            {
+                'user_id': r.choice(user_ids),
+                'content_id': r.choice(content_ids),
+                'access_time': self.random_datetime(),
+                'ip_address': f'10.0.{r.randint(0, 255)}.{r.randint(1, 254)}'
+            }
+            for _ in range(v['content_accesses'])
+        ))
+
+        self.bulk_insert(ForumTopic, (
+            {
+                'titulo': f'Tópico {i}',
+                'categoria': r.choice(['duvida', 'estudo', 'discussao']),
+                'grau_minimo': r.randint(1, 7),
+                'author_id': r.choice(user_ids),
+                'is_closed': False,
+                'is_pinned': False,
+                'created_at': self.now,
+                'updated_at': self.now
+            }
+            for i in range(v['forum_topics'])
+        ))
+        topic_ids = self.ids(ForumTopic)
+
+        self.bulk_insert(ForumPost, (
+            {
+                'topic_id': r.choice(topic_ids),
+                'author_id': r.choice(user_ids),
+                'conteudo': 'Post sintético ' * r.randint(5, 200),
+                'created_at': self.random_datetime(),
+                'updated_at': self.now
+            }
+            for _ in range(v['forum_posts'])
+        ))
+
+        self.bulk_insert(WhatsAppMessage, (
+            {
+                'telefone': f'+55119{r.randint(10000000, 99999999)}',
+                'mensagem': 'Mensagem sintética',
+                'tipo': r.choice(TIPOS_MENSAGEM),
+                'status': r.choice(['pendente', 'enviado', 'erro']),
+                'appointment_id': r.choice(appointment_ids) if appointment_ids and r.random() < 0.5 else None,
+                'user_id': r.choice(user_ids) if r.random() < 0.5 else None,
+                'created_at': self.random_datetime()
+            }
+            for _ in range(v['whatsapp_messages'])
+        ))
+
+    def _client(self, i):
+        # INSERT em massa não dispara os eventos do ORM: as colunas de busca vão prontas
+        r = self.random
+        nome = f'Cliente {i}'
+        email = f'cliente{i}@seed.local'
+        telefone = f'(11) 9{r.randint(1000, 9999)}-{r.randint(1000, 9999)}'
+        return {
+            'nome': nome,
+            'email': email,
+            'telefone': telefone,
+            'nome_normalizado': normalize_name(nome),
+            'email_normalizado': normalize_email(email),
+            'telefone_normalizado': normalize_phone(telefone),
+            'observacoes': 'Cliente sintético',
+            'created_at': self.now,
+            'updated_at': self.now
+        }
+
+    def _appointment(self, client_ids, user_ids):
+        r = self.random
+        data_hora = self.random_datetime(end=self.now + timedelta(days=60))
+        realizado = data_hora < self.now
+        return {
+            'client_id': r.choice(client_ids),
+            'data_hora': data_hora,
+            'motivo': 'Consulta sintética',
+            'status': 'realizado' if realizado else r.choice(['agendado', 'confirmado']),
+            'medium_id': r.choice(user_ids),
+            'valor': Decimal(r.randint(5000, 30000)) / 100,
+            'metodo_pagamento': r.choice(METODOS_PAGAMENTO),
+            'status_pagamento': 'pago' if realizado else 'pendente',
+            'relatorio': 'Relatório sintético ' * 30 if realizado else None,
+            'created_at': self.now,
+            'updated_at': self.now
+        }
+
+    def _pairs(self, gira_ids, user_ids, total, build):
+        """Gera pares (gira, membro) distintos, distribuídos entre as giras"""
+        if not gira_ids or not user_ids:
+            return
+        per_gira = min(len(user_ids), math.ceil(total / len(gira_ids)))
+        produced = 0
+        for gira_id in gira_ids:
+            for user_id in self.random.sample(user_ids, per_gira):
+                if produced >= total:
+                    return
+                yield build(gira_id, user_id)
+                produced += 1
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='Popula o banco com dados sintéticos em volume de produção')
+    for name, default in DEFAULT_VOLUMES.items():
+        parser.add_argument(f'--{name.replace("_", "-")}', type=int, default=default, dest=name)
+    parser.add_argument('--seed', type=int, default=42, help='Semente do gerador aleatório')
+    parser.add_argument('--chunk-size', type=int, default=5000, help='Linhas por INSERT em massa')
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    volumes = {name: getattr(args, name) for name in DEFAULT_VOLUMES}
+
+    from src.main import app, init_database
+
+    init_database()
+    with app.app_context():
+        started = time.perf_counter()
+        Seeder(volumes, seed=args.seed, chunk_size=args.chunk_size).run()
+        print(f'Dados sintéticos gerados em {time.perf_counter() - started:.1f}s (senha dos membros: {SEED_PASSWORD})')
+
+
+if __name__ == '__main__':
+    main()
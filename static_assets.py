@@ -0,0 +1,212 @@
+import gzip
+import hashlib
+import mimetypes
+import os
+import re
+
+from flask import send_file
+
+try:
+    import brotli
+except ImportError:  # brotli é opcional; sem ele só geramos .gz
+    brotli = None
+
+# Bundles gerados pelo Vite levam um hash no nome (ex: index-BxY3k9aQ.js): 8
+# caracteres base64url depois de '-', com pelo menos um dígito para não pegar
+# nomes comuns (ex: my-component.js). Um hash só de letras fica sem immutable,
+# com o cache padrão: erra para o lado seguro.
+HASHED_ASSET_RE = re.compile(
+    r'-(?=[A-Za-z0-9_-]{0,7}[0-9])[A-Za-z0-9_-]{8}\.(js|css|mjs|woff2?|ttf|svg|png|jpe?g|webp|gif|ico|map)$'
+)
+
+# Extensões que valem a pena comprimir
+COMPRESSIBLE_EXTENSIONS = {'.html', '.js', '.mjs', '.css', '.json', '.svg', '.map', '.txt', '.xml', '.ttf', '.ico'}
+
+# Variantes pré-comprimidas, em ordem de preferência
+ENCODINGS = [('br', '.br'), ('gzip', '.gz')]
+
+IMMUTABLE_MAX_AGE = 31536000  # 1 ano
+DEFAULT_MAX_AGE = 3600
+INDEX_MAX_AGE = 60
+
+
+class StaticAsset:
+    """Arquivo estático resolvido uma única vez na inicialização"""
+
+    __slots__ = ('path', 'abs_path', 'mimetype', 'size', 'mtime', 'etag', 'variants', 'immutable')
+
+    def __init__(self, path, abs_path, variants):
+        stat = os.stat(abs_path)
+        self.path = path
+        self.abs_path = abs_path
+        self.mimetype = mimetypes.guess_type(path)[0] or 'application/octet-stream'
+        self.size = stat.st_size
+        self.mtime = stat.st_mtime
+        self.etag = _file_digest(abs_path)
+        self.variants = variants  # {'br': '/abs/path.br', 'gzip': '/abs/path.gz'}
+        self.immutable = bool(HASHED_ASSET_RE.search(path))
+
+
+class AssetManifest:
+    """Índice em memória dos arquivos do frontend, montado na inicialização"""
+
+    def __init__(self, static_folder):
+        self.static_folder = static_folder
+        self.assets = {}
+        if static_folder and os.path.isdir(static_folder):
+            self._scan()
+
+    def _scan(self):
+        for root, _dirs, files in os.walk(self.static_folder):
+            names = set(files)
+            for name in files:
+                if name.endswith(('.br', '.gz')) and name[:-3] in names:
+                    continue  # variante de outro arquivo
+
+                abs_path = os.path.join(root, name)
+                rel_path = os.path.relpath(abs_path, self.static_folder).replace(os.sep, '/')
+
+                variants = {}
+                for encoding, suffix in ENCODINGS:
+                    if name + suffix in names:
+                        variants[encoding] = abs_path + suffix
+
+                self.assets[rel_path] = StaticAsset(rel_path, abs_path, variants)
+
+    def get(self, path):
+        return self.assets.get(path)
+
+    @property
+    def index(self):
+        return self.assets.get('index.html')
+
+
+def _file_digest(abs_path):
+    """Calcula o ETag a partir do conteúdo do arquivo"""
+    digest = hashlib.sha1()
+    with open(abs_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(65536), b''):
+            digest.update(chunk)
+    return digest.hexdigest()[:20]
+
+
+def accepted_encodings(header):
+    """Retorna as codificações aceitas pelo cliente (q > 0)"""
+    accepted = set()
+    for part in (header or '').split(','):
+        token, _, params = part.strip().partition(';')
+        token = token.strip().lower()
+        if not token:
+            continue
+        q = 1.0
+        params = params.strip()
+        if params.startswith('q='):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        if q > 0:
+            accepted.add(token)
+    return accepted
+
+
+def send_asset(asset, request, max_age):
+    """Envia o arquivo (ou sua variante comprimida) com cabeçalhos de cache"""
+    accepted = accepted_encodings(request.headers.get('Accept-Encoding'))
+
+    abs_path = asset.abs_path
+    encoding = None
+    for candidate, _suffix in ENCODINGS:
+        if candidate in asset.variants and (candidate in accepted or '*' in accepted):
+            encoding = candidate
+            abs_path = asset.variants[candidate]
+            break
+
+    etag = f'{asset.etag}-{encoding}' if encoding else asset.etag
+
+    response = send_file(
+        abs_path,
+        mimetype=asset.mimetype,
+        etag=etag,
+        last_modified=asset.mtime,
+        max_age=max_age,
+        conditional=True
+    )
+
+    if encoding:
+        response.headers['Content-Encoding'] = encoding
+    if asset.variants:
+        response.vary.add('Accept-Encoding')
+
+    response.cache_control.public = True
+    if asset.immutable:
+        response.cache_control.immutable = True
+    else:
+        response.cache_control.must_revalidate = True
+
+    return response
+
+
+def init_static_assets(app):
+    """Monta o manifesto dos arquivos estáticos e guarda na aplicação"""
+    manifest = AssetManifest(app.static_folder)
+    app.extensions['static_manifest'] = manifest
+    return manifest
+
+
+def serve_static(app, request, path):
+    """Resolve um caminho do frontend usando o manifesto (sem acessar o disco)"""
+    manifest = app.extensions.get('static_manifest')
+    if manifest is None:
+        manifest = init_static_assets(app)
+
+    asset = manifest.get(path) if path else None
+    if asset is not None:
+        max_age = IMMUTABLE_MAX_AGE if asset.immutable else DEFAULT_MAX_AGE
+        return send_asset(asset, request, max_age)
+
+    # Rotas do SPA caem no index.html
+    index = manifest.index
+    if index is None:
+        return None
+    return send_asset(index, request, app.config.get('STATIC_INDEX_MAX_AGE', INDEX_MAX_AGE))
+
+
+def precompress(static_folder, min_size=1024):
+    """Gera variantes .gz (e .br, se disponível) para os arquivos do build"""
+    created = 0
+    for root, _dirs, files in os.walk(static_folder):
+        for name in files:
+            ext = os.path.splitext(name)[1].lower()
+            if ext not in COMPRESSIBLE_EXTENSIONS:
+                continue
+
+            abs_path = os.path.join(root, name)
+            if os.path.getsize(abs_path) < min_size:
+                continue
+
+            with open(abs_path, 'rb') as f:
+                content = f.read()
+
+            gz_content = gzip.compress(content, compresslevel=9, mtime=0)
+            if len(gz_content) < len(content):
+                with open(abs_path + '.gz', 'wb') as f:
+                    f.write(gz_content)
+                created += 1
+
+            if brotli is not None:
+                br_content = brotli.compress(content, quality=11)
+                if len(br_content) < len(content):
+                    with open(abs_path + '.br', 'wb') as f:
+                        f.write(br_content)
+                    created += 1
+
+    return created
+
+
+if __name__ == '__main__':
+    import sys
+
+    folder = sys.argv[1] if len(sys.argv) > 1 else os.path.join(os.path.dirname(os.path.dirname(__file__)), 'static')
+    total = precompress(folder)
+    print(f"{total} variantes comprimidas geradas em {folder}")
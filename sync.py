@@ -0,0 +1,217 @@
+import base64
+import json
+from datetime import datetime, timedelta
+
+from flask import Blueprint, request, jsonify
+from flask_jwt_extended import jwt_required, get_jwt_identity
+from sqlalchemy import and_, func, or_, update
+from src.models.user import db, User, Gira, Attendance, WorkScale
+from src.models.inventory import InventoryItem
+from src.models.appointment import Appointment
+from src.models.library import LibraryContent
+from src.models.tombstone import SyncTombstone
+from src.models.archive import ARCHIVED_MODELS
+from src.services.archival import changed_history_source
+
+sync_bp = Blueprint('sync', __name__)
+
+TOKEN_VERSION = 1
+
+# Janela de sobreposição para não perder linhas de transações ainda abertas
+# quando o token foi emitido; linhas repetidas devem ser tratadas como upsert.
+SYNC_OVERLAP = timedelta(seconds=5)
+
+DEFAULT_LIMIT = 500
+MAX_LIMIT = 2000
+
+# Nome da coleção na resposta -> modelo
+SYNC_MODELS = {
+    'giras': Gira,
+    'attendance': Attendance,
+    'work_scales': WorkScale,
+    'inventory_items': InventoryItem,
+    'appointments': Appointment,
+    'library_contents': LibraryContent,
+}
+
+
+def _is_manager(user):
+    return user.grau >= 6 or user.is_pai_mae_trono()
+
+
+def _visibility_filter(name, user, source=None):
+    """Restringe as linhas visíveis de acordo com o grau e o papel do usuário
+
+    ``source`` é a entidade consultada no lugar do modelo (presenças com o arquivo).
+    """
+    if name == 'attendance' and not _is_manager(user):
+        return (source or Attendance).user_id == user.id
+    if name == 'appointments' and not user.is_tesoureiro():
+        return Appointment.medium_id == user.id
+    return None
+
+
+def _visible(name, user, row):
+    """A linha alterada ainda é visível para o usuário?
+
+    Conteúdos da biblioteca desativados ou com o grau mínimo aumentado somem
+    sem exclusão: vão em ``deleted`` como lápides de visibilidade, para o
+    cliente que já os tinha baixado removê-los.
+    """
+    if name == 'library_contents':
+        return row.is_active and row.grau_minimo <= user.grau
+    return True
+
+
+def _tombstone_filter(user):
+    """Lápides de linhas que o usuário não poderia ver não são enviadas"""
+    restricted = []
+    if not _is_manager(user):
+        restricted.append('attendance')
+    if not user.is_tesoureiro():
+        restricted.append('appointments')
+    if not restricted:
+        return None
+    return or_(SyncTombstone.table_name.notin_(restricted), SyncTombstone.owner_id == user.id)
+
+
+def encode_token(cursors):
+    payload = {
+        'v': TOKEN_VERSION,
+        'c': {name: [ts.isoformat(), row_id] for name, (ts, row_id) in cursors.items()}
+    }
+    raw = json.dumps(payload, separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def decode_token(token):
+    """Decodifica o token opaco; retorna None se for inválido"""
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+        if payload.get('v') != TOKEN_VERSION:
+            return None
+        return {
+            name: (datetime.fromisoformat(ts), int(row_id))
+            for name, (ts, row_id) in payload['c'].items()
+        }
+    except (ValueError, TypeError, KeyError, AttributeError):
+        return None
+
+
+def _changed_rows(model, timestamp_column, cursor, criteria, limit):
+    """Busca as linhas alteradas após o cursor usando o índice de timestamp"""
+    query = db.session.query(model)
+    if cursor is not None:
+        ts, row_id = cursor
+        query = query.filter(or_(
+            timestamp_column > ts,
+            and_(timestamp_column == ts, model.id > row_id)
+        ))
+    if criteria is not None:
+        query = query.filter(criteria)
+    return query.order_by(timestamp_column, model.id).limit(limit + 1).all()
+
+
+def _row_cursor(row, timestamp_attr):
+    # updated_at nulo (linha anterior ao backfill_sync_timestamps): usa a criação
+    return getattr(row, timestamp_attr) or row.created_at, row.id
+
+
+def _next_cursor(rows, limit, timestamp_attr, previous, floor):
+    """Calcula o cursor seguinte; retorna (cursor, há_mais)"""
+    if len(rows) > limit:
+        return _row_cursor(rows[limit - 1], timestamp_attr), True
+
+    # Coleção drenada: recua até a janela de sobreposição
+    if rows:
+        cursor = _row_cursor(rows[-1], timestamp_attr)
+    else:
+        cursor = previous
+    if cursor is None or cursor[0] > floor:
+        cursor = (floor, 0)
+    return cursor, False
+
+
+@sync_bp.route('', methods=['GET'])
+@jwt_required()
+def get_changes():
+    """Retornar as alterações desde o token informado (sincronização incremental)"""
+    try:
+        current_user_id = get_jwt_identity()
+        user = User.query.get(current_user_id)
+
+        if not user:
+            return jsonify({'error': 'Usuário não encontrado'}), 404
+
+        since = request.args.get('since')
+        cursors = {}
+        if since:
+            cursors = decode_token(since)
+            if cursors is None:
+                return jsonify({'error': 'Token de sincronização inválido'}), 400
+
+        limit = min(request.args.get('limit', DEFAULT_LIMIT, type=int), MAX_LIMIT)
+        if limit < 1:
+            return jsonify({'error': 'Limite deve ser positivo'}), 400
+
+        floor = datetime.utcnow() - SYNC_OVERLAP
+        next_cursors = {}
+        changes = {}
+        deleted = {}
+        has_more = False
+
+        for name, model in SYNC_MODELS.items():
+            cursor = cursors.get(name)
+            source = model
+            if model in ARCHIVED_MODELS:
+                # Presenças de giras antigas podem ter ido para o arquivo
+                source = changed_history_source(model, since=cursor[0] if cursor else None)
+            rows = _changed_rows(
+                source, source.updated_at, cursor, _visibility_filter(name, user, source), limit
+            )
+            next_cursors[name], truncated = _next_cursor(rows, limit, 'updated_at', cursors.get(name), floor)
+            has_more = has_more or truncated
+            changes[name] = []
+            for row in rows[:limit]:
+                if _visible(name, user, row):
+                    changes[name].append(row.to_dict(user) if model is LibraryContent else row.to_dict())
+                elif since:
+                    deleted.setdefault(name, []).append(row.id)
+
+        tombstones = _changed_rows(
+            SyncTombstone, SyncTombstone.deleted_at, cursors.get('deleted'), _tombstone_filter(user), limit
+        )
+        next_cursors['deleted'], truncated = _next_cursor(tombstones, limit, 'deleted_at', cursors.get('deleted'), floor)
+        has_more = has_more or truncated
+
+        for tombstone in tombstones[:limit]:
+            deleted.setdefault(tombstone.table_name, []).append(tombstone.row_id)
+
+        return jsonify({
+            'changes': changes,
+            'deleted': deleted,
+            'token': encode_token(next_cursors),
+            'has_more': has_more,
+            'full': not since
+        }), 200
+
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+def backfill_sync_timestamps():
+    """Preenche com a data de criação o updated_at nulo das linhas sincronizadas
+
+    Linhas gravadas antes de a coluna ter default ficariam fora do cursor da
+    sincronização (``updated_at > cursor`` nunca é verdadeiro para nulo).
+    """
+    count = 0
+    for model in SYNC_MODELS.values():
+        count += db.session.execute(
+            update(model).where(model.updated_at.is_(None)).values(
+                updated_at=func.coalesce(model.created_at, datetime.utcnow())
+            )
+        ).rowcount
+    db.session.commit()
+    return count
@@ -0,0 +1,214 @@
+import os
+import re
+import threading
+import time
+
+import sqlalchemy as sa
+from flask import current_app, g, has_app_context, jsonify, request
+from flask_jwt_extended import get_jwt, verify_jwt_in_request
+
+from src.models.user import db
+
+TENANT_SLUG = re.compile(r'^[a-z0-9][a-z0-9-]{0,39}$')
+
+DEFAULT_IDLE_TIMEOUT = 600
+DEFAULT_TENANT_POOL_SIZE = 2
+DEFAULT_TENANT_MAX_OVERFLOW = 3
+PRUNE_INTERVAL = 60
+
+# Rotas que não tocam o banco e respondem sem terreiro
+TENANT_EXEMPT_ENDPOINTS = {'health_check', 'metrics.get_metrics', 'static', 'serve'}
+
+
+class TenantEngineRegistry:
+    """Engines por terreiro, criados na primeira requisição e descartados quando ociosos
+
+    Cada processo guarda só os engines dos terreiros em uso; um terreiro sem
+    requisições por ``idle_timeout`` segundos tem o pool fechado.
+    """
+
+    def __init__(self, url_template, engine_options=None, idle_timeout=DEFAULT_IDLE_TIMEOUT):
+        self.url_template = url_template
+        self.engine_options = engine_options or {}
+        self.idle_timeout = idle_timeout
+        self._lock = threading.Lock()
+        self._engines = {}  # terreiro -> [engine, último uso]
+        self._last_prune = time.monotonic()
+
+    def url_for(self, tenant):
+        return self.url_template.format(tenant=tenant)
+
+    def _create(self, tenant):
+        url = sa.engine.make_url(self.url_for(tenant))
+        options = dict(self.engine_options)
+        if url.get_backend_name() == 'sqlite':
+            if url.database and url.database != ':memory:':
+                os.makedirs(os.path.dirname(os.path.abspath(url.database)), exist_ok=True)
+            options.pop('pool_size', None)
+            options.pop('max_overflow', None)
+        return sa.create_engine(url, **options)
+
+    def get(self, tenant):
+        now = time.monotonic()
+        idle = []
+        with self._lock:
+            entry = self._engines.get(tenant)
+            if entry is None:
+                entry = self._engines[tenant] = [self._create(tenant), now]
+            entry[1] = now
+            if now - self._last_prune > PRUNE_INTERVAL:
+                self._last_prune = now
+                idle = [
+                    self._engines.pop(name)[0] for name, (_engine, last_used) in list(self._engines.items())
+                    if now - last_used > self.idle_timeout
+                ]
+        for engine in idle:
+            # Conexões em uso continuam válidas; só o pool ocioso é fechado
+            engine.dispose()
+        return entry[0]
+
+    def active(self):
+        with self._lock:
+            return sorted(self._engines)
+
+    def dispose_all(self, close=True):
+        with self._lock:
+            engines = [engine for engine, _last_used in self._engines.values()]
+            self._engines.clear()
+        for engine in engines:
+            engine.dispose(close=close)
+
+
+class Tenancy:
+    def __init__(self, tenants, base_domain, registry):
+        self.tenants = frozenset(tenants)
+        self.base_domain = base_domain.lower().lstrip('.') if base_domain else None
+        self.registry = registry
+
+    def from_host(self, host):
+        """Terreiro pelo subdomínio: dragao.nzila.app -> 'dragao'"""
+        if not self.base_domain or not host:
+            return None
+        host = host.split(':', 1)[0].lower()
+        suffix = '.' + self.base_domain
+        if not host.endswith(suffix):
+            return None
+        subdomain = host[:-len(suffix)]
+        return subdomain if '.' not in subdomain else None
+
+
+def get_tenancy(app):
+    return app.extensions.get('tenancy')
+
+
+def tenant_names(app):
+    """Bancos em que as tarefas periódicas rodam: o padrão (None) e cada terreiro"""
+    tenancy = get_tenancy(app)
+    return [None] + (sorted(tenancy.tenants) if tenancy else [])
+
+
+def current_tenant():
+    return g.get('tenant') if has_app_context() else None
+
+
+def use_tenant(app, tenant):
+    """Direciona a sessão deste contexto para o banco do terreiro (None = banco padrão)"""
+    g.tenant = tenant
+    g.tenant_engine = get_tenancy(app).registry.get(tenant) if tenant else None
+
+
+def tenant_dir(directory):
+    """Separa arquivos em cache por terreiro: dir -> dir/<terreiro>"""
+    tenant = current_tenant()
+    return os.path.join(directory, tenant) if tenant else directory
+
+
+def tenant_path(path):
+    directory, name = os.path.split(path)
+    return os.path.join(tenant_dir(directory), name)
+
+
+def _tenant_claim():
+    """Terreiro do JWT válido; '' se o token não tiver o claim, None se não houver token"""
+    try:
+        if verify_jwt_in_request(optional=True, locations=['headers', 'query_string']) is None:
+            return None
+    except Exception:
+        # Token inválido ou expirado: a própria rota responde com o erro do JWT
+        return None
+    return get_jwt().get('tenant', '')
+
+
+def _select_tenant():
+    if request.endpoint in TENANT_EXEMPT_ENDPOINTS:
+        return None
+
+    tenancy = get_tenancy(current_app)
+    host_tenant = tenancy.from_host(request.host)
+    claim = _tenant_claim()
+
+    if claim is not None and host_tenant is not None and claim != host_tenant:
+        return jsonify({'error': 'Token emitido para outro terreiro'}), 401
+
+    tenant = host_tenant or claim or None
+    if tenant is None:
+        # Sem subdomínio nem claim: banco padrão (instalação de um terreiro só)
+        use_tenant(current_app, None)
+        return None
+
+    if tenant not in tenancy.tenants or not TENANT_SLUG.match(tenant):
+        return jsonify({'error': 'Terreiro não encontrado'}), 404
+
+    use_tenant(current_app, tenant)
+    return None
+
+
+def _tenant_claims(identity):
+    tenant = current_tenant()
+    return {'tenant': tenant} if tenant else {}
+
+
+def provision_tenant(app, tenant, seed=None):
+    """Cria as tabelas no banco do terreiro e roda a mesma carga inicial do banco padrão"""
+    tenancy = get_tenancy(app)
+    if tenancy is None:
+        raise RuntimeError('TENANT_DATABASE_URL não configurado')
+    if tenant not in tenancy.tenants or not TENANT_SLUG.match(tenant):
+        raise ValueError(f'Terreiro desconhecido: {tenant} (inclua em TENANTS)')
+
+    with app.app_context():
+        use_tenant(app, tenant)
+        db.metadata.create_all(bind=g.tenant_engine)
+        return seed() if seed else False
+
+
+def init_tenancy(app):
+    """Ativa o roteamento por terreiro quando TENANT_DATABASE_URL está definido
+
+    Chamar depois do JWTManager: os tokens emitidos levam o claim 'tenant'.
+    """
+    app.config.setdefault('TENANT_DATABASE_URL', None)
+    app.config.setdefault('TENANTS', [])
+    app.config.setdefault('TENANT_BASE_DOMAIN', None)
+    app.config.setdefault('TENANT_IDLE_TIMEOUT', DEFAULT_IDLE_TIMEOUT)
+    app.config.setdefault('TENANT_POOL_SIZE', DEFAULT_TENANT_POOL_SIZE)
+    app.config.setdefault('TENANT_MAX_OVERFLOW', DEFAULT_TENANT_MAX_OVERFLOW)
+
+    if not app.config['TENANT_DATABASE_URL']:
+        return None
+
+    registry = TenantEngineRegistry(
+        app.config['TENANT_DATABASE_URL'],
+        engine_options={
+            'pool_size': app.config['TENANT_POOL_SIZE'],
+            'max_overflow': app.config['TENANT_MAX_OVERFLOW'],
+            'pool_pre_ping': True
+        },
+        idle_timeout=app.config['TENANT_IDLE_TIMEOUT']
+    )
+    tenancy = Tenancy(app.config['TENANTS'], app.config['TENANT_BASE_DOMAIN'], registry)
+    app.extensions['tenancy'] = tenancy
+
+    app.before_request(_select_tenant)
+    app.extensions['flask-jwt-extended'].additional_claims_loader(_tenant_claims)
+    return tenancy
@@ -0,0 +1,60 @@
+import pytest
+from flask_jwt_extended import create_access_token
+
+from src.models.user import db
+from src.models.library import ForumTopic, ForumPost
+from src.services.query_budget import QueryBudgetExceeded, query_budget, seed_multi_row
+
+
+# Mesmo orçamento com poucas e com muitas linhas: a contagem não pode crescer com os dados
+@pytest.fixture(params=[2, 12], ids=['poucas-linhas', 'muitas-linhas'])
+def seeded(app, request):
+    with app.app_context():
+        users, giras = seed_multi_row(db, members=request.param, giras=request.param)
+        topic = ForumTopic(titulo='Tópico', categoria='geral', author_id=users[0].id, grau_minimo=1)
+        db.session.add(topic)
+        db.session.flush()
+        for user in users:
+            db.session.add(ForumPost(topic_id=topic.id, author_id=user.id, conteudo='Axé'))
+        db.session.commit()
+        token = create_access_token(identity=str(users[0].id))
+        return {'headers': {'Authorization': f'Bearer {token}'}, 'gira_id': giras[0].id}
+
+
+def test_auth_me(query_budget_client, seeded):
+    response = query_budget_client.get('/api/auth/me', headers=seeded['headers'])
+    assert response.status_code == 200
+    assert response.get_json()['user']['entidade_cabeca']['nome'] == 'Exu Teste'
+
+
+def test_giras_list(query_budget_client, seeded):
+    response = query_budget_client.get('/api/giras/', headers=seeded['headers'])
+    assert response.status_code == 200
+
+
+def test_gira_detail(query_budget_client, seeded):
+    response = query_budget_client.get(f"/api/giras/{seeded['gira_id']}", headers=seeded['headers'])
+    assert response.status_code == 200
+    gira = response.get_json()['gira']
+    assert gira['presencas'] and gira['escalas']
+
+
+def test_my_attendance(query_budget_client, seeded):
+    response = query_budget_client.get('/api/giras/my-attendance', headers=seeded['headers'])
+    assert response.status_code == 200
+    assert all(item['gira'] for item in response.get_json()['attendances'])
+
+
+def test_forum_topics(query_budget_client, seeded):
+    response = query_budget_client.get('/api/forum/topics', headers=seeded['headers'])
+    assert response.status_code == 200
+
+
+@query_budget('/api/giras/<int:gira_id>', 1)
+def test_budget_failure_lists_statements(query_budget_client, seeded):
+    with pytest.raises(QueryBudgetExceeded) as excinfo:
+        query_budget_client.get(f"/api/giras/{seeded['gira_id']}", headers=seeded['headers'])
+    assert excinfo.value.rule == '/api/giras/<int:gira_id>'
+    assert excinfo.value.budget == 1
+    assert excinfo.value.count > excinfo.value.budget
+    assert f'executou {excinfo.value.count} comandos SQL' in str(excinfo.value)
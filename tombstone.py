@@ -0,0 +1,55 @@
+from src.models.user import db
+from datetime import datetime
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+# Tabelas sincronizadas por /api/sync e o campo que indica o "dono" da linha
+SYNC_TRACKED_TABLES = {
+    'giras': None,
+    'attendance': 'user_id',
+    'work_scales': 'user_id',
+    'inventory_items': None,
+    'appointments': 'medium_id',
+    'library_contents': None,
+}
+
+
+class SyncTombstone(db.Model):
+    __tablename__ = 'sync_tombstones'
+
+    id = db.Column(db.Integer, primary_key=True)
+    table_name = db.Column(db.String(50), nullable=False)
+    row_id = db.Column(db.Integer, nullable=False)
+    owner_id = db.Column(db.Integer, nullable=True)  # Usuário dono da linha removida, se houver
+
+    deleted_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False, index=True)
+
+    def __repr__(self):
+        return f'<SyncTombstone {self.table_name}:{self.row_id}>'
+
+    def to_dict(self):
+        return {
+            'table': self.table_name,
+            'id': self.row_id,
+            'deleted_at': self.deleted_at.isoformat() if self.deleted_at else None
+        }
+
+
+@event.listens_for(Session, 'before_flush')
+def _record_tombstones(session, flush_context, instances):
+    """Registra lápides para as linhas sincronizadas removidas pelo ORM
+
+    Exclusões em massa (query.delete()) não passam por aqui e devem criar
+    as lápides explicitamente.
+    """
+    for obj in list(session.deleted):
+        table_name = getattr(obj, '__tablename__', None)
+        if table_name not in SYNC_TRACKED_TABLES:
+            continue
+        owner_field = SYNC_TRACKED_TABLES[table_name]
+        session.add(SyncTombstone(
+            table_name=table_name,
+            row_id=obj.id,
+            owner_id=getattr(obj, owner_field) if owner_field else None,
+            deleted_at=datetime.utcnow()
+        ))
@@ -1,11 +1,73 @@
+from flask import g, has_app_context
 from flask_sqlalchemy import SQLAlchemy
+from flask_sqlalchemy.session import Session
+from sqlalchemy import inspect
 from datetime import datetime
 import bcrypt
 
-db = SQLAlchemy()
+
+class TenantSession(Session):
+    """Sessão que usa o banco do terreiro da requisição (ver services/tenancy)"""
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and has_app_context():
+            engine = g.get('tenant_engine')
+            if engine is not None:
+                return engine
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+db = SQLAlchemy(session_options={'class_': TenantSession})
+
+# Tamanho da prévia das colunas de texto longas nas listagens
+PREVIEW_LENGTH = 200
+
+
+def text_load_options(model, full=False, length=PREVIEW_LENGTH):
+    """Opções de consulta para as colunas de texto longas do modelo
+
+    As colunas vêm no SELECT por padrão (quem não pede opções continua
+    recebendo o texto sem consultas extras). Sem ``full`` elas ficam de fora
+    e só uma prévia calculada no banco (substr) é carregada nos atributos
+    ``*_preview``, para as listagens.
+    """
+    options = []
+    if full:
+        return options
+    for column_name, preview_name in model.__text_previews__.items():
+        column = getattr(model, column_name)
+        options.append(db.defer(column))
+        options.append(db.with_expression(getattr(model, preview_name), db.func.substr(column, 1, length)))
+    return options
+
+
+def text_preview(obj, column_name, length=PREVIEW_LENGTH):
+    """Prévia da coluna: a calculada no SQL ou, sem text_load_options, cortada do texto já carregado"""
+    preview = getattr(obj, obj.__text_previews__[column_name])
+    if preview is None and column_name not in inspect(obj).unloaded:
+        value = getattr(obj, column_name)
+        preview = value[:length] if value else None
+    return preview
+
+
+def wants_full_text(request):
+    """Verifica se a requisição pediu o texto completo (?full=1)"""
+    return request.args.get('full', '').lower() in ('1', 'true', 'sim')
+
+
+class UserQuery(db.Query):
+    def get(self, ident):
+        # O JWT traz o id como texto; convertido, o usuário já carregado na
+        # sessão (ex.: pelos itens anteriores de um /api/batch) sai do mapa de
+        # identidade sem nova consulta
+        if isinstance(ident, str) and ident.isdigit():
+            ident = int(ident)
+        return super().get(ident)
+
 
 class User(db.Model):
     __tablename__ = 'users'
+    query_class = UserQuery
     
     id = db.Column(db.Integer, primary_key=True)
     
@@ -28,7 +90,8 @@ class User(db.Model):
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
     # Relacionamentos
-    entidade_cabeca = db.relationship('Entity', backref='filhos')
+    # Junto no mesmo SELECT do usuário: to_dict(include_sensitive=True) não consulta de novo por linha
+    entidade_cabeca = db.relationship('Entity', backref='filhos', lazy='joined')
     presencas = db.relationship('Attendance', backref='user', lazy='dynamic')
     provas = db.relationship('Proof', backref='user', lazy='dynamic')
     diario_entries = db.relationship('DiaryEntry', backref='user', lazy='dynamic')
@@ -113,12 +176,17 @@ class Gira(db.Model):
     status = db.Column(db.String(50), default='agendada', nullable=False)  # agendada, realizada, cancelada
     
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
-    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, index=True)
     
     # Relacionamentos
     presencas = db.relationship('Attendance', backref='gira', lazy='dynamic')
     escalas = db.relationship('WorkScale', backref='gira', lazy='dynamic')
     
+    # Colunas do to_dict que podem ser pedidas em ?fields= (ver services/fieldsets)
+    __sparse_fields__ = (
+        'id', 'titulo', 'descricao', 'data_hora', 'local', 'tipo', 'status', 'created_at', 'updated_at'
+    )
+    
     def __repr__(self):
         return f'<Gira {self.titulo}>'
     
@@ -146,6 +214,9 @@ class Attendance(db.Model):
     observacoes = db.Column(db.Text, nullable=True)
     
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, index=True)
+    
+    __sparse_fields__ = ('id', 'user_id', 'gira_id', 'presente', 'observacoes', 'created_at', 'updated_at')
     
     def __repr__(self):
         return f'<Attendance User:{self.user_id} Gira:{self.gira_id}>'
@@ -157,7 +228,8 @@ class Attendance(db.Model):
             'gira_id': self.gira_id,
             'presente': self.presente,
             'observacoes': self.observacoes,
-            'created_at': self.created_at.isoformat() if self.created_at else None
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'updated_at': self.updated_at.isoformat() if self.updated_at else None
         }
 
 
@@ -171,10 +243,13 @@ class WorkScale(db.Model):
     observacoes = db.Column(db.Text, nullable=True)
     
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, index=True)
     
     # Relacionamentos
     user = db.relationship('User', backref='escalas')
     
+    __sparse_fields__ = ('id', 'gira_id', 'user_id', 'funcao', 'observacoes', 'created_at', 'updated_at')
+    
     def __repr__(self):
         return f'<WorkScale {self.funcao} - User:{self.user_id}>'
     
@@ -185,12 +260,22 @@ class WorkScale(db.Model):
             'user_id': self.user_id,
             'funcao': self.funcao,
             'observacoes': self.observacoes,
-            'created_at': self.created_at.isoformat() if self.created_at else None
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'updated_at': self.updated_at.isoformat() if self.updated_at else None
         }
 
 
 class Proof(db.Model):
     __tablename__ = 'proofs'
+    __table_args__ = (
+        # Índice parcial: só as provas pendentes, o que a varredura de vencimento consulta
+        db.Index(
+            'ix_proofs_pendente_vencimento',
+            'data_vencimento',
+            postgresql_where=db.text("status = 'pendente'"),
+            sqlite_where=db.text("status = 'pendente'")
+        ),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
@@ -235,18 +320,29 @@ class DiaryEntry(db.Model):
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
+    # Prévia calculada no SQL (ver text_load_options)
+    conteudo_preview = db.query_expression()
+    
+    __text_previews__ = {'conteudo': 'conteudo_preview'}
+    
     def __repr__(self):
         return f'<DiaryEntry {self.titulo}>'
     
-    def to_dict(self):
-        return {
+    def to_dict(self, full=True):
+        data = {
             'id': self.id,
             'user_id': self.user_id,
             'titulo': self.titulo,
-            'conteudo': self.conteudo,
             'tipo': self.tipo,
             'is_private': self.is_private,
             'created_at': self.created_at.isoformat() if self.created_at else None,
             'updated_at': self.updated_at.isoformat() if self.updated_at else None
         }
+        
+        if full:
+            data['conteudo'] = self.conteudo
+        else:
+            data['conteudo_preview'] = text_preview(self, 'conteudo')
+            
+        return data
 
@@ -0,0 +1,298 @@
+"""Proposta automática da escala de trabalho de uma gira
+
+As funções com vagas fixas (Ogã, Atabaqueiros, Guardas, Auxiliares) são
+distribuídas entre os médiuns com presença confirmada por um fluxo de custo
+mínimo: origem -> função (capacidade = vagas) -> médium (custo da rotação,
+só se o grau permitir) -> destino (capacidade 1). O fluxo preenche o máximo
+de vagas possível e, entre as soluções que preenchem, escolhe a de menor
+custo. Quem sobra fica na função de "demais" (Incorporante).
+
+O custo de uma função para um médium cresce com as vezes que ele já a fez no
+período de histórico, com o total de funções de apoio que já assumiu e se foi
+a última função que fez, para que a carga gire entre todos.
+"""
+import time
+from collections import deque
+from datetime import timedelta
+
+from src.models.user import db, User, Gira, Attendance, WorkScale
+from src.services.archival import gira_attendance_since, history_source
+
+DEFAULT_HISTORY_DAYS = 180
+
+# funcao -> grau mínimo e vagas por gira (None = todos os médiuns que sobrarem)
+DEFAULT_WORK_SCALE_ROLES = {
+    'Ogã': {'grau_minimo': 5, 'vagas': 1},
+    'Atabaqueiro': {'grau_minimo': 3, 'vagas': 3},
+    'Guarda': {'grau_minimo': 2, 'vagas': 2},
+    'Auxiliar': {'grau_minimo': 1, 'vagas': 2},
+    'Incorporante': {'grau_minimo': 1, 'vagas': None},
+}
+
+# Pesos do custo da rotação
+REPEAT_COST = 2  # por vez que já fez a mesma função no período
+LOAD_COST = 12  # por função de apoio (vagas fixas) que já assumiu no período
+CONSECUTIVE_COST = 8  # se a última função que fez foi esta
+
+
+class WorkScaleError(ValueError):
+    """Configuração de vagas ou proposta inválida"""
+
+
+class MinCostFlow:
+    """Fluxo de custo mínimo por caminhos mínimos sucessivos (SPFA nas arestas residuais)"""
+
+    def __init__(self, size):
+        self.graph = [[] for _ in range(size)]
+        # Arestas em listas paralelas: destino, capacidade residual, custo
+        self.to = []
+        self.capacity = []
+        self.cost = []
+
+    def add_edge(self, source, target, capacity, cost):
+        self.graph[source].append(len(self.to))
+        self.to.append(target)
+        self.capacity.append(capacity)
+        self.cost.append(cost)
+        self.graph[target].append(len(self.to))
+        self.to.append(source)
+        self.capacity.append(0)
+        self.cost.append(-cost)
+        return len(self.to) - 2
+
+    def solve(self, source, sink):
+        """Fluxo máximo de menor custo; retorna (fluxo, custo)"""
+        graph, to, capacity, cost = self.graph, self.to, self.capacity, self.cost
+        size = len(graph)
+        flow = total_cost = 0
+        while True:
+            distance = [None] * size
+            via = [-1] * size
+            queued = [False] * size
+            distance[source] = 0
+            queue = deque([source])
+            while queue:
+                node = queue.popleft()
+                queued[node] = False
+                base = distance[node]
+                for edge in graph[node]:
+                    if capacity[edge] <= 0:
+                        continue
+                    target = to[edge]
+                    candidate = base + cost[edge]
+                    if distance[target] is None or candidate < distance[target]:
+                        distance[target] = candidate
+                        via[target] = edge
+                        if not queued[target]:
+                            queued[target] = True
+                            queue.append(target)
+            if distance[sink] is None:
+                return flow, total_cost
+
+            pushed = None
+            node = sink
+            while node != source:
+                edge = via[node]
+                pushed = capacity[edge] if pushed is None else min(pushed, capacity[edge])
+                node = to[edge ^ 1]
+            node = sink
+            while node != source:
+                edge = via[node]
+                capacity[edge] -= pushed
+                capacity[edge ^ 1] += pushed
+                node = to[edge ^ 1]
+            flow += pushed
+            total_cost += pushed * distance[sink]
+
+
+def role_requirements(roles, overrides=None):
+    """Vagas por função com os ajustes do pedido ({funcao: vagas})"""
+    roles = {name: dict(role) for name, role in roles.items()}
+    for name, vagas in (overrides or {}).items():
+        if name not in roles:
+            raise WorkScaleError(f'Função desconhecida: {name}')
+        if vagas is not None and (not isinstance(vagas, int) or vagas < 0):
+            raise WorkScaleError(f'Vagas inválidas para {name}')
+        roles[name]['vagas'] = vagas
+    overflow = [name for name, role in roles.items() if role['vagas'] is None]
+    if len(overflow) > 1:
+        raise WorkScaleError('Só uma função pode ficar sem número de vagas')
+    return roles, (overflow[0] if overflow else None)
+
+
+def _history(user_ids, before, since):
+    """Por médium: vezes em cada função, total de apoio e a última função no período"""
+    rows = db.session.query(
+        WorkScale.user_id,
+        WorkScale.funcao,
+        db.func.count(WorkScale.id),
+        db.func.max(Gira.data_hora)
+    ).join(
+        Gira, Gira.id == WorkScale.gira_id
+    ).filter(
+        WorkScale.user_id.in_(user_ids),
+        Gira.data_hora >= since,
+        Gira.data_hora < before
+    ).group_by(WorkScale.user_id, WorkScale.funcao).all()
+
+    history = {}
+    for user_id, funcao, count, last_at in rows:
+        member = history.setdefault(user_id, {'counts': {}, 'last': None, 'last_at': None})
+        member['counts'][funcao] = count
+        if member['last_at'] is None or last_at > member['last_at']:
+            member['last'], member['last_at'] = funcao, last_at
+    return history
+
+
+def _rotation_cost(member_history, funcao, support_roles):
+    if not member_history:
+        return 0
+    counts = member_history['counts']
+    load = sum(count for name, count in counts.items() if name in support_roles)
+    cost = REPEAT_COST * counts.get(funcao, 0) + LOAD_COST * load
+    if member_history['last'] == funcao:
+        cost += CONSECUTIVE_COST
+    return cost
+
+
+def propose_work_scale(gira, roles=DEFAULT_WORK_SCALE_ROLES, overrides=None, history_days=DEFAULT_HISTORY_DAYS):
+    """Proposta de escala para os médiuns confirmados da gira que ainda não têm função
+
+    As escalas já gravadas para a gira são mantidas e ocupam as vagas da sua
+    função. Nada é gravado: a proposta vai para ``apply_work_scale``.
+    """
+    started = time.perf_counter()
+    roles, overflow = role_requirements(roles, overrides)
+
+    fixed = WorkScale.query.filter_by(gira_id=gira.id).all()
+    scaled = {scale.user_id for scale in fixed}
+    taken = {}
+    for scale in fixed:
+        taken[scale.funcao] = taken.get(scale.funcao, 0) + 1
+
+    attendance = history_source(Attendance, since=gira_attendance_since(gira))
+    members = db.session.query(User.id, User.nome_ritual, User.grau).join(
+        attendance, attendance.user_id == User.id
+    ).filter(
+        attendance.gira_id == gira.id,
+        attendance.presente.is_(True),
+        User.is_active.is_(True)
+    ).order_by(User.id).all()
+    members = [member for member in members if member.id not in scaled]
+
+    history = _history([member.id for member in members], gira.data_hora,
+                       gira.data_hora - timedelta(days=history_days)) if members else {}
+
+    # Funções com vagas fixas ainda abertas depois das escalas já gravadas
+    open_roles = [
+        (name, role['vagas'] - taken.get(name, 0), role['grau_minimo'])
+        for name, role in roles.items()
+        if role['vagas'] is not None and role['vagas'] > taken.get(name, 0)
+    ]
+    support_roles = {name for name, role in roles.items() if role['vagas'] is not None}
+
+    # Nós: 0 = origem, 1 = destino, depois funções e médiuns
+    source, sink = 0, 1
+    flow = MinCostFlow(2 + len(open_roles) + len(members))
+    member_node = {member.id: 2 + len(open_roles) + index for index, member in enumerate(members)}
+    assignment_edges = []
+    for index, (name, vagas, grau_minimo) in enumerate(open_roles):
+        role_node = 2 + index
+        flow.add_edge(source, role_node, vagas, 0)
+        for member in members:
+            if member.grau >= grau_minimo:
+                cost = _rotation_cost(history.get(member.id), name, support_roles)
+                edge = flow.add_edge(role_node, member_node[member.id], 1, cost)
+                assignment_edges.append((edge, name, member, cost))
+    for member in members:
+        flow.add_edge(member_node[member.id], sink, 1, 0)
+
+    filled, total_cost = flow.solve(source, sink)
+
+    assigned = {}
+    for edge, name, member, cost in assignment_edges:
+        if flow.capacity[edge] == 0:
+            assigned[member.id] = (name, cost)
+
+    assignments = []
+    for member in members:
+        name, cost = assigned.get(member.id, (None, 0))
+        if name is None:
+            if overflow is None or member.grau < roles[overflow]['grau_minimo']:
+                continue
+            name = overflow
+        assignments.append({
+            'user_id': member.id,
+            'nome_ritual': member.nome_ritual,
+            'grau': member.grau,
+            'funcao': name,
+            'custo': cost
+        })
+
+    open_slots = {}
+    for name, vagas, _grau_minimo in open_roles:
+        missing = vagas - sum(1 for item in assignments if item['funcao'] == name)
+        if missing:
+            open_slots[name] = missing
+
+    return {
+        'gira_id': gira.id,
+        'assignments': assignments,
+        'existing': [scale.to_dict() for scale in fixed],
+        'vagas_abertas': open_slots,
+        'custo_total': total_cost,
+        'count': len(assignments),
+        'duration_ms': round((time.perf_counter() - started) * 1000, 2)
+    }
+
+
+def apply_work_scale(gira, assignments, roles=DEFAULT_WORK_SCALE_ROLES):
+    """Grava a proposta numa única transação; nada é gravado se algum item for inválido"""
+    if not isinstance(assignments, list) or not assignments:
+        raise WorkScaleError('Nenhuma escala para gravar')
+
+    user_ids = []
+    for item in assignments:
+        if not isinstance(item, dict) or not item.get('user_id') or not item.get('funcao'):
+            raise WorkScaleError('Cada escala precisa de user_id e funcao')
+        if item['funcao'] not in roles:
+            raise WorkScaleError(f'Função desconhecida: {item["funcao"]}')
+        user_ids.append(item['user_id'])
+    if len(set(user_ids)) != len(user_ids):
+        raise WorkScaleError('Usuário repetido na escala')
+
+    graus = dict(db.session.query(User.id, User.grau).filter(User.id.in_(user_ids)).all())
+    for item in assignments:
+        grau = graus.get(item['user_id'])
+        if grau is None:
+            raise WorkScaleError(f'Usuário {item["user_id"]} não encontrado')
+        if grau < roles[item['funcao']]['grau_minimo']:
+            raise WorkScaleError(f'Usuário {item["user_id"]} não tem grau para {item["funcao"]}')
+
+    # Escalas criadas depois da proposta
+    conflicts = db.session.query(WorkScale.user_id).filter(
+        WorkScale.gira_id == gira.id,
+        WorkScale.user_id.in_(user_ids)
+    ).all()
+    if conflicts:
+        raise WorkScaleError(
+            'Usuários já possuem escala para esta gira: ' + ', '.join(str(row.user_id) for row in conflicts)
+        )
+
+    scales = [
+        WorkScale(gira_id=gira.id, user_id=item['user_id'], funcao=item['funcao'], observacoes=item.get('observacoes'))
+        for item in assignments
+    ]
+    try:
+        db.session.add_all(scales)
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    return scales
+
+
+def init_work_scale_solver(app):
+    """Configura as funções da escala e o período de histórico considerado na rotação"""
+    app.config.setdefault('WORK_SCALE_ROLES', DEFAULT_WORK_SCALE_ROLES)
+    app.config.setdefault('WORK_SCALE_HISTORY_DAYS', DEFAULT_HISTORY_DAYS)
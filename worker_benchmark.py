@@ -0,0 +1,131 @@
+"""Compara os modelos de worker do gunicorn nas rotas de I/O e no login (bcrypt)
+
+Uso:
+    python -m src.services.worker_benchmark --models sync gthread gevent --duration 15
+
+Para cada modelo sobe um gunicorn com gunicorn.conf.py em uma porta livre,
+espera o /api/health responder e roda o benchmark de carga sobre ele.
+"""
+import argparse
+import importlib.util
+import json
+import os
+import signal
+import socket
+import subprocess
+import sys
+import time
+
+from src.services.benchmark import DEFAULT_EMAIL, DEFAULT_PASSWORD, HttpTransport, run_benchmark
+
+# Rotas presas em I/O (giras) e a rota presa em CPU (bcrypt no login)
+COMPARISON_ROUTES = [
+    ('giras_list', 'GET', '/api/giras/'),
+    ('gira_detail', 'GET', '/api/giras/{gira_id}'),
+    ('my_attendance', 'GET', '/api/giras/my-attendance'),
+    ('login', 'POST', '/api/auth/login', {'email': DEFAULT_EMAIL, 'password': DEFAULT_PASSWORD}),
+]
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def wait_until_ready(transport, timeout=60):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            status, _body = transport.request('GET', '/api/health')
+            if status == 200:
+                return
+        except OSError:
+            pass
+        time.sleep(0.25)
+    raise RuntimeError('Servidor não respondeu a tempo')
+
+
+def start_gunicorn(model, port, config, workers=None, threads=None, extra_env=None):
+    env = dict(os.environ, GUNICORN_WORKER_MODEL=model, GUNICORN_BIND=f'127.0.0.1:{port}', GUNICORN_ACCESSLOG='')
+    env.update(extra_env or {})
+    if workers:
+        env['GUNICORN_WORKERS'] = str(workers)
+    if threads:
+        env['GUNICORN_THREADS'] = str(threads)
+    return subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', '-c', config],
+        env=env,
+        stdout=subprocess.DEVNULL
+    )
+
+
+def stop_gunicorn(process):
+    process.send_signal(signal.SIGTERM)
+    try:
+        process.wait(timeout=30)
+    except subprocess.TimeoutExpired:
+        process.kill()
+
+
+def compare(models, config, concurrency, duration, warmup, workers=None, threads=None):
+    results = {}
+    for model in models:
+        if model == 'gevent' and importlib.util.find_spec('gevent') is None:
+            print('gevent não instalado; ignorando', file=sys.stderr)
+            continue
+
+        port = free_port()
+        # Todas as requisições saem do mesmo IP: o limitador de login viraria 429 e não mediria nada
+        process = start_gunicorn(model, port, config, workers, threads,
+                                 extra_env={'LOGIN_RATE_LIMIT_ENABLED': '0'})
+        transport = HttpTransport(f'http://127.0.0.1:{port}')
+        try:
+            wait_until_ready(transport)
+            print(f'{model}: medindo...', file=sys.stderr)
+            results[model] = run_benchmark(
+                transport, COMPARISON_ROUTES, concurrency=concurrency, duration=duration, warmup=warmup
+            )
+        finally:
+            stop_gunicorn(process)
+    return results
+
+
+def format_comparison(results):
+    routes = [route[0] for route in COMPARISON_ROUTES]
+    lines = [f'{"modelo":<9} {"rota":<14} {"req/s":>9} {"p50 ms":>9} {"p95 ms":>9} {"p99 ms":>9} {"erros":>6}']
+    for model, model_results in results.items():
+        for route in routes:
+            stats = model_results.get(route)
+            if not stats:
+                continue
+            lines.append(
+                f'{model:<9} {route:<14} {stats["throughput"]:>9.1f} {stats["p50_ms"]:>9.1f} '
+                f'{stats["p95_ms"]:>9.1f} {stats["p99_ms"]:>9.1f} {stats["errors"]:>6}'
+            )
+    return '\n'.join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Compara modelos de worker do gunicorn')
+    parser.add_argument('--models', nargs='+', default=['sync', 'gthread', 'gevent'])
+    parser.add_argument('--config', default='gunicorn.conf.py')
+    parser.add_argument('--workers', type=int, help='Fixar o número de workers em todos os modelos')
+    parser.add_argument('--threads', type=int, help='Threads por worker (gthread)')
+    parser.add_argument('--concurrency', type=int, default=32)
+    parser.add_argument('--duration', type=float, default=10.0)
+    parser.add_argument('--warmup', type=float, default=2.0)
+    parser.add_argument('--output', help='Gravar os resultados em JSON')
+    args = parser.parse_args(argv)
+
+    results = compare(args.models, args.config, args.concurrency, args.duration, args.warmup,
+                      args.workers, args.threads)
+    print(format_comparison(results))
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,6 @@
+from src.main import app
+
+# Ponto de entrada de produção: gunicorn -c gunicorn.conf.py
+# A importação não abre conexões com o banco (ver init_database em main.py),
+# então o app pode ser pré-carregado no processo mestre antes do fork.
+application = app